@@ -0,0 +1 @@
+python src/bench_micro.py "$@"
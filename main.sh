@@ -1,2 +1 @@
-python src/main.py
-cd docs && python3 -m http.server 8888
\ No newline at end of file
+python src/main.py --serve --port 8888
@@ -0,0 +1,151 @@
+"""Module for fingerprinting static assets with their content hash.
+
+A fingerprinted asset such as index.css is written as index.1a2b3c4d.css, so
+its url changes whenever its content does and it can be served with a far
+future cache lifetime. Pages and templates refer to the plain names, the url
+resolver rewrites them using the map written to asset-manifest.json.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path, PurePosixPath
+
+from manifest import BuildManifest, file_hash
+from output_sink import DiskSink, OutputSink
+from static_sync import scan_files, sync_folder_contents
+
+ASSET_MANIFEST_NAME = "asset-manifest.json"
+FINGERPRINT_LENGTH = 8
+# files that are looked up by their name and must keep it.
+KEEP_NAMES = frozenset(
+    ("robots.txt", "favicon.ico", "CNAME", ".nojekyll", "manifest.webmanifest")
+)
+KEEP_SUFFIXES = (".html", ".htm")
+
+
+def fingerprinted_name(rel: str, content_hash: str) -> str:
+    """Insert the start of content_hash before the suffix of rel."""
+    path = PurePosixPath(rel)
+    fingerprint = content_hash[:FINGERPRINT_LENGTH]
+    if not path.suffix:
+        return f"{rel}.{fingerprint}"
+    return str(path.with_name(f"{path.stem}.{fingerprint}{path.suffix}"))
+
+
+def is_fingerprintable(rel: str) -> bool:
+    return PurePosixPath(rel).name not in KEEP_NAMES and not rel.endswith(
+        KEEP_SUFFIXES
+    )
+
+
+def hash_assets(
+    static_dir: Path | str, manifest: BuildManifest = None
+) -> dict[str, str]:
+    """Return the content hash of every static file keyed by relative path.
+
+    Hashes the manifest recorded for a file with the same size and mtime are
+    reused, so unchanged assets are not read again.
+    """
+    previous = manifest.assets if manifest is not None else {}
+    hashes = {}
+    for rel, stat in sorted(scan_files(static_dir).items()):
+        entry = previous.get(rel, {})
+        same_stat = (entry.get("size"), entry.get("mtime_ns")) == (
+            stat.st_size,
+            stat.st_mtime_ns,
+        )
+        if same_stat and entry.get("hash"):
+            hashes[rel] = entry["hash"]
+        else:
+            hashes[rel] = file_hash(Path(static_dir, rel))
+    return hashes
+
+
+def fingerprint_assets(hashes: dict[str, str]) -> dict[str, str]:
+    """Map the relative path of every fingerprintable asset to its
+    fingerprinted path."""
+    return {
+        rel: fingerprinted_name(rel, content_hash)
+        for rel, content_hash in hashes.items()
+        if is_fingerprintable(rel)
+    }
+
+
+def write_asset_manifest(dest_dir: Path | str, assets: dict[str, str]) -> bool:
+    """Write the asset map into dest_dir, unless it is already there.
+
+    Returns True when the file was written.
+    """
+    path = Path(dest_dir, ASSET_MANIFEST_NAME)
+    text = json.dumps(assets, indent=1, sort_keys=True)
+    try:
+        if path.read_text() == text:
+            return False
+    except FileNotFoundError:
+        pass
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    tmp_path.write_text(text)
+    os.replace(tmp_path, path)
+    return True
+
+
+def sync_assets(
+    static_dir: Path | str,
+    dest_dir: Path | str,
+    manifest: BuildManifest = None,
+    mode: str = "copy",
+    checksum: bool = False,
+    fingerprint: bool = False,
+    sink: OutputSink = None,
+) -> dict[str, str]:
+    """Sync static files into dest_dir, under fingerprinted names when asked.
+
+    When sink is given and not the disk, every file is copied into it
+    instead, with no manifest to compare against. Returns the asset map to
+    resolve urls with, empty without fingerprint.
+    """
+    if sink is not None and not isinstance(sink, DiskSink):
+        return copy_assets(static_dir, sink, fingerprint)
+
+    if not fingerprint:
+        sync_folder_contents(static_dir, dest_dir, manifest, mode, checksum)
+        if not Path(static_dir, ASSET_MANIFEST_NAME).is_file():
+            Path(dest_dir, ASSET_MANIFEST_NAME).unlink(missing_ok=True)
+        return {}
+
+    hashes = hash_assets(static_dir, manifest)
+    assets = fingerprint_assets(hashes)
+    sync_folder_contents(
+        static_dir,
+        dest_dir,
+        manifest,
+        mode,
+        checksum,
+        hashes=hashes,
+        rename=assets,
+    )
+    if write_asset_manifest(dest_dir, assets):
+        print(f"wrote {len(assets)} fingerprinted assets to {ASSET_MANIFEST_NAME}")
+    return assets
+
+
+def copy_assets(
+    static_dir: Path | str, sink: OutputSink, fingerprint: bool = False
+) -> dict[str, str]:
+    """Copy every static file into sink, under fingerprinted names when
+    asked, and return the asset map."""
+    print(f"copying files from {static_dir} to {sink.root}")
+    sources = sorted(scan_files(static_dir))
+    assets = {}
+    if fingerprint:
+        assets = fingerprint_assets(hash_assets(static_dir))
+    for rel in sources:
+        sink.copy_file(Path(static_dir, rel), Path(sink.root, assets.get(rel, rel)))
+    if fingerprint:
+        text = json.dumps(assets, indent=1, sort_keys=True)
+        sink.write_bytes(Path(sink.root, ASSET_MANIFEST_NAME), text.encode())
+    print(f"copied {len(sources)} files to {sink.root}")
+    return assets
@@ -0,0 +1,238 @@
+"""End to end build scaling benchmark on synthetic sites.
+
+Every scale generates a fresh site with synth_site and runs a clean main()
+build in its own subprocess, so peak rss is measured per build. The build
+uses the fragment cache, image index and content database like the command
+line does, each can be turned off with the same --no-* flag. Results are
+printed as a table and written as json for plotting.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Iterable
+
+from synth_site import generate_site
+
+RESULTS_PATH = "./bench_build.json"
+DEFAULT_SCALES = (100, 1000, 10000)
+# log-log slope of build time against page count above which we warn.
+SUPERLINEAR_SLOPE = 1.15
+
+
+def peak_rss_bytes() -> int | None:
+    try:
+        import resource
+    except ImportError:  # not available on windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # linux reports kilobytes, macos reports bytes.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def tree_size(path: Path | str) -> tuple[int, int]:
+    """Return the file count and total bytes under path."""
+    files, size = 0, 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            files += 1
+            size += os.path.getsize(os.path.join(dirpath, name))
+    return files, size
+
+
+def run_one(
+    site: Path | str,
+    jobs: int,
+    fragment_cache: bool = True,
+    image_sizes: bool = True,
+    content_db: bool = True,
+) -> dict:
+    """Run a clean build of site in this process and measure it, with the
+    build state the command line loads by default."""
+    import main as site_main
+    from content_db import ContentDB
+    from fragment_cache import FragmentCache
+    from image_meta import ImageIndex
+
+    os.chdir(site)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        site_main.main(
+            "/",
+            clean=True,
+            jobs=jobs,
+            fragments=(
+                FragmentCache.load(site_main.FRAGMENT_CACHE_PATH)
+                if fragment_cache
+                else None
+            ),
+            image_index=(
+                ImageIndex.load(site_main.IMAGE_INDEX_PATH) if image_sizes else None
+            ),
+            content_db=(
+                ContentDB.load(site_main.CONTENT_DB_PATH) if content_db else None
+            ),
+        )
+    wall = time.perf_counter() - start
+
+    files, size = tree_size("docs")
+    return {
+        "wall_seconds": wall,
+        "peak_rss_bytes": peak_rss_bytes(),
+        "files_written": files,
+        "bytes_written": size,
+    }
+
+
+def bench_scale(
+    pages: int, blocks: int, jobs: int, seed: int, build_flags: Iterable[str] = ()
+) -> dict:
+    """Build a synthetic site of pages in a subprocess, passing build_flags
+    such as --no-fragment-cache to it."""
+    with tempfile.TemporaryDirectory(prefix=f"site-{pages}-") as site:
+        markdown_bytes = generate_site(site, pages, blocks, seed)
+        result_path = Path(site, "result.json")
+        subprocess.run(
+            [
+                sys.executable,
+                __file__,
+                "--run-one",
+                site,
+                "--jobs",
+                str(jobs),
+                "--result-file",
+                str(result_path),
+                *build_flags,
+            ],
+            check=True,
+        )
+        with open(result_path, "r") as f:
+            result = json.load(f)
+
+    result["pages"] = pages
+    result["markdown_bytes"] = markdown_bytes
+    result["pages_per_second"] = (pages + 1) / result["wall_seconds"]
+    return result
+
+
+def scaling_slopes(results: list[dict]) -> list[float]:
+    """Return the log-log slope of wall time between consecutive scales."""
+    slopes = []
+    for small, large in zip(results, results[1:]):
+        slopes.append(
+            math.log(large["wall_seconds"] / small["wall_seconds"])
+            / math.log(large["pages"] / small["pages"])
+        )
+    return slopes
+
+
+def print_table(results: list[dict]) -> None:
+    print(
+        f"{'pages':>8}{'wall s':>10}{'pages/s':>10}{'peak rss MB':>13}"
+        f"{'written MB':>12}{'slope':>8}"
+    )
+    slopes = [None] + scaling_slopes(results)
+    for result, slope in zip(results, slopes):
+        rss = result["peak_rss_bytes"]
+        rss_text = f"{rss / 2**20:>13.1f}" if rss is not None else f"{'-':>13}"
+        slope_text = f"{slope:>8.2f}" if slope is not None else f"{'-':>8}"
+        print(
+            f"{result['pages']:>8}{result['wall_seconds']:>10.2f}"
+            f"{result['pages_per_second']:>10.0f}{rss_text}"
+            f"{result['bytes_written'] / 2**20:>12.1f}{slope_text}"
+        )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--scales",
+        type=int,
+        nargs="+",
+        default=list(DEFAULT_SCALES),
+        help="page counts to build, e.g. 100 1000 10000 100000",
+    )
+    parser.add_argument("--blocks", type=int, default=30, help="blocks per page")
+    parser.add_argument("--jobs", type=int, default=1, help="passed to main()")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=RESULTS_PATH, help="results json path")
+    parser.add_argument(
+        "--no-fragment-cache",
+        action="store_true",
+        help="build without the fragment cache, as main.py --no-fragment-cache",
+    )
+    parser.add_argument(
+        "--no-image-sizes",
+        action="store_true",
+        help="build without the image index, as main.py --no-image-sizes",
+    )
+    parser.add_argument(
+        "--no-content-db",
+        action="store_true",
+        help="build without the content database, as main.py --no-content-db",
+    )
+    parser.add_argument("--run-one", help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        result = run_one(
+            args.run_one,
+            args.jobs,
+            fragment_cache=not args.no_fragment_cache,
+            image_sizes=not args.no_image_sizes,
+            content_db=not args.no_content_db,
+        )
+        with open(args.result_file, "w") as f:
+            json.dump(result, f)
+        return 0
+
+    build_flags = [
+        flag
+        for flag, off in (
+            ("--no-fragment-cache", args.no_fragment_cache),
+            ("--no-image-sizes", args.no_image_sizes),
+            ("--no-content-db", args.no_content_db),
+        )
+        if off
+    ]
+    results = []
+    for pages in sorted(args.scales):
+        print(f"building {pages} pages")
+        results.append(
+            bench_scale(pages, args.blocks, args.jobs, args.seed, build_flags)
+        )
+
+    print_table(results)
+    with open(args.output, "w") as f:
+        json.dump(
+            {
+                "blocks_per_page": args.blocks,
+                "jobs": args.jobs,
+                "build_flags": build_flags,
+                "results": results,
+            },
+            f,
+            indent=1,
+        )
+    print(f"results written to {args.output}")
+
+    superlinear = [s for s in scaling_slopes(results) if s > SUPERLINEAR_SLOPE]
+    if superlinear:
+        print(f"warning: build time grows superlinearly (slopes {superlinear})")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
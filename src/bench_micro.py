@@ -0,0 +1,217 @@
+"""Microbenchmarks for the parsing and rendering hot paths.
+
+Run with bench.sh from the repo root. Results are written as json and
+compared against a stored baseline, exiting non-zero when any benchmark is
+slower than the baseline by more than the threshold.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import sys
+import timeit
+from pathlib import Path
+
+from htmlnode import LeafNode, ParentNode
+from markdown_blocks import block_to_blocktype, markdown_to_blocks
+from markdown_html import markdown_to_html, markdown_to_html_node
+from raw_to_textnode import (
+    split_nodes_delimiter,
+    split_nodes_image,
+    split_nodes_link,
+    text_to_textnodes,
+)
+from textnode import TextNode, TextType
+
+RESULTS_PATH = "./bench_results.json"
+BASELINE_PATH = "./bench_baseline.json"
+DEFAULT_THRESHOLD = 1.25
+
+TYPICAL_TEXT = (
+    "In the vast weave of the **legendarium**, amidst heroes of _renown_ and "
+    "tales of `high adventure`, there is ![an image](/images/tom.png) and a "
+    "[link back home](/blog/tom) before the sentence finally ends."
+)
+
+INLINE_TEXTS = {
+    "small": "plain words with a **bold** bit",
+    "typical": TYPICAL_TEXT,
+    "adversarial": " ".join(
+        f"[link {i}](/page/{i}) ![img {i}](/img/{i}.png) **b{i}** _i{i}_"
+        for i in range(500)
+    ),
+}
+
+TYPICAL_MARKDOWN = "\n\n".join(
+    [
+        "# A Typical Post",
+        TYPICAL_TEXT,
+        "## A Section",
+        "> a quoted line with **bold**\n> and another line",
+        "- first _item_\n- second `item`\n- third [item](/x)",
+        "1. one\n2. two\n3. three",
+        "```\nprint('code')\nprint('more code')\n```",
+        TYPICAL_TEXT,
+    ]
+)
+
+MARKDOWN_TEXTS = {
+    "small": "# Title\n\nhello world",
+    "typical": TYPICAL_MARKDOWN,
+    "adversarial": "# Huge\n\n"
+    + "\n\n".join(
+        [
+            "\n".join(
+                f"- item {i} with **bold** and [a link](/{i})" for i in range(2000)
+            ),
+            "\n".join(f"{i}. ordered {i}" for i in range(1, 2001)),
+            INLINE_TEXTS["adversarial"],
+        ]
+        * 3
+    ),
+}
+
+BLOCKS = {
+    "small": "a short paragraph",
+    "typical": "- first _item_\n- second `item`\n- third [item](/x)",
+    "adversarial": "\n".join(f"{i}. ordered item" for i in range(1, 5001)),
+}
+
+
+def _deep_tree(depth: int) -> ParentNode:
+    node = ParentNode("span", [LeafNode("b", "leaf")])
+    for _ in range(depth):
+        node = ParentNode("div", [LeafNode(None, "text"), node])
+    return node
+
+
+HTML_TREES = {
+    "small": ParentNode("p", [LeafNode(None, "hello "), LeafNode("b", "world")]),
+    "typical": markdown_to_html_node(TYPICAL_MARKDOWN),
+    "adversarial": ParentNode(
+        "div", [ParentNode("p", [LeafNode(None, "x" * 50)]) for _ in range(20000)]
+    ),
+    "deep": _deep_tree(400),
+}
+
+
+def benchmarks() -> dict[str, callable]:
+    """Return every benchmark keyed by function/input size."""
+    cases = {}
+    for size, text in INLINE_TEXTS.items():
+        nodes = [TextNode(text, TextType.TEXT)]
+        cases[f"split_nodes_delimiter/{size}"] = (
+            lambda n=nodes: split_nodes_delimiter(n, "**", TextType.BOLD_TEXT)
+        )
+        cases[f"split_nodes_image/{size}"] = lambda n=nodes: split_nodes_image(n)
+        cases[f"split_nodes_link/{size}"] = lambda n=nodes: split_nodes_link(n)
+        cases[f"text_to_textnodes/{size}"] = lambda t=text: text_to_textnodes(t)
+
+    for size, markdown in MARKDOWN_TEXTS.items():
+        cases[f"markdown_to_blocks/{size}"] = lambda m=markdown: markdown_to_blocks(m)
+        cases[f"markdown_to_html_node/{size}"] = (
+            lambda m=markdown: markdown_to_html_node(m)
+        )
+        cases[f"markdown_to_html/{size}"] = lambda m=markdown: markdown_to_html(m)
+
+    for size, block in BLOCKS.items():
+        cases[f"block_to_blocktype/{size}"] = lambda b=block: block_to_blocktype(b)
+
+    for size, tree in HTML_TREES.items():
+        cases[f"ParentNode.to_html/{size}"] = tree.to_html
+
+    return cases
+
+
+def time_call(func: callable, repeat: int = 5, min_time: float = 0.2) -> float:
+    """Return the best seconds per call over several timed runs."""
+    timer = timeit.Timer(func)
+    number, elapsed = timer.autorange()
+    if elapsed < min_time:
+        number = max(1, int(number * min_time / max(elapsed, 1e-9)))
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def run(name_filter: str = None, repeat: int = 5) -> dict[str, float]:
+    results = {}
+    for name, func in benchmarks().items():
+        if name_filter and name_filter not in name:
+            continue
+        results[name] = time_call(func, repeat)
+        print(f"{name:<40}{results[name] * 1e6:>14.2f} us")
+    return results
+
+
+def compare(
+    results: dict[str, float], baseline: dict[str, float], threshold: float
+) -> list[str]:
+    """Return the names of benchmarks slower than baseline * threshold."""
+    regressions = []
+    print(f"\n{'benchmark':<40}{'baseline us':>14}{'current us':>14}{'ratio':>8}")
+    for name, seconds in results.items():
+        if name not in baseline:
+            continue
+        ratio = seconds / baseline[name]
+        flag = ""
+        if ratio > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(
+            f"{name:<40}{baseline[name] * 1e6:>14.2f}{seconds * 1e6:>14.2f}"
+            f"{ratio:>8.2f}{flag}"
+        )
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", default=RESULTS_PATH, help="results json path")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline json path")
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="store these results as the new baseline instead of comparing",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="fail when current / baseline time exceeds this ratio",
+    )
+    parser.add_argument("--filter", help="only run benchmarks containing this text")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per case")
+    args = parser.parse_args()
+
+    results = run(args.filter, args.repeat)
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=1, sort_keys=True)
+    print(f"results written to {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=1, sort_keys=True)
+        print(f"baseline saved to {args.baseline}")
+        return 0
+
+    if not Path(args.baseline).is_file():
+        print(f"no baseline at {args.baseline}, run with --save-baseline first")
+        return 0
+
+    with open(args.baseline, "r") as f:
+        baseline = json.load(f)["results"]
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"{len(regressions)} benchmarks regressed past {args.threshold}x")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""Module for keeping the content pages and their metadata in sqlite.
+
+A single os.scandir walk refreshes the database every build. Sources whose
+size and mtime are unchanged keep their stored hash, so only new and
+edited files are read, and the build manifest checks pages against the
+stored hashes instead of hashing every source again.
+
+Titles are stored by the build from the heading it reads while generating
+a page, so they cost no extra scan. A new or edited source has no title
+until its page is generated again.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+from pathlib import Path
+
+from template import DIRECTORY_TEMPLATE_NAME
+
+CONTENT_DB_VERSION = 3
+
+_SCHEMA = """
+CREATE TABLE pages (
+    source TEXT PRIMARY KEY,
+    output TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    hash TEXT NOT NULL,
+    title TEXT
+)
+"""
+
+
+class ContentDB:
+    """Every page of the content folder, one row per source file with its
+    output path, mtime, size, sha256 hash and title."""
+
+    def __init__(self, path: Path | str = ":memory:"):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version != CONTENT_DB_VERSION:
+            with self.conn:
+                self.conn.execute("DROP TABLE IF EXISTS pages")
+                self.conn.execute(_SCHEMA)
+                self.conn.execute(f"PRAGMA user_version = {CONTENT_DB_VERSION}")
+        self.read = 0
+
+    @classmethod
+    def load(cls, path: Path | str) -> ContentDB:
+        """Open the database at path, starting empty if it is unreadable."""
+        try:
+            return cls(path)
+        except sqlite3.DatabaseError:
+            print(f"{path} is unreadable, starting an empty content database.")
+            Path(path).unlink(missing_ok=True)
+            return cls(path)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def refresh(
+        self, content_dir: Path | str, dest_dir: Path | str
+    ) -> list[tuple[Path, Path]]:
+        """Bring the pages up to date with content_dir and return every
+        (source, output) pair, like discover_pages.
+
+        Rows of sources that are gone are deleted, new or changed sources
+        are read for their hash, and their title is cleared.
+        """
+        found: dict[str, tuple[str, int, int]] = {}
+        stack = [(str(Path(content_dir)), Path(dest_dir))]
+        while stack:
+            folder, dest = stack.pop()
+            with os.scandir(folder) as it:
+                for entry in it:
+                    if entry.is_dir():
+                        stack.append((entry.path, Path(dest, entry.name)))
+                    elif entry.is_file() and entry.name != DIRECTORY_TEMPLATE_NAME:
+                        st = entry.stat()
+                        output = str(Path(dest, "index.html"))
+                        found[entry.path] = (output, st.st_mtime_ns, st.st_size)
+
+        query = "SELECT source, output, mtime_ns, size FROM pages"
+        known = {
+            row["source"]: (row["output"], row["mtime_ns"], row["size"])
+            for row in self.conn.execute(query)
+        }
+        rows = []
+        for source, (output, mtime_ns, size) in found.items():
+            if known.get(source) == (output, mtime_ns, size):
+                continue
+            digest = hashlib.sha256(Path(source).read_bytes()).hexdigest()
+            rows.append((source, output, mtime_ns, size, digest, None))
+        removed = [(source,) for source in known.keys() - found.keys()]
+
+        with self.conn:
+            self.conn.executemany("DELETE FROM pages WHERE source = ?", removed)
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?)", rows
+            )
+        self.read += len(rows)
+        print(
+            f"content database: read {len(rows)} of {len(found)} pages, "
+            f"removed {len(removed)}"
+        )
+        return [(Path(source), Path(found[source][0])) for source in sorted(found)]
+
+    def pages(self) -> list[sqlite3.Row]:
+        """Return every page row, ordered by output path."""
+        return self.conn.execute("SELECT * FROM pages ORDER BY output").fetchall()
+
+    def set_titles(self, titles: dict[str, str]) -> None:
+        """Store the titles of generated pages, keyed by source path."""
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE pages SET title = ? WHERE source = ?",
+                [(title, source) for source, title in titles.items()],
+            )
+
+    def titles(self) -> dict[str, str | None]:
+        """Return the title of every page, None when it is not known yet."""
+        return dict(self.conn.execute("SELECT source, title FROM pages"))
+
+    def hashes(self) -> dict[str, str]:
+        """Return the source hash of every page, keyed by source path."""
+        return dict(self.conn.execute("SELECT source, hash FROM pages"))
@@ -0,0 +1,138 @@
+"""Module for caching the rendered html of markdown blocks between builds."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from collections import OrderedDict
+from pathlib import Path
+
+FRAGMENT_CACHE_VERSION = 1
+DEFAULT_MAX_BYTES = 64 << 20
+
+
+class FragmentCache:
+    """Rendered html of markdown blocks, least recently used first.
+
+    Entries are keyed by a hash of the rendering context, such as the url
+    resolver's cache_key, the block type and the block text, so a block
+    seen on any page before costs a lookup instead of a parse. Once the
+    stored html passes max_bytes, counted as utf-8, the oldest entries are
+    evicted.
+
+    A pool worker sets track_new so the entries it puts can be sent back
+    to the parent with take_new, elsewhere nothing is kept besides entries.
+    """
+
+    def __init__(self, path: Path | str = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = Path(path) if path is not None else None
+        self.max_bytes = max_bytes
+        self.entries: OrderedDict[str, str] = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.track_new = False
+        self._new: dict[str, str] = {}
+
+    @classmethod
+    def load(cls, path: Path | str, max_bytes: int = DEFAULT_MAX_BYTES):
+        """Load a cache from disk, starting empty if missing or outdated."""
+        cache = cls(path, max_bytes)
+        if not cache.path.is_file():
+            return cache
+
+        try:
+            with open(cache.path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            print(f"{cache.path} is unreadable, starting an empty fragment cache.")
+            return cache
+
+        if data.get("version") != FRAGMENT_CACHE_VERSION:
+            return cache
+        for key, html in data.get("fragments", []):
+            cache._store(key, html)
+        return cache
+
+    def save(self) -> None:
+        """Write the cache to its path, oldest entries first."""
+        data = {
+            "version": FRAGMENT_CACHE_VERSION,
+            "fragments": list(self.entries.items()),
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        tmp_path.replace(self.path)
+
+    @staticmethod
+    def key(context: str, block_type: str, block: str) -> str:
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(f"{context}\0{block_type}\0".encode())
+        digest.update(block.encode())
+        return digest.hexdigest()
+
+    def get(self, key: str) -> str | None:
+        html = self.entries.get(key)
+        if html is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return html
+
+    def put(self, key: str, html: str) -> None:
+        self._store(key, html)
+        if self.track_new:
+            self._new[key] = html
+
+    def _store(self, key: str, html: str) -> None:
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.size -= _byte_size(old)
+        size = _byte_size(html)
+        if size > self.max_bytes:
+            return
+        self.entries[key] = html
+        self.size += size
+        while self.size > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= _byte_size(evicted)
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self._new.clear()
+        self.size = 0
+
+    def take_new(self) -> dict[str, str]:
+        """Return the entries put since the last call, for merging the work
+        of another process with update."""
+        new, self._new = self._new, {}
+        return new
+
+    def update(self, entries: dict[str, str]) -> None:
+        for key, html in entries.items():
+            self._store(key, html)
+
+    def take_counts(self) -> tuple[int, int]:
+        """Return the hits and misses since the last call, for adding the
+        lookups of another process with add_counts."""
+        counts = (self.hits, self.misses)
+        self.hits = self.misses = 0
+        return counts
+
+    def add_counts(self, counts: tuple[int, int]) -> None:
+        hits, misses = counts
+        self.hits += hits
+        self.misses += misses
+
+    def stats(self) -> str:
+        return (
+            f"fragment cache: {self.hits} hits, {self.misses} misses, "
+            f"{len(self.entries)} fragments, {self.size} bytes"
+        )
+
+
+def _byte_size(html: str) -> int:
+    return len(html) if html.isascii() else len(html.encode())
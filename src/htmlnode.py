@@ -2,10 +2,17 @@
 
 from __future__ import annotations
 
+import re
+from typing import Iterable, Iterator, TextIO
+
+from raw_to_textnode import InlineSpan, inline_spans, spans_to_textnodes
 from textnode import TextNode, TextType
+from urls import URLResolver
 
 
 class HTMLNode:
+    __slots__ = ("tag", "value", "children", "props")
+
     def __init__(
         self,
         tag: str = None,
@@ -23,9 +30,7 @@ class HTMLNode:
 
     def props_to_html(self):
         """Return a dict[str, str] into html properties."""
-        if self.props is None:
-            return ""
-        return "".join([f" {k}={v}" for k, v in self.props.items()])
+        return props_html(self.props)
 
     def __repr__(self):
         """ "Print properties for htmlNode."""
@@ -33,6 +38,8 @@ class HTMLNode:
 
 
 class LeafNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(
         self,
         tag=None,
@@ -46,13 +53,12 @@ class LeafNode(HTMLNode):
             raise ValueError("all leaf nodes must have a value.")
 
         # self.value = self.value.replace("\n", " ")
-        if self.tag is None:
-            return str(self.value)
-        else:
-            return f"<{self.tag}{self.props_to_html()}>{self.value}</{self.tag}>"
+        return leaf_html(self.tag, str(self.value), self.props)
 
 
 class ParentNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(
         self,
         tag,
@@ -62,40 +68,218 @@ class ParentNode(HTMLNode):
         super().__init__(tag, None, children, props)
 
     def to_html(self):
-        if self.tag is None:
-            raise ValueError("tag cannot be none.")
-        if self.children is None:
-            raise ValueError("children cannot be none for parent node.")
+        return "".join(iter_html(self))
+
+
+# chunks are joined up to this many characters before each write.
+WRITE_BUFFER_SIZE = 1 << 16
+
+
+def iter_html(node: HTMLNode) -> Iterator[str]:
+    """Yield the html of node in chunks, walking the tree without recursion."""
+    stack: list[tuple[Iterator[HTMLNode], str]] = [(iter((node,)), "")]
+    while stack:
+        children, end_tag = stack[-1]
+        for child in children:
+            if not isinstance(child, ParentNode):
+                yield child.to_html()
+                continue
+
+            if child.tag is None:
+                raise ValueError("tag cannot be none.")
+            if child.children is None:
+                raise ValueError("children cannot be none for parent node.")
+            yield f"<{child.tag}{child.props_to_html()}>"
+            stack.append((iter(child.children), f"</{child.tag}>"))
+            break
+        else:
+            stack.pop()
+            if end_tag:
+                yield end_tag
+
+
+def write_html(node: HTMLNode, out: TextIO) -> int:
+    """Stream the html of node into anything with a write method, such as a
+    file, io.StringIO or socket.makefile("w"). Returns characters written."""
+    return write_chunks(iter_html(node), out)
+
+
+def write_chunks(chunks: Iterable[str], out: TextIO) -> int:
+    """Write chunks into out in WRITE_BUFFER_SIZE batches, returning the
+    characters written."""
+    written = 0
+    buffer = []
+    buffered = 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        buffered += len(chunk)
+        if buffered >= WRITE_BUFFER_SIZE:
+            out.write("".join(buffer))
+            written += buffered
+            buffer.clear()
+            buffered = 0
+    if buffer:
+        out.write("".join(buffer))
+        written += buffered
+    return written
+
+
+def props_html(props: dict[str, str] | None) -> str:
+    """Render props as html attributes, values exactly as given."""
+    if props is None:
+        return ""
+    return "".join([f" {k}={v}" for k, v in props.items()])
+
+
+# elements without content, a minified page leaves out their end tag.
+VOID_TAGS = frozenset(("img",))
 
-        result_start = f"<{self.tag}{self.props_to_html()}>"
-        result = ""
-        result_end = f"</{self.tag}>"
-        for child in self.children:
-            result += child.to_html()
 
-        return result_start + result + result_end
+def leaf_html(
+    tag: str | None, value: str, props: dict[str, str] = None, minify: bool = False
+) -> str:
+    """Render an element without children, as LeafNode.to_html does."""
+    if tag is None:
+        return value
+    if minify and tag in VOID_TAGS:
+        return f"<{tag}{props_html(props)}>"
+    return f"<{tag}{props_html(props)}>{value}</{tag}>"
 
 
-def text_node_to_html_node(text_node: TextNode) -> HTMLNode:
-    """Convert a text node into html node."""
-    if text_node.text_type == TextType.TEXT:
-        return LeafNode(None, text_node.text)
+_INLINE_TAGS = {
+    TextType.BOLD_TEXT: "b",
+    TextType.ITALIC_TEXT: "i",
+    TextType.CODE_TEXT: "code",
+}
 
-    if text_node.text_type == TextType.BOLD_TEXT:
-        return LeafNode("b", text_node.text)
 
-    if text_node.text_type == TextType.ITALIC_TEXT:
-        return LeafNode("i", text_node.text)
+def inline_element(
+    text_type: TextType,
+    text: str,
+    url: str = None,
+    resolver: URLResolver = None,
+    minify: bool = False,
+) -> tuple[str | None, str, dict[str, str] | None]:
+    """Return the (tag, value, props) an inline token renders as.
 
-    if text_node.text_type == TextType.CODE_TEXT:
-        return LeafNode("code", text_node.text)
+    This is the one place both text_node_to_html_node and inline_html take
+    their markup from. Link and image urls are passed through the resolver
+    when one is given, and images get its extra attributes.
+    """
+    if text_type == TextType.TEXT:
+        return None, collapse_whitespace(text) if minify else text, None
 
+    tag = _INLINE_TAGS.get(text_type)
+    if tag is not None:
+        if minify and text_type != TextType.CODE_TEXT:
+            text = collapse_whitespace(text)
+        return tag, text, None
+
+    if text_type == TextType.LINKS:
+        if resolver:
+            url = resolver.resolve(url)
+        if minify:
+            return "a", collapse_whitespace(text), {"href": minified_attribute(url)}
+        return "a", text, {"href": f'"{url}"'}
+
+    if text_type == TextType.IMAGE:
+        attributes = resolver.image_attributes(url) if resolver else {}
+        if resolver:
+            url = resolver.resolve(url)
+        if minify:
+            props = {"src": minified_attribute(url), "alt": minified_attribute(text)}
+        else:
+            props = {"src": f'"{url}"', "alt": text}
+        props.update(attributes)
+        return "img", "", props
+
+    raise ValueError(f"invalid text type: {text_type}")
+
+
+def _link_label_spans(label: str) -> list[InlineSpan] | None:
+    """Parse the inline markup of a link label, None when it is plain text."""
+    if "*" not in label and "_" not in label and "`" not in label:
+        return None
+    try:
+        spans = inline_spans(label)
+    except ValueError:
+        return None
+    if len(spans) == 1 and spans[0][0] == TextType.TEXT:
+        return None
+    return spans
+
+
+def text_node_to_html_node(
+    text_node: TextNode, resolver: URLResolver = None
+) -> HTMLNode:
+    """Convert a text node into html node.
+
+    Link and image urls are passed through the resolver when one is given.
+    A link label with bold, italic or code in it becomes nested nodes.
+    """
+    tag, value, props = inline_element(
+        text_node.text_type, text_node.text, text_node.url, resolver
+    )
     if text_node.text_type == TextType.LINKS:
-        return LeafNode("a", text_node.text, props={"href": f'"{text_node.url}"'})
+        spans = _link_label_spans(text_node.text)
+        if spans is not None:
+            label = spans_to_textnodes(text_node.text, spans)
+            children = [text_node_to_html_node(node, resolver) for node in label]
+            return ParentNode(tag, children, props=props)
+    return LeafNode(tag, value, props=props)
+
+
+# characters that force an attribute value into quotes.
+_UNQUOTED_UNSAFE = frozenset(" \t\n\r\f\"'=<>`")
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def minified_attribute(value: str) -> str:
+    """Return value as the shortest valid attribute value, quoted only when
+    it has to be."""
+    if value and _UNQUOTED_UNSAFE.isdisjoint(value):
+        return value
+    return '"' + value.replace('"', "&quot;") + '"'
+
+
+def collapse_whitespace(text: str) -> str:
+    """Collapse whitespace runs into one space, as html renders them."""
+    return _WHITESPACE_PATTERN.sub(" ", text)
+
+
+def inline_html(text: str, resolver: URLResolver = None, minify: bool = False) -> str:
+    """Render the inline markdown of text straight from its spans.
+
+    The html is the same as converting every node of text_to_textnodes with
+    text_node_to_html_node, without building either node per token. With
+    minify whitespace is collapsed outside code and attributes are only
+    quoted when needed.
+
+    Minify only exists on this streamed path, which pages are written
+    through. Node trees always render in full with to_html, their props are
+    stored already quoted.
+    """
+    parts: list[str] = []
+    _render_spans(text, inline_spans(text), resolver, parts, minify)
+    return "".join(parts)
 
-    if text_node.text_type == TextType.IMAGE:
-        return LeafNode(
-            "img", "", props={"src": f'"{text_node.url}"', "alt": text_node.text}
-        )
 
-    raise ValueError(f"invalid text type: {text_node.text_type}")
+def _render_spans(
+    text: str,
+    spans: list[InlineSpan],
+    resolver: URLResolver,
+    parts: list[str],
+    minify: bool = False,
+) -> None:
+    for text_type, start, end, url_start, url_end in spans:
+        label = text[start:end]
+        url = text[url_start:url_end] if url_start != -1 else None
+        tag, value, props = inline_element(text_type, label, url, resolver, minify)
+        if text_type == TextType.LINKS:
+            label_spans = _link_label_spans(label)
+            if label_spans is not None:
+                parts.append(f"<{tag}{props_html(props)}>")
+                _render_spans(label, label_spans, resolver, parts, minify)
+                parts.append(f"</{tag}>")
+                continue
+        parts.append(leaf_html(tag, value, props, minify))
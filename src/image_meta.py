@@ -0,0 +1,167 @@
+"""Module for reading image sizes from PNG, GIF, WebP and JPEG headers.
+
+Only the few header bytes holding the size are read, no image library is
+needed. ImageIndex keeps the sizes between builds, so an image is parsed
+again only when its size or mtime changes.
+"""
+
+from __future__ import annotations
+
+import json
+import struct
+from pathlib import Path
+from typing import BinaryIO
+
+from static_sync import scan_files
+
+IMAGE_INDEX_VERSION = 1
+IMAGE_SUFFIXES = (".png", ".gif", ".webp", ".jpg", ".jpeg")
+
+# jpeg start of frame markers, the ones carrying the image size.
+_JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+# jpeg markers without a length field.
+_JPEG_STANDALONE_MARKERS = frozenset((0x01, *range(0xD0, 0xD9)))
+
+
+def read_image_size(f: BinaryIO) -> tuple[int, int] | None:
+    """Return the (width, height) of the image file f, or None when it is
+    not a PNG, GIF, WebP or JPEG image."""
+    head = f.read(30)
+    if head.startswith(b"\x89PNG\r\n\x1a\n") and head[12:16] == b"IHDR":
+        return struct.unpack(">II", head[16:24])
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return struct.unpack("<HH", head[6:10])
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return _webp_size(head)
+    if head[:2] == b"\xff\xd8":
+        f.seek(2)
+        return _jpeg_size(f)
+    return None
+
+
+def _webp_size(head: bytes) -> tuple[int, int] | None:
+    chunk = head[12:16]
+    if chunk == b"VP8L" and len(head) >= 25 and head[20] == 0x2F:
+        bits = int.from_bytes(head[21:25], "little")
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if len(head) < 30:
+        return None
+    if chunk == b"VP8 " and head[23:26] == b"\x9d\x01\x2a":
+        width, height = struct.unpack("<HH", head[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8X":
+        width = int.from_bytes(head[24:27], "little") + 1
+        height = int.from_bytes(head[27:30], "little") + 1
+        return width, height
+    return None
+
+
+def _jpeg_size(f: BinaryIO) -> tuple[int, int] | None:
+    """Walk the jpeg segments from after the start of image marker to the
+    first start of frame."""
+    while True:
+        byte = f.read(1)
+        if not byte:
+            return None
+        if byte != b"\xff":
+            continue
+        marker = f.read(1)
+        while marker == b"\xff":
+            marker = f.read(1)
+        if not marker:
+            return None
+        code = marker[0]
+        if code in _JPEG_STANDALONE_MARKERS:
+            continue
+        if code in (0xD9, 0xDA):
+            # end of image or start of scan, no frame header came before.
+            return None
+        length_bytes = f.read(2)
+        if len(length_bytes) < 2:
+            return None
+        (length,) = struct.unpack(">H", length_bytes)
+        if code in _JPEG_SOF_MARKERS:
+            frame = f.read(5)
+            if len(frame) < 5:
+                return None
+            height, width = struct.unpack(">HH", frame[1:5])
+            return width, height
+        f.seek(length - 2, 1)
+
+
+def image_size(path: Path | str) -> tuple[int, int] | None:
+    with open(path, "rb") as f:
+        return read_image_size(f)
+
+
+class ImageIndex:
+    """Pixel sizes of the images under a folder, keyed by relative path.
+
+    Every entry remembers the file size and mtime it was read at, and is
+    only read again once either changes.
+    """
+
+    def __init__(self, path: Path | str = None):
+        self.path = Path(path) if path is not None else None
+        self.entries: dict[str, dict] = {}
+        self.parsed = 0
+
+    @classmethod
+    def load(cls, path: Path | str) -> ImageIndex:
+        """Load an index from disk, starting empty if missing or outdated."""
+        index = cls(path)
+        if not index.path.is_file():
+            return index
+
+        try:
+            with open(index.path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            print(f"{index.path} is unreadable, starting an empty image index.")
+            return index
+
+        if data.get("version") == IMAGE_INDEX_VERSION:
+            index.entries = data.get("images", {})
+        return index
+
+    def save(self) -> None:
+        data = {"version": IMAGE_INDEX_VERSION, "images": self.entries}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=1, sort_keys=True)
+        tmp_path.replace(self.path)
+
+    def scan(self, root: Path | str) -> dict[str, tuple[int, int]]:
+        """Refresh the index from the images under root and return the size
+        of every image that could be read, keyed by relative posix path."""
+        entries = {}
+        for rel, stat in sorted(scan_files(root).items()):
+            if not rel.lower().endswith(IMAGE_SUFFIXES):
+                continue
+            entry = self.entries.get(rel)
+            if entry is None or (entry["size"], entry["mtime_ns"]) != (
+                stat.st_size,
+                stat.st_mtime_ns,
+            ):
+                try:
+                    size = image_size(Path(root, rel))
+                except OSError:
+                    size = None
+                if size is None:
+                    print(f"cannot read the size of image {Path(root, rel)}")
+                self.parsed += 1
+                entry = {
+                    "size": stat.st_size,
+                    "mtime_ns": stat.st_mtime_ns,
+                    "width": size[0] if size else None,
+                    "height": size[1] if size else None,
+                }
+            entries[rel] = entry
+        self.entries = entries
+
+        return {
+            rel: (entry["width"], entry["height"])
+            for rel, entry in entries.items()
+            if entry["width"] is not None
+        }
@@ -4,7 +4,35 @@ import argparse
 import shutil
 from pathlib import Path
 
+import profiling
+from assets import sync_assets
+from content_db import ContentDB
+from fragment_cache import FragmentCache
+from image_meta import ImageIndex
+from manifest import BuildManifest
 from markdown_html import generate_pages_recursive
+from output_sink import (
+    MEMORY_TARGET,
+    CompressingSink,
+    DiskSink,
+    MemorySink,
+    OutputSink,
+    open_sink,
+)
+from precompress import precompress_tree, remove_precompressed
+from search_index import SearchIndex
+from serve import PreviewServer
+from static_sync import SYNC_MODES
+from urls import URLResolver
+from watch import watch_and_rebuild
+
+MANIFEST_PATH = "./.build_manifest.json"
+TRACE_PATH = "./build_trace.json"
+MEMPROFILE_PATH = "./build_memprofile.json"
+FRAGMENT_CACHE_PATH = "./.fragment_cache.json"
+IMAGE_INDEX_PATH = "./.image_index.json"
+SEARCH_INDEX_PATH = "./.search_index.json"
+CONTENT_DB_PATH = "./.content.db"
 
 
 def clear_folder_contents(path: Path | str) -> None:
@@ -26,37 +54,137 @@ def clear_folder_contents(path: Path | str) -> None:
         raise Exception("there are still some files inside.")
 
 
-def copy_folder_contents(from_path: Path | str, to_path: Path | str) -> None:
+def copy_folder_contents(
+    from_path: Path | str, to_path: Path | str, sink: OutputSink = None
+) -> None:
     print(f"copying all files in from {from_path} to {to_path}")
 
     from_path: Path = Path(from_path)
     to_path: Path = Path(to_path)
-
-    if not to_path.is_dir():
-        print(f"{to_path} doesnt exist, creating it.")
-        to_path.mkdir(parents=True, exist_ok=True)
+    sink = sink or DiskSink(to_path)
 
     for file in from_path.iterdir():
         if file.is_file():
             print(f"copying {file} to {to_path}")
-            shutil.copy(file, to_path)
+            sink.copy_file(file, Path(to_path, file.name))
         elif file.is_dir():
             new_to_path = Path(to_path, file.name)
-            copy_folder_contents(file, new_to_path)
+            copy_folder_contents(file, new_to_path, sink)
+
+
+def main(
+    basepath: str,
+    clean: bool = False,
+    sync_mode: str = "copy",
+    checksum: bool = False,
+    jobs: int = 1,
+    profile: bool = False,
+    trace_path: str = TRACE_PATH,
+    fragments: FragmentCache = None,
+    precompress: bool = False,
+    minify: bool = False,
+    fingerprint: bool = False,
+    image_index: ImageIndex = None,
+    sink: OutputSink = None,
+    search: SearchIndex = None,
+    memprofile: bool = False,
+    memprofile_path: str = MEMPROFILE_PATH,
+    content_db: ContentDB = None,
+) -> None:
+    """Main entry point for sh files.
 
+    Pages and static files are rebuilt incrementally using the build manifest,
+    pass clean to wipe ./docs and regenerate everything. Rendered blocks are
+    reused from fragments when given. With precompress every compressible
+    output gets .gz (and .br with brotli installed) sidecars. With minify
+    pages are written without insignificant whitespace. With fingerprint
+    static files get content hashed names that pages and the template link
+    to. With an image_index, img tags of static images get their width and
+    height. With a search index, ./docs/search gets the shards of a client
+    side search index, only rewriting the ones whose terms changed. With a
+    content_db the pages are found and checked through it instead of walking
+    and hashing ./content. With profile or memprofile the pages are built
+    serially and their stage timings, or peak and retained memory, reported.
 
-def main(basepath: str) -> None:
-    """Main entry point for sh files."""
+    With a sink every file is written into it instead, in one full build
+    that leaves ./docs and the build manifest alone.
+    """
 
-    clear_folder_contents("./docs")
-    copy_folder_contents("./static", "./docs")
+    if profile:
+        profiler = profiling.enable()
+    if memprofile:
+        memory_profiler = profiling.enable_memory()
+    if (profile or memprofile) and jobs != 1:
+        print("profiling runs in a single process, ignoring --jobs")
+        jobs = 1
+
+    if clean:
+        clear_folder_contents("./docs")
+        Path(MANIFEST_PATH).unlink(missing_ok=True)
+        if fragments is not None:
+            fragments.clear()
+        if search is not None:
+            search.clear()
+
+    manifest = BuildManifest.load(MANIFEST_PATH) if sink is None else None
+    if sink is not None and precompress:
+        sink = CompressingSink(sink)
+    if sink is not None and search is not None:
+        # the saved index only knows what ./docs holds, a sink gets every shard.
+        search = SearchIndex()
+    assets = sync_assets(
+        "./static",
+        "./docs",
+        manifest=manifest,
+        mode=sync_mode,
+        checksum=checksum,
+        fingerprint=fingerprint,
+        sink=sink,
+    )
+    images = None
+    if image_index is not None:
+        images = image_index.scan("./static")
+        image_index.save()
 
     generate_pages_recursive(
         dir_path_content="./content",
         template_path="./template.html",
         dest_dir_path="./docs",
         basepath=basepath,
+        manifest=manifest,
+        jobs=jobs,
+        resolver=URLResolver(basepath, assets, images),
+        fragments=fragments,
+        minify=minify,
+        sink=sink,
+        search=search,
+        content_db=content_db,
     )
+    if search is not None:
+        search.write(sink or DiskSink("./docs"), basepath)
+        if search.path is not None:
+            search.save()
+    if manifest is not None:
+        manifest.prune()
+        if precompress:
+            precompress_tree("./docs", manifest)
+        else:
+            remove_precompressed("./docs", manifest)
+        manifest.save()
+    if fragments is not None:
+        fragments.save()
+        print(fragments.stats())
+
+    if profile:
+        profiling.disable()
+        print(profiler.summary())
+        profiler.write_trace(trace_path)
+        print(f"trace written to {trace_path}, open it in chrome://tracing")
+    if memprofile:
+        profiling.disable_memory()
+        print(memory_profiler.summary())
+        memory_profiler.write_report(memprofile_path)
+        print(f"memory report written to {memprofile_path}")
 
 
 if __name__ == "__main__":
@@ -67,6 +195,189 @@ if __name__ == "__main__":
         default="/",
         help="base path to generate the website pages",
     )
+    parser.add_argument(
+        "--clean",
+        action="store_true",
+        help="delete ./docs and the build manifest before building",
+    )
+    parser.add_argument(
+        "--sync-mode",
+        choices=SYNC_MODES,
+        default="copy",
+        help="how static files are placed into ./docs",
+    )
+    parser.add_argument(
+        "--checksum",
+        action="store_true",
+        help="compare static file contents when size matches but mtime differs",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="number of processes rendering pages, 0 uses every cpu",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="time every build stage per page and write a chrome trace",
+    )
+    parser.add_argument(
+        "--trace-file",
+        default=TRACE_PATH,
+        help="where --profile writes the chrome trace event json",
+    )
+    parser.add_argument(
+        "--memprofile",
+        action="store_true",
+        help="trace peak and retained memory per page and stage with tracemalloc",
+    )
+    parser.add_argument(
+        "--memprofile-file",
+        default=MEMPROFILE_PATH,
+        help="where --memprofile writes its json report",
+    )
+    parser.add_argument(
+        "--no-fragment-cache",
+        action="store_true",
+        help="render every block instead of reusing html cached between builds",
+    )
+    parser.add_argument(
+        "--precompress",
+        action="store_true",
+        help="write .gz and .br sidecars of compressible files in ./docs",
+    )
+    parser.add_argument(
+        "--minify",
+        action="store_true",
+        help="write pages without insignificant whitespace and optional tags",
+    )
+    parser.add_argument(
+        "--fingerprint",
+        action="store_true",
+        help="write static files under content hashed names for long caching",
+    )
+    parser.add_argument(
+        "--no-content-db",
+        action="store_true",
+        help="walk and hash ./content every build instead of using its database",
+    )
+    parser.add_argument(
+        "--no-image-sizes",
+        action="store_true",
+        help="leave width, height and lazy loading off img tags",
+    )
+    parser.add_argument(
+        "--search",
+        action="store_true",
+        help="write a sharded client side search index to ./docs/search",
+    )
+    parser.add_argument(
+        "--output",
+        help="build everything into a .zip or .tar[.gz|.bz2|.xz] archive, or "
+        f"{MEMORY_TARGET} with --serve, instead of updating ./docs",
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="serve ./docs from memory after building, reloading after rebuilds",
+    )
+    parser.add_argument(
+        "--bind",
+        default="",
+        help="address --serve listens on, every interface by default",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=8888,
+        help="port --serve listens on",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="keep running and rebuild what changes in content, static and template",
+    )
+    parser.add_argument(
+        "--poll",
+        action="store_true",
+        help="watch by polling file stats instead of inotify",
+    )
     args = parser.parse_args()
+    if args.output is not None and args.watch:
+        parser.error("--watch only rebuilds ./docs, it can't be used with --output")
+    if args.output == MEMORY_TARGET and not args.serve:
+        parser.error(f"--output {MEMORY_TARGET} is only useful with --serve")
+    sink = None
+    if args.output is not None:
+        try:
+            sink = open_sink(args.output, "./docs")
+        except ValueError as e:
+            parser.error(str(e))
+
+    fragments = None
+    if not args.no_fragment_cache:
+        fragments = FragmentCache.load(FRAGMENT_CACHE_PATH)
+    image_index = None
+    if not args.no_image_sizes:
+        image_index = ImageIndex.load(IMAGE_INDEX_PATH)
+    content_db = None
+    if not args.no_content_db:
+        content_db = ContentDB.load(CONTENT_DB_PATH)
+    search = None
+    if args.search:
+        search = SearchIndex.load(SEARCH_INDEX_PATH)
+
+    main(
+        args.basepath,
+        clean=args.clean,
+        sync_mode=args.sync_mode,
+        checksum=args.checksum,
+        jobs=args.jobs,
+        profile=args.profile,
+        trace_path=args.trace_file,
+        fragments=fragments,
+        precompress=args.precompress,
+        minify=args.minify,
+        fingerprint=args.fingerprint,
+        image_index=image_index,
+        sink=sink,
+        search=search,
+        memprofile=args.memprofile,
+        memprofile_path=args.memprofile_file,
+        content_db=content_db,
+    )
+    if sink is not None:
+        sink.close()
+        if args.output != MEMORY_TARGET:
+            print(f"wrote {args.output}")
 
-    main(args.basepath)
+    server = None
+    if isinstance(sink, MemorySink):
+        server = PreviewServer("./docs", args.basepath, files=sink.files)
+    elif args.serve:
+        server = PreviewServer("./docs", args.basepath)
+    if args.watch:
+        if server is not None:
+            server.serve_in_thread(args.bind, args.port)
+        watch_and_rebuild(
+            content_dir="./content",
+            static_dir="./static",
+            template_path="./template.html",
+            dest_dir="./docs",
+            basepath=args.basepath,
+            manifest=BuildManifest.load(MANIFEST_PATH),
+            sync_mode=args.sync_mode,
+            polling=args.poll,
+            fragments=fragments,
+            precompress=args.precompress,
+            minify=args.minify,
+            fingerprint=args.fingerprint,
+            image_index=image_index,
+            search=search,
+            content_db=content_db,
+            on_rebuild=server.reload if server is not None else None,
+        )
+    elif server is not None:
+        server.serve(args.bind, args.port)
@@ -0,0 +1,176 @@
+"""Module for tracking build inputs and outputs between runs."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from pathlib import Path
+
+from template import template_digest
+
+MANIFEST_VERSION = 1
+
+
+def file_hash(path: Path | str) -> str:
+    """Return the sha256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BuildManifest:
+    """Persistent record of what each generated page was built from.
+
+    Every page entry is keyed by its source path and stores the source hash,
+    the template and basepath it was rendered with, and the hash of the
+    output written. A page is fresh when all of those still match.
+
+    Static files copied by the asset sync are kept under assets, keyed by
+    their path relative to the static folder. Files given precompressed
+    sidecars are kept under compressed, keyed by their path in the output.
+    """
+
+    def __init__(
+        self,
+        path: Path | str,
+        pages: dict[str, dict] = None,
+        assets: dict[str, dict] = None,
+        compressed: dict[str, dict] = None,
+    ):
+        self.path = Path(path)
+        self.pages = pages if pages is not None else {}
+        self.assets = assets if assets is not None else {}
+        self.compressed = compressed if compressed is not None else {}
+        self._seen: set[str] = set()
+        self._template_hashes: dict[str, str] = {}
+
+    @classmethod
+    def load(cls, path: Path | str) -> BuildManifest:
+        """Load a manifest from disk, starting empty if missing or outdated."""
+        path = Path(path)
+        if not path.is_file():
+            return cls(path)
+
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            print(f"{path} is unreadable, starting a full build.")
+            return cls(path)
+
+        if data.get("version") != MANIFEST_VERSION:
+            print(f"{path} is from another manifest version, starting a full build.")
+            return cls(path)
+
+        return cls(
+            path,
+            data.get("pages", {}),
+            data.get("assets", {}),
+            data.get("compressed", {}),
+        )
+
+    def save(self) -> None:
+        data = {
+            "version": MANIFEST_VERSION,
+            "pages": self.pages,
+            "assets": self.assets,
+            "compressed": self.compressed,
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=1, sort_keys=True)
+        tmp_path.replace(self.path)
+
+    def template_hash(self, template_path: Path | str) -> str:
+        """Hash a template and its layouts once per build."""
+        key = str(template_path)
+        if key not in self._template_hashes:
+            self._template_hashes[key] = template_digest(template_path)
+        return self._template_hashes[key]
+
+    def is_fresh(
+        self,
+        from_path: Path | str,
+        template_path: Path | str,
+        dest_path: Path | str,
+        basepath: str,
+        source_hash: str = None,
+    ) -> bool:
+        """Check whether the page output is up to date with its inputs.
+
+        source_hash saves hashing the source when it is already known.
+        """
+        key = str(from_path)
+        self._seen.add(key)
+
+        entry = self.pages.get(key)
+        if entry is None:
+            return False
+        if entry["output"] != str(dest_path) or entry["basepath"] != basepath:
+            return False
+        if entry["template"] != str(template_path):
+            return False
+        if entry["template_hash"] != self.template_hash(template_path):
+            return False
+        if not Path(dest_path).is_file():
+            return False
+        if entry["source_hash"] != (source_hash or file_hash(from_path)):
+            return False
+        return entry["output_hash"] == file_hash(dest_path)
+
+    def record(
+        self,
+        from_path: Path | str,
+        template_path: Path | str,
+        dest_path: Path | str,
+        basepath: str,
+        source_hash: str = None,
+    ) -> None:
+        """Store the inputs and output hash of a freshly generated page."""
+        key = str(from_path)
+        self._seen.add(key)
+        self.pages[key] = {
+            "output": str(dest_path),
+            "basepath": basepath,
+            "template": str(template_path),
+            "template_hash": self.template_hash(template_path),
+            "source_hash": source_hash or file_hash(from_path),
+            "output_hash": file_hash(dest_path),
+        }
+
+    def remove_page(self, from_path: Path | str) -> Path | None:
+        """Forget a page whose source is gone and delete its output."""
+        key = str(from_path)
+        entry = self.pages.pop(key, None)
+        self._seen.discard(key)
+        if entry is None:
+            return None
+
+        output = Path(entry["output"])
+        live_outputs = {e["output"] for e in self.pages.values()}
+        if entry["output"] in live_outputs or not output.is_file():
+            return None
+        print(f"{key} was removed, deleting {output}")
+        output.unlink()
+        try:
+            output.parent.rmdir()
+        except OSError:
+            pass
+        return output
+
+    def prune(self) -> list[Path]:
+        """Delete outputs of pages whose sources were not seen this build."""
+        removed = []
+        for key in sorted(set(self.pages) - self._seen):
+            output = self.remove_page(key)
+            if output is not None:
+                removed.append(output)
+        return removed
+
+    def reset(self) -> None:
+        """Drop per build state so the manifest can be reused by another build."""
+        self._seen.clear()
+        self._template_hashes.clear()
@@ -1,6 +1,9 @@
 """Modules for processing markdown raw text."""
 
+from __future__ import annotations
+
 from enum import Enum
+from typing import Iterable, Iterator
 
 
 class BlockType(Enum):
@@ -18,6 +21,70 @@ def markdown_to_blocks(text: str) -> list[str]:
     return result
 
 
+def iter_blocks(lines: Iterable[str]) -> Iterator[str]:
+    """Yield the blocks markdown_to_blocks would return, reading lines lazily.
+
+    lines are "\n" terminated like the lines of a text file, so splitting on
+    "\n\n" means a line's newline plus a following empty line. Only the
+    current block is held in memory.
+    """
+    lines = iter(lines)
+    current: list[str] = []
+    line = next(lines, None)
+    while line is not None:
+        following = next(lines, None)
+        if following == "\n" and line.endswith("\n"):
+            current.append(line[:-1])
+            block = "".join(current)
+            if block:
+                yield block.strip()
+            current = []
+            following = next(lines, None)
+        else:
+            current.append(line)
+        line = following
+
+    block = "".join(current)
+    if block:
+        yield block.strip()
+
+
+class BlockScanner:
+    """Scan markdown blocks and their block types from a stream of lines,
+    such as an open text file, capturing the page title along the way."""
+
+    def __init__(self, lines: Iterable[str]):
+        self._lines = iter(lines)
+        self._read_ahead: list[str] = []
+        self._title: str | None = None
+
+    def title(self) -> str:
+        """Return the first non empty line without its "# ", like
+        extract_title, reading no further than that line."""
+        if self._title is None:
+            for line in self._lines:
+                self._read_ahead.append(line)
+                if line != "\n":
+                    break
+            first = self._read_ahead[-1] if self._read_ahead else ""
+            if not first.startswith("# "):
+                raise Exception("expecting header 1 as first line.")
+            self._title = first[2:].removesuffix("\n")
+        return self._title
+
+    def blocks(self) -> Iterator[str]:
+        return iter_blocks(self._read_lines())
+
+    def __iter__(self) -> Iterator[tuple[str, BlockType]]:
+        for block in self.blocks():
+            yield block, block_to_blocktype(block)
+
+    def _read_lines(self) -> Iterator[str]:
+        yield from self._read_ahead
+        self._read_ahead = []
+        yield from self._lines
+
+
 def block_to_blocktype(block: str) -> BlockType:
     if block.startswith("#"):
         header, _ = block.split(" ", maxsplit=1)
@@ -1,11 +1,36 @@
 """Module for converting markdown to html."""
 
+import itertools
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Iterable, Iterator
 
-from htmlnode import HTMLNode, LeafNode, ParentNode, text_node_to_html_node
-from markdown_blocks import BlockType, block_to_blocktype, markdown_to_blocks
+import profiling
+from content_db import ContentDB
+from fragment_cache import FragmentCache
+from htmlnode import (
+    HTMLNode,
+    LeafNode,
+    ParentNode,
+    collapse_whitespace,
+    inline_html,
+    text_node_to_html_node,
+)
+from manifest import BuildManifest
+from markdown_blocks import (
+    BlockScanner,
+    BlockType,
+    block_to_blocktype,
+    markdown_to_blocks,
+)
+from output_sink import DiskSink, MemorySink, OutputSink
 from raw_to_textnode import text_to_textnodes
+from search_index import SearchIndex, count_terms
+from template import DIRECTORY_TEMPLATE_NAME, find_template, load_template
 from textnode import TextNode, TextType
+from urls import URLResolver
 
 """
 html that are parentnode
@@ -16,59 +41,273 @@ html that are parentnode
 """
 
 
+# below this many stale pages a process pool costs more than it saves.
+PARALLEL_MIN_PAGES = 16
+
+
+def discover_pages(
+    dir_path_content: Path | str, dest_dir_path: Path | str
+) -> list[tuple[Path, Path]]:
+    """Walk the content folder and pair every file with its output path.
+
+    Per directory templates are not pages and are skipped.
+    """
+    dir_path_content: Path = Path(dir_path_content)
+    dest_dir_path: Path = Path(dest_dir_path)
+
+    pages = []
+    for file in dir_path_content.iterdir():
+        if file.is_file() and file.name != DIRECTORY_TEMPLATE_NAME:
+            pages.append((file, Path(dest_dir_path, "index.html")))
+        if file.is_dir():
+            new_dest_dir = Path(dest_dir_path, file.name)
+            pages.extend(discover_pages(file, new_dest_dir))
+
+    return pages
+
+
 def generate_pages_recursive(
     dir_path_content: str,
     template_path: str,
     dest_dir_path: str,
     basepath: str,
+    manifest: BuildManifest = None,
+    jobs: int = 1,
+    resolver: URLResolver = None,
+    fragments: FragmentCache = None,
+    minify: bool = False,
+    sink: OutputSink = None,
+    search: SearchIndex = None,
+    content_db: ContentDB = None,
 ) -> None:
+    """Generate a page for every content file, skipping ones the manifest
+    reports as up to date.
 
-    dir_path_content: Path = Path(dir_path_content)
-    template_path: Path = Path(template_path)
-    dest_dir_path: Path = Path(dest_dir_path)
+    Each page uses the closest _template.html above it in the content folder,
+    falling back to template_path. With jobs above 1 the pages are rendered in
+    a process pool, jobs of 0 uses every cpu. Small builds always run serially.
+    Links are resolved with resolver, by default one for basepath. Rendered
+    blocks are looked up in and added to fragments when given. With minify
+    the pages are written without insignificant whitespace.
 
-    for file in dir_path_content.iterdir():
-        if file.is_file():
-            dest_path_html = Path(dest_dir_path, "index.html")
-            generate_page(file, template_path, dest_path_html, basepath)
-        if file.is_dir():
-            new_dest_dir = Path(dest_dir_path, file.name)
-            generate_pages_recursive(file, template_path, new_dest_dir, basepath)
+    Pages are written into sink, by default straight into dest_dir_path.
+    Pool workers can't share a sink other than the disk, they send their
+    pages back to be written here instead.
+
+    The terms of every generated page are stored in search when given, and
+    pages it doesn't know yet are generated even when up to date. Pages
+    no longer in the content folder are removed from it.
+
+    With a content_db the pages are found by refreshing it, and checked
+    against the manifest with its stored source hashes. The title of every
+    generated page is stored in it, and pages it has no title for are
+    generated even when up to date.
+    """
+    resolver = resolver or URLResolver(basepath)
+    output_key = render_key(resolver, minify)
+
+    if content_db is not None:
+        found = content_db.refresh(dir_path_content, dest_dir_path)
+        source_hashes = content_db.hashes()
+        titles = content_db.titles()
+    else:
+        found = discover_pages(dir_path_content, dest_dir_path)
+        source_hashes = {}
+        titles = None
+
+    templates: dict[Path, Path] = {}
+    pages = [
+        (f, find_template(f, dir_path_content, template_path, templates), d)
+        for f, d in found
+    ]
+
+    if search is not None:
+        search.prune(d for _, _, d in pages)
+
+    if manifest is not None:
+        stale_pages = []
+        for from_path, page_template, dest_path in pages:
+            fresh = manifest.is_fresh(
+                from_path,
+                page_template,
+                dest_path,
+                output_key,
+                source_hashes.get(str(from_path)),
+            )
+            fresh = fresh and (search is None or dest_path in search)
+            fresh = fresh and (titles is None or titles.get(str(from_path)))
+            if fresh:
+                print(f"{dest_path} is up to date, skipping {from_path}")
+            else:
+                stale_pages.append((from_path, page_template, dest_path))
+        pages = stale_pages
+
+    collect = None
+    if sink is not None and not isinstance(sink, DiskSink):
+        collect = sink.root
+    index = search is not None
+    tasks = [
+        (f, t, d, basepath, resolver, minify, collect, index) for f, t, d in pages
+    ]
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
+
+    if jobs > 1 and len(tasks) >= PARALLEL_MIN_PAGES:
+        jobs = min(jobs, len(tasks))
+        chunksize = max(1, len(tasks) // (jobs * 4))
+        print(f"generating {len(tasks)} pages with {jobs} jobs")
+        # workers start from the saved cache and send back what they added.
+        cache_path = None
+        if fragments is not None and fragments.path is not None:
+            fragments.save()
+            cache_path = fragments.path
+        with ProcessPoolExecutor(
+            max_workers=jobs,
+            initializer=_init_worker,
+            initargs=(cache_path,),
+        ) as pool:
+            results = pool.map(_generate_page_task, tasks, chunksize=chunksize)
+            generated = {}
+            for task, (new, counts, title, files, indexed) in zip(tasks, results):
+                generated[str(task[0])] = title
+                if fragments is not None:
+                    fragments.update(new)
+                    fragments.add_counts(counts)
+                for rel, data in files.items():
+                    sink.write_bytes(Path(sink.root, rel), data)
+                if indexed:
+                    search.update(indexed)
+    else:
+        generated = {
+            str(task[0]): _generate_page_task(task, fragments, sink, search)[2]
+            for task in tasks
+        }
+
+    if content_db is not None:
+        content_db.set_titles(generated)
+
+    if manifest is not None:
+        for from_path, page_template, dest_path in pages:
+            manifest.record(
+                from_path,
+                page_template,
+                dest_path,
+                output_key,
+                source_hashes.get(str(from_path)),
+            )
 
     return
 
 
+# the fragment cache of a pool worker process.
+_WORKER_FRAGMENTS: FragmentCache = None
+
+
+def _init_worker(cache_path: Path | None) -> None:
+    global _WORKER_FRAGMENTS
+    if cache_path is not None:
+        _WORKER_FRAGMENTS = FragmentCache.load(cache_path)
+        _WORKER_FRAGMENTS.track_new = True
+
+
+def render_key(resolver: URLResolver, minify: bool = False) -> str:
+    """Identify everything besides the sources that shapes the output, for
+    the manifest and the fragment cache."""
+    return f"{resolver.cache_key}|minify" if minify else resolver.cache_key
+
+
+def _generate_page_task(
+    task: tuple[Path, Path, Path, str, URLResolver, bool, Path | None, bool],
+    fragments: FragmentCache = None,
+    sink: OutputSink = None,
+    search: SearchIndex = None,
+) -> tuple[
+    dict[str, str], tuple[int, int], str, dict[str, bytes], dict[str, dict]
+]:
+    """Generate one page, naming its source file if it fails, and return
+    its title.
+
+    In a pool worker the fragments added by the page and its cache hits and
+    misses are returned, with the page itself when it has to be collected
+    under the given sink root and its search entry when it has to be indexed.
+    """
+    from_path, template_path, dest_path, basepath, resolver, minify = task[:6]
+    collect, index = task[6:]
+    worker = fragments is None and _WORKER_FRAGMENTS is not None
+    if worker:
+        fragments = _WORKER_FRAGMENTS
+    if sink is None and collect is not None:
+        sink = MemorySink(collect)
+    if search is None and index:
+        search = SearchIndex()
+    try:
+        title = generate_page(
+            from_path,
+            template_path,
+            dest_path,
+            basepath,
+            resolver,
+            fragments,
+            minify,
+            sink,
+            search,
+        )
+    except Exception as e:
+        raise RuntimeError(f"failed to generate page from {from_path}: {e}") from e
+    new = fragments.take_new() if worker else {}
+    counts = fragments.take_counts() if worker else (0, 0)
+    files = sink.files if isinstance(sink, MemorySink) else {}
+    return new, counts, title, files, search.pages if index else {}
+
+
 def generate_page(
     from_path: str,
     template_path: str,
     dest_path: str,
     basepath: str,
-) -> None:
+    resolver: URLResolver = None,
+    fragments: FragmentCache = None,
+    minify: bool = False,
+    sink: OutputSink = None,
+    search: SearchIndex = None,
+) -> str:
+    """Write the page of the markdown at from_path and return its title."""
     print(f"Creating page from {from_path} to {dest_path} using {template_path}")
 
     from_path = Path(from_path)
     template_path = Path(template_path)
     dest_path: Path = Path(dest_path)
+    resolver = resolver or URLResolver(basepath)
+    sink = sink or DiskSink(dest_path.parent)
 
-    with open(from_path, "r") as f:
-        content = f.read()
-
-    with open(template_path, "r") as f:
-        template = f.read()
+    with profiling.page(from_path):
+        with profiling.stage("read"):
+            template = load_template(template_path, resolver, minify)
 
-    title = extract_title(content)
-    html_content = markdown_to_html_node(content).to_html()
+        # blocks are read, parsed and written one at a time, so memory stays
+        # bounded by the largest block. Their stages run nested inside the
+        # template stage, which is inside write, and are reported as self time.
+        with open(from_path, "r") as f:
+            scanner = BlockScanner(f)
+            with profiling.stage("extract_title"):
+                title = scanner.title()
+            blocks = iter_block_html(
+                _scan_blocks(scanner), resolver, fragments, minify
+            )
+            if search is not None:
+                counts = Counter()
+                blocks = count_terms(blocks, counts)
+            content = itertools.chain(("<div>",), blocks, ("</div>",))
 
-    template_with_title = template.replace("{{ Title }}", title)
-    template_content = template_with_title.replace("{{ Content }}", html_content)
-    template_href = template_content.replace('href="/', f'href="{basepath}')
-    template_src = template_href.replace('src="/', f'src="{basepath}')
+            with profiling.stage("write"), sink.open_text(dest_path) as out:
+                with profiling.stage("template"):
+                    template.render_to(out, Title=title, Content=content)
 
-    dest_path.parent.mkdir(parents=True, exist_ok=True)
-    with open(dest_path, "w") as f:
-        f.write(template_src)
+        if search is not None:
+            search.add_page(dest_path, title, counts)
 
     print(f"Completed creating {dest_path}")
+    return title
 
 
 def extract_title(markdown: str) -> str:
@@ -78,63 +317,191 @@ def extract_title(markdown: str) -> str:
     return blocks[0][2:]
 
 
-def markdown_to_html_node(markdown: str) -> ParentNode:
-    blocks = markdown_to_blocks(markdown)
-    main_children = []
-    for block in blocks:
-        b = block_to_blocktype(block)
-        if b == BlockType.PARAGRAPH:
-            # text = text_to_textnodes(block.replace("\n", " "))
-            # children_node = [text_node_to_html_node(t) for t in text]
-            children_node = _text_to_children(block.replace("\n", " "))
-            main_children.append(ParentNode(tag="p", children=children_node))
-
-        if b == BlockType.CODE:
-            if not block.startswith("```") or not block.endswith("```"):
-                raise ValueError(f"invalid code block: {block}")
-
-            text = block.strip("`").strip() + "\n"
-            text_node = TextNode(text=text, text_type=TextType.TEXT)
-            html_node = text_node_to_html_node(text_node)
-            code_node = ParentNode(tag="code", children=[html_node])
-            main_children.append(ParentNode(tag="pre", children=[code_node]))
-
-        if b == BlockType.HEADING:
-            header_hash, header_text = block.split(" ", maxsplit=1)
-            heading_tag = f"h{len(header_hash)}"
-            main_children.append(LeafNode(tag=heading_tag, value=header_text))
-
-        if b == BlockType.UNORDERED_LIST:
-            li_children = []
-            for li in block.split("\n"):
-                li_text = li.strip("- ")
-                li_html_node = _text_to_children(li.strip("- "))
-                li_node = ParentNode(tag="li", children=li_html_node)
-                li_children.append(li_node)
-            main_children.append(ParentNode(tag="ul", children=li_children))
-
-        if b == BlockType.ORDERED_LIST:
-            li_children = []
-            for li in block.split("\n"):
-                _, li_text = li.split(" ", maxsplit=1)
-                li_html_node = _text_to_children(li_text)
-                li_node = ParentNode(tag="li", children=li_html_node)
-                li_children.append(li_node)
-            main_children.append(ParentNode(tag="ol", children=li_children))
-
-        if b == BlockType.QUOTE:
-            quote_text = block.replace(">", "").replace("\n", "")[
-                1:
-            ]  # to remove the first spacing.
-            quote_text_node = text_to_textnodes(quote_text)
-            quote_html_node = [text_node_to_html_node(t) for t in quote_text_node]
-            main_children.append(ParentNode(tag="blockquote", children=quote_html_node))
-
+def markdown_to_html_node(markdown: str, resolver: URLResolver = None) -> ParentNode:
+    """Build the node tree of markdown, with a node per inline token made by
+    text_node_to_html_node. markdown_to_html renders the same html without
+    the tree."""
+    with profiling.stage("markdown_to_blocks"):
+        blocks = markdown_to_blocks(markdown)
+    typed_blocks = ((block, _timed_blocktype(block)) for block in blocks)
+    main_children = list(iter_block_nodes(typed_blocks, resolver))
     return ParentNode(tag="div", children=main_children)
 
 
-def _text_to_children(text: str) -> list[HTMLNode]:
-    """Convert raw text into list of html nodes."""
-    text_node = text_to_textnodes(text)
-    html_nodes = [text_node_to_html_node(t) for t in text_node]
-    return html_nodes
+def _timed_blocktype(block: str) -> BlockType:
+    with profiling.stage("block_to_blocktype"):
+        return block_to_blocktype(block)
+
+
+def _scan_blocks(scanner: BlockScanner) -> Iterator[tuple[str, BlockType]]:
+    """Classify the scanner's blocks, timing both like markdown_to_html_node."""
+    blocks = scanner.blocks()
+    while True:
+        with profiling.stage("markdown_to_blocks"):
+            block = next(blocks, None)
+        if block is None:
+            return
+        yield block, _timed_blocktype(block)
+
+
+def iter_block_nodes(
+    blocks: Iterable[tuple[str, BlockType]], resolver: URLResolver = None
+) -> Iterator[HTMLNode]:
+    """Yield the html node of every (block, block type), building each one
+    only when it is asked for."""
+    for block, b in blocks:
+        block_start = profiling.block_start()
+        node = block_to_html_node(block, b, resolver)
+        profiling.record_block(block, b, block_start)
+        yield node
+
+
+def block_to_html_node(
+    block: str, b: BlockType, resolver: URLResolver = None
+) -> HTMLNode:
+    """Convert one markdown block of the given type into an html node."""
+    if b == BlockType.PARAGRAPH:
+        # text = text_to_textnodes(block.replace("\n", " "))
+        # children_node = [text_node_to_html_node(t) for t in text]
+        children_node = _text_to_children(block.replace("\n", " "), resolver)
+        return ParentNode(tag="p", children=children_node)
+
+    if b == BlockType.CODE:
+        if not block.startswith("```") or not block.endswith("```"):
+            raise ValueError(f"invalid code block: {block}")
+
+        text = block.strip("`").strip() + "\n"
+        text_node = TextNode(text=text, text_type=TextType.TEXT)
+        html_node = text_node_to_html_node(text_node)
+        code_node = ParentNode(tag="code", children=[html_node])
+        return ParentNode(tag="pre", children=[code_node])
+
+    if b == BlockType.HEADING:
+        header_hash, header_text = block.split(" ", maxsplit=1)
+        heading_tag = f"h{len(header_hash)}"
+        return LeafNode(tag=heading_tag, value=header_text)
+
+    if b == BlockType.UNORDERED_LIST:
+        li_children = []
+        for li in block.split("\n"):
+            li_text = li.strip("- ")
+            li_html_node = _text_to_children(li.strip("- "), resolver)
+            li_node = ParentNode(tag="li", children=li_html_node)
+            li_children.append(li_node)
+        return ParentNode(tag="ul", children=li_children)
+
+    if b == BlockType.ORDERED_LIST:
+        li_children = []
+        for li in block.split("\n"):
+            _, li_text = li.split(" ", maxsplit=1)
+            li_html_node = _text_to_children(li_text, resolver)
+            li_node = ParentNode(tag="li", children=li_html_node)
+            li_children.append(li_node)
+        return ParentNode(tag="ol", children=li_children)
+
+    if b == BlockType.QUOTE:
+        quote_text = block.replace(">", "").replace("\n", "")[
+            1:
+        ]  # to remove the first spacing.
+        quote_html_node = _text_to_children(quote_text, resolver)
+        return ParentNode(tag="blockquote", children=quote_html_node)
+
+    raise ValueError(f"invalid block type: {b}")
+
+
+def markdown_to_html(
+    markdown: str, resolver: URLResolver = None, minify: bool = False
+) -> str:
+    """Return the same html as markdown_to_html_node(markdown).to_html(),
+    without building the node tree, or the minified equivalent."""
+    with profiling.stage("markdown_to_blocks"):
+        blocks = markdown_to_blocks(markdown)
+    typed_blocks = ((block, _timed_blocktype(block)) for block in blocks)
+    blocks_html = iter_block_html(typed_blocks, resolver, minify=minify)
+    return "".join(["<div>", *blocks_html, "</div>"])
+
+
+def iter_block_html(
+    blocks: Iterable[tuple[str, BlockType]],
+    resolver: URLResolver = None,
+    fragments: FragmentCache = None,
+    minify: bool = False,
+) -> Iterator[str]:
+    """Yield the html of every (block, block type), like iter_block_nodes
+    followed by to_html, reusing html rendered before from fragments."""
+    context = render_key(resolver or URLResolver(), minify)
+    for block, b in blocks:
+        block_start = profiling.block_start()
+        with profiling.stage("to_html"):
+            if fragments is None:
+                html = block_to_html(block, b, resolver, minify)
+            else:
+                key = fragments.key(context, b.value, block)
+                html = fragments.get(key)
+                if html is None:
+                    html = block_to_html(block, b, resolver, minify)
+                    fragments.put(key, html)
+        profiling.record_block(block, b, block_start)
+        yield html
+
+
+def block_to_html(
+    block: str, b: BlockType, resolver: URLResolver = None, minify: bool = False
+) -> str:
+    """Render one markdown block straight to html, byte for byte what
+    block_to_html_node(block, b).to_html() returns.
+
+    With minify, whitespace outside code collapses and the optional </p> and
+    </li> end tags are left out. Code blocks are always kept exactly. There
+    is no minified node tree, block_to_html_node always renders in full.
+    """
+    # end tags html lets a minified page leave out.
+    p_end, li_end = ("", "") if minify else ("</p>", "</li>")
+
+    if b == BlockType.PARAGRAPH:
+        text = block.replace("\n", " ")
+        return f"<p>{_inline(text, resolver, minify)}{p_end}"
+
+    if b == BlockType.CODE:
+        if not block.startswith("```") or not block.endswith("```"):
+            raise ValueError(f"invalid code block: {block}")
+        text = block.strip("`").strip()
+        return f"<pre><code>{text}\n</code></pre>"
+
+    if b == BlockType.HEADING:
+        header_hash, header_text = block.split(" ", maxsplit=1)
+        if minify:
+            header_text = collapse_whitespace(header_text).strip()
+        return f"<h{len(header_hash)}>{header_text}</h{len(header_hash)}>"
+
+    if b == BlockType.UNORDERED_LIST:
+        items = [
+            f"<li>{_inline(li.strip('- '), resolver, minify)}{li_end}"
+            for li in block.split("\n")
+        ]
+        return f"<ul>{''.join(items)}</ul>"
+
+    if b == BlockType.ORDERED_LIST:
+        items = []
+        for li in block.split("\n"):
+            _, li_text = li.split(" ", maxsplit=1)
+            items.append(f"<li>{_inline(li_text, resolver, minify)}{li_end}")
+        return f"<ol>{''.join(items)}</ol>"
+
+    if b == BlockType.QUOTE:
+        quote_text = block.replace(">", "").replace("\n", "")[1:]
+        return f"<blockquote>{_inline(quote_text, resolver, minify)}</blockquote>"
+
+    raise ValueError(f"invalid block type: {b}")
+
+
+def _inline(text: str, resolver: URLResolver = None, minify: bool = False) -> str:
+    with profiling.stage("text_to_textnodes"):
+        return inline_html(text, resolver, minify)
+
+
+def _text_to_children(text: str, resolver: URLResolver = None) -> list[HTMLNode]:
+    """Convert raw text into list of html nodes, one per inline token."""
+    with profiling.stage("text_to_textnodes"):
+        text_nodes = text_to_textnodes(text)
+    return [text_node_to_html_node(t, resolver) for t in text_nodes]
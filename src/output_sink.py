@@ -0,0 +1,225 @@
+"""Module for the places a build writes its output to.
+
+Writers address files by their path under the sink root, such as
+docs/blog/index.html, and every sink stores them by the posix path relative
+to it. The same build can then update a folder on disk, fill a dict in
+memory or stream a tar or zip archive in a single pass.
+"""
+
+from __future__ import annotations
+
+import io
+import os
+import tarfile
+import time
+import zipfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import BinaryIO, Iterator, TextIO
+
+from precompress import MIN_SIZE, available_formats, is_compressible
+from static_sync import place_file
+
+MEMORY_TARGET = ":memory:"
+TAR_COMPRESSIONS = {
+    ".tar": "",
+    ".tar.gz": "gz",
+    ".tgz": "gz",
+    ".tar.bz2": "bz2",
+    ".tar.xz": "xz",
+}
+
+
+class OutputSink:
+    """Somewhere to write the files of a build, rooted at root.
+
+    Subclasses implement write_bytes, and override open_text and copy_file
+    when they can avoid holding a whole file in memory.
+    """
+
+    def __init__(self, root: Path | str = "."):
+        self.root = Path(root)
+
+    def relative(self, path: Path | str) -> str:
+        return Path(path).relative_to(self.root).as_posix()
+
+    @contextmanager
+    def open_text(self, path: Path | str) -> Iterator[TextIO]:
+        """Write a text file, which only appears once the block exits
+        without an error."""
+        buffer = io.StringIO()
+        yield buffer
+        self.write_bytes(path, buffer.getvalue().encode())
+
+    def write_bytes(self, path: Path | str, data: bytes) -> None:
+        raise NotImplementedError
+
+    def copy_file(self, src: Path | str, path: Path | str) -> None:
+        self.write_bytes(path, Path(src).read_bytes())
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> OutputSink:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class DiskSink(OutputSink):
+    """Writes files into the folder root, replacing each one atomically."""
+
+    def __init__(self, root: Path | str = ".", mode: str = "copy"):
+        super().__init__(root)
+        self.mode = mode
+
+    def _path(self, path: Path | str) -> Path:
+        dest = Path(self.root, self.relative(path))
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        return dest
+
+    @contextmanager
+    def open_text(self, path: Path | str) -> Iterator[TextIO]:
+        dest = self._path(path)
+        tmp_path = dest.with_name(dest.name + ".tmp")
+        try:
+            with open(tmp_path, "w") as out:
+                yield out
+            os.replace(tmp_path, dest)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+    def write_bytes(self, path: Path | str, data: bytes) -> None:
+        dest = self._path(path)
+        tmp_path = dest.with_name(dest.name + ".tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, dest)
+
+    def copy_file(self, src: Path | str, path: Path | str) -> None:
+        place_file(Path(src), self._path(path), self.mode)
+
+
+class MemorySink(OutputSink):
+    """Keeps every file in files, keyed by relative path."""
+
+    def __init__(self, root: Path | str = "."):
+        super().__init__(root)
+        self.files: dict[str, bytes] = {}
+
+    def write_bytes(self, path: Path | str, data: bytes) -> None:
+        self.files[self.relative(path)] = data
+
+
+class TarSink(OutputSink):
+    """Streams files into a tar archive, compressed with compression ("",
+    "gz", "bz2" or "xz"). Entries get mtime, the build time by default."""
+
+    def __init__(
+        self,
+        target: Path | str | BinaryIO,
+        root: Path | str = ".",
+        compression: str = "",
+        mtime: int = None,
+    ):
+        super().__init__(root)
+        mode = f"w|{compression}"
+        if isinstance(target, (str, os.PathLike)):
+            self.tar = tarfile.open(target, mode)
+        else:
+            self.tar = tarfile.open(fileobj=target, mode=mode)
+        self.mtime = int(time.time()) if mtime is None else mtime
+
+    def _info(self, path: Path | str, size: int) -> tarfile.TarInfo:
+        info = tarfile.TarInfo(self.relative(path))
+        info.size = size
+        info.mtime = self.mtime
+        info.mode = 0o644
+        return info
+
+    def write_bytes(self, path: Path | str, data: bytes) -> None:
+        self.tar.addfile(self._info(path, len(data)), io.BytesIO(data))
+
+    def copy_file(self, src: Path | str, path: Path | str) -> None:
+        with open(src, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            self.tar.addfile(self._info(path, size), f)
+
+    def close(self) -> None:
+        self.tar.close()
+
+
+class ZipSink(OutputSink):
+    """Streams files into a zip archive, deflating the compressible ones."""
+
+    def __init__(
+        self, target: Path | str | BinaryIO, root: Path | str = ".", mtime: int = None
+    ):
+        super().__init__(root)
+        self.zip = zipfile.ZipFile(target, "w")
+        self.date_time = time.localtime(time.time() if mtime is None else mtime)[:6]
+
+    def _info(self, path: Path | str) -> zipfile.ZipInfo:
+        rel = self.relative(path)
+        info = zipfile.ZipInfo(rel, self.date_time)
+        info.external_attr = 0o644 << 16
+        if is_compressible(rel):
+            info.compress_type = zipfile.ZIP_DEFLATED
+        return info
+
+    def write_bytes(self, path: Path | str, data: bytes) -> None:
+        self.zip.writestr(self._info(path), data)
+
+    def copy_file(self, src: Path | str, path: Path | str) -> None:
+        with open(src, "rb") as f, self.zip.open(self._info(path), "w") as out:
+            while chunk := f.read(1 << 16):
+                out.write(chunk)
+
+    def close(self) -> None:
+        self.zip.close()
+
+
+class CompressingSink(OutputSink):
+    """Passes files on to sink, adding the .gz and .br sidecars precompress
+    writes for output on disk."""
+
+    def __init__(self, sink: OutputSink, min_size: int = MIN_SIZE):
+        super().__init__(sink.root)
+        self.sink = sink
+        self.min_size = min_size
+        self.formats = available_formats()
+
+    def write_bytes(self, path: Path | str, data: bytes) -> None:
+        self.sink.write_bytes(path, data)
+        if len(data) < self.min_size or not is_compressible(self.relative(path)):
+            return
+        for suffix, compress in self.formats.items():
+            compressed = compress(data)
+            if len(compressed) < len(data):
+                self.sink.write_bytes(f"{path}{suffix}", compressed)
+
+    def copy_file(self, src: Path | str, path: Path | str) -> None:
+        if is_compressible(self.relative(path)):
+            self.write_bytes(path, Path(src).read_bytes())
+        else:
+            self.sink.copy_file(src, path)
+
+    def close(self) -> None:
+        self.sink.close()
+
+
+def open_sink(target: str, root: Path | str) -> OutputSink:
+    """Open the sink named by target, a .zip or .tar[.gz|.bz2|.xz] archive
+    or :memory:, for files written under root."""
+    if target == MEMORY_TARGET:
+        return MemorySink(root)
+    if target.endswith(".zip"):
+        return ZipSink(target, root)
+    for suffix, compression in TAR_COMPRESSIONS.items():
+        if target.endswith(suffix):
+            return TarSink(target, root, compression)
+    raise ValueError(
+        f"expecting a .zip, .tar, .tar.gz, .tgz, .tar.bz2, .tar.xz or "
+        f"{MEMORY_TARGET} output but received {target}"
+    )
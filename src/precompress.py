@@ -0,0 +1,177 @@
+"""Module for writing precompressed .gz and .br sidecars next to the output.
+
+Static hosts that support it serve page.html.gz or page.html.br in place of
+page.html, so nothing is compressed per request. brotli is optional, without
+it only gzip sidecars are written.
+"""
+
+from __future__ import annotations
+
+import gzip
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from manifest import BuildManifest, file_hash
+from static_sync import scan_files
+
+try:
+    import brotli
+except ImportError:  # optional, pip install brotli
+    brotli = None
+
+COMPRESSIBLE_SUFFIXES = (
+    ".html",
+    ".css",
+    ".js",
+    ".mjs",
+    ".json",
+    ".svg",
+    ".xml",
+    ".txt",
+    ".map",
+    ".webmanifest",
+)
+# below this many bytes the saving is lost in headers and disk blocks.
+MIN_SIZE = 1024
+
+
+def _gzip(data: bytes) -> bytes:
+    # mtime 0 keeps the output identical for identical input.
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def _brotli(data: bytes) -> bytes:
+    return brotli.compress(data, quality=11)
+
+
+def available_formats() -> dict[str, callable]:
+    """Return the sidecar suffix and compressor of every usable format."""
+    formats = {".gz": _gzip}
+    if brotli is not None:
+        formats[".br"] = _brotli
+    return formats
+
+
+def is_compressible(rel: str) -> bool:
+    return rel.endswith(COMPRESSIBLE_SUFFIXES)
+
+
+def compress_file(path: Path, formats: dict[str, callable]) -> list[str]:
+    """Write a sidecar of path for every format that makes it smaller.
+
+    Stale sidecars of formats that no longer help are removed. Returns the
+    suffixes written.
+    """
+    data = path.read_bytes()
+    written = []
+    for suffix, compress in formats.items():
+        sidecar = path.with_name(path.name + suffix)
+        compressed = compress(data)
+        if len(compressed) >= len(data):
+            sidecar.unlink(missing_ok=True)
+            continue
+        tmp_sidecar = sidecar.with_name(f".{sidecar.name}.tmp")
+        tmp_sidecar.write_bytes(compressed)
+        shutil.copystat(path, tmp_sidecar)
+        os.replace(tmp_sidecar, sidecar)
+        written.append(suffix)
+    return written
+
+
+def remove_sidecars(path: Path) -> None:
+    for suffix in (".gz", ".br"):
+        path.with_name(path.name + suffix).unlink(missing_ok=True)
+
+
+def precompress_tree(
+    root: Path | str,
+    manifest: BuildManifest = None,
+    min_size: int = MIN_SIZE,
+    max_workers: int = None,
+) -> dict[str, list[str]]:
+    """Write sidecars for every compressible file under root.
+
+    Files whose size and mtime, or else content hash, match what the manifest
+    recorded at the last compression are skipped. Sidecars of files that are
+    gone or fell below min_size are deleted.
+    """
+    print(f"precompressing files in {root}")
+    root = Path(root)
+    formats = available_formats()
+    previous = manifest.compressed if manifest is not None else {}
+    format_names = sorted(formats)
+
+    compressed, unchanged, removed = [], [], []
+    to_compress = []
+    entries = {}
+    for rel, stat in sorted(scan_files(root).items()):
+        if not is_compressible(rel):
+            continue
+        path = Path(root, rel)
+        if stat.st_size < min_size:
+            if rel in previous:
+                remove_sidecars(path)
+                removed.append(rel)
+            continue
+
+        entry = previous.get(rel, {})
+        written = entry.get("written", [])
+        reusable = entry.get("formats") == format_names and all(
+            path.with_name(path.name + suffix).is_file() for suffix in written
+        )
+        if reusable and (entry.get("size"), entry.get("mtime_ns")) == (
+            stat.st_size,
+            stat.st_mtime_ns,
+        ):
+            entries[rel] = entry
+            unchanged.append(rel)
+            continue
+
+        content_hash = file_hash(path)
+        entries[rel] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "hash": content_hash,
+            "formats": format_names,
+            "written": written,
+        }
+        if reusable and entry.get("hash") == content_hash:
+            unchanged.append(rel)
+            continue
+        to_compress.append(rel)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            rel: pool.submit(compress_file, Path(root, rel), formats)
+            for rel in to_compress
+        }
+        for rel, future in futures.items():
+            entries[rel]["written"] = future.result()
+            compressed.append(rel)
+
+    for rel in sorted(set(previous) - set(entries) - set(removed)):
+        remove_sidecars(Path(root, rel))
+        removed.append(rel)
+
+    if manifest is not None:
+        manifest.compressed = entries
+
+    print(
+        f"{root} is precompressed ({', '.join(format_names)}): "
+        f"{len(compressed)} compressed, {len(unchanged)} unchanged, "
+        f"{len(removed)} removed"
+    )
+    return {"compressed": compressed, "unchanged": unchanged, "removed": removed}
+
+
+def remove_precompressed(root: Path | str, manifest: BuildManifest) -> None:
+    """Delete every sidecar the manifest knows of, so a build without
+    precompression leaves none that are out of date."""
+    if not manifest.compressed:
+        return
+    print(f"removing {len(manifest.compressed)} precompressed sidecars in {root}")
+    for rel in manifest.compressed:
+        remove_sidecars(Path(root, rel))
+    manifest.compressed = {}
@@ -0,0 +1,409 @@
+"""Module for timing build stages and exporting chrome traces.
+
+MemoryProfiler measures the same pages and stages with tracemalloc instead
+of a clock.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import statistics
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+_NULL_CONTEXT = nullcontext()
+_PROFILER: BuildProfiler | None = None
+_MEMORY_PROFILER: MemoryProfiler | None = None
+
+# a page is flagged when its peak per source byte is this many times the
+# median, and it needed at least OUTLIER_MIN_BYTES.
+OUTLIER_FACTOR = 4
+OUTLIER_MIN_BYTES = 256 << 10
+
+_SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+class BuildProfiler:
+    """Collects per page stage timings and per block timings.
+
+    Stages nest, the self time of a stage leaves out the stages run inside
+    it, so self times add up to the page time.
+    """
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.events: list[dict] = []
+        self.pages: dict[str, float] = {}
+        self.blocks: list[tuple[float, str, str, str]] = []
+        self.current_page: str = None
+        # seconds spent in the finished inner stages of every open stage.
+        self._inner: list[float] = []
+
+    def _timestamp(self, t: float) -> float:
+        return (t - self.origin) * 1e6
+
+    @contextmanager
+    def stage(self, name: str):
+        self._inner.append(0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            inner = self._inner.pop()
+            if self._inner:
+                self._inner[-1] += duration
+            self.events.append(
+                {
+                    "name": name,
+                    "page": self.current_page,
+                    "start": start,
+                    "duration": duration,
+                    "self": duration - inner,
+                }
+            )
+
+    @contextmanager
+    def page(self, from_path: Path | str):
+        self.current_page = str(from_path)
+        start = time.perf_counter()
+        try:
+            with self.stage("page"):
+                yield
+        finally:
+            self.pages[self.current_page] = time.perf_counter() - start
+            self.current_page = None
+
+    def record_block(self, block: str, block_type: str, start: float) -> None:
+        duration = time.perf_counter() - start
+        self.blocks.append((duration, self.current_page, block_type, block))
+
+    def stage_totals(self) -> dict[str, tuple[int, float, float]]:
+        """Return the call count, total seconds and self seconds of every
+        stage."""
+        totals: dict[str, tuple[int, float, float]] = {}
+        for event in self.events:
+            count, total, own = totals.get(event["name"], (0, 0.0, 0.0))
+            totals[event["name"]] = (
+                count + 1,
+                total + event["duration"],
+                own + event["self"],
+            )
+        return totals
+
+    def summary(self, top: int = 10) -> str:
+        """Format the stage table and the slowest pages and blocks.
+
+        The % column is each stage's self time, the page row being the time
+        spent outside every other stage, so it adds up to 100.
+        """
+        totals = self.stage_totals()
+        page_total = totals.get("page", (0, 0.0, 0.0))[1] or 1e-12
+
+        lines = [
+            f"{'stage':<22}{'calls':>8}{'total ms':>12}{'self ms':>12}"
+            f"{'mean us':>12}{'%':>8}"
+        ]
+        for name, (count, total, own) in sorted(
+            totals.items(), key=lambda item: item[1][2], reverse=True
+        ):
+            lines.append(
+                f"{name:<22}{count:>8}{total * 1e3:>12.2f}{own * 1e3:>12.2f}"
+                f"{total / count * 1e6:>12.1f}{own / page_total * 100:>8.1f}"
+            )
+
+        lines.append("")
+        lines.append(f"slowest {top} pages:")
+        for page, seconds in sorted(
+            self.pages.items(), key=lambda item: item[1], reverse=True
+        )[:top]:
+            lines.append(f"{seconds * 1e3:>10.2f} ms  {page}")
+
+        lines.append("")
+        lines.append(f"slowest {top} blocks:")
+        slowest_blocks = sorted(self.blocks, key=lambda b: b[0], reverse=True)
+        for seconds, page, block_type, block in slowest_blocks[:top]:
+            preview = block[:40].replace("\n", " ")
+            lines.append(
+                f"{seconds * 1e3:>10.3f} ms  {block_type:<15}{len(block):>8} chars"
+                f"  {page}  {preview!r}"
+            )
+        return "\n".join(lines)
+
+    def write_trace(self, path: Path | str) -> None:
+        """Write the stage timings as a chrome trace event json file."""
+        pid = os.getpid()
+        trace_events = [
+            {
+                "name": event["name"],
+                "cat": "build",
+                "ph": "X",
+                "ts": self._timestamp(event["start"]),
+                "dur": event["duration"] * 1e6,
+                "pid": pid,
+                "tid": 0,
+                "args": {"page": event["page"]},
+            }
+            for event in self.events
+        ]
+        with open(path, "w") as f:
+            json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f)
+
+
+class MemoryProfiler:
+    """Collects the peak and retained traced memory of every page and stage.
+
+    A page or stage's peak is the most memory allocated on top of what was
+    in use when it started, retained is what it still held at its end.
+    Tracing starts when the profiler is created and runs until stop.
+
+    Every page is snapshotted before and after it runs. For the page with
+    the highest peak, peak_sites keeps the allocation sites that grew over
+    the page.
+    """
+
+    def __init__(self, frames: int = 1):
+        self.pages: dict[str, dict[str, int]] = {}
+        self.stages: dict[str, tuple[int, int, int]] = {}
+        self.peak = 0
+        self.current_page: str = None
+        self.peak_page: str = None
+        self.peak_sites: list[tracemalloc.StatisticDiff] = []
+        # start memory and the highest peak of finished inner scopes, for
+        # every open page and stage. tracemalloc keeps a single peak, which
+        # each scope resets.
+        self._scopes: list[list[int]] = []
+        tracemalloc.start(frames)
+
+    def _enter(self) -> None:
+        current, peak = tracemalloc.get_traced_memory()
+        if self._scopes:
+            self._scopes[-1][1] = max(self._scopes[-1][1], peak)
+        self.peak = max(self.peak, peak)
+        tracemalloc.reset_peak()
+        self._scopes.append([current, current])
+
+    def _snapshot(self) -> tracemalloc.Snapshot:
+        """Snapshot what is allocated, leaving the snapshot itself out of
+        every peak."""
+        _, peak = tracemalloc.get_traced_memory()
+        if self._scopes:
+            self._scopes[-1][1] = max(self._scopes[-1][1], peak)
+        self.peak = max(self.peak, peak)
+        snapshot = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+        tracemalloc.reset_peak()
+        return snapshot
+
+    def _exit(self) -> tuple[int, int]:
+        current, peak = tracemalloc.get_traced_memory()
+        start, inner_peak = self._scopes.pop()
+        peak = max(peak, inner_peak)
+        if self._scopes:
+            self._scopes[-1][1] = max(self._scopes[-1][1], peak)
+        self.peak = max(self.peak, peak)
+        return peak - start, current - start
+
+    @contextmanager
+    def stage(self, name: str):
+        self._enter()
+        try:
+            yield
+        finally:
+            peak, _ = self._exit()
+            count, total, largest = self.stages.get(name, (0, 0, 0))
+            self.stages[name] = (count + 1, total + peak, max(largest, peak))
+
+    @contextmanager
+    def page(self, from_path: Path | str):
+        self.current_page = str(from_path)
+        try:
+            source_bytes = os.stat(from_path).st_size
+        except OSError:
+            source_bytes = 0
+        before = self._snapshot()
+        self._enter()
+        try:
+            yield
+        finally:
+            peak, retained = self._exit()
+            self.pages[self.current_page] = {
+                "source_bytes": source_bytes,
+                "peak": peak,
+                "retained": retained,
+            }
+            peak_page = self.pages.get(self.peak_page)
+            if peak_page is None or peak > peak_page["peak"]:
+                self.peak_page = self.current_page
+                self.peak_sites = [
+                    s
+                    for s in self._snapshot().compare_to(before, "lineno")
+                    if s.size_diff > 0
+                ]
+            self.current_page = None
+
+    def stop(self) -> None:
+        if tracemalloc.is_tracing():
+            self.peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+
+    def outliers(self) -> list[str]:
+        """Return the pages whose peak is out of proportion to their source."""
+        ratios = {
+            page: entry["peak"] / max(entry["source_bytes"], 1)
+            for page, entry in self.pages.items()
+        }
+        if not ratios:
+            return []
+        limit = statistics.median(ratios.values()) * OUTLIER_FACTOR
+        return [
+            page
+            for page, ratio in sorted(ratios.items(), key=lambda r: -r[1])
+            if ratio > limit and self.pages[page]["peak"] >= OUTLIER_MIN_BYTES
+        ]
+
+    def top_sites(self, top: int = 10) -> list[tuple[str, int, int]]:
+        """Return the (file:line, bytes, blocks) whose memory grew the most
+        over the page with the highest peak."""
+        return [
+            (
+                f"{s.traceback[0].filename}:{s.traceback[0].lineno}",
+                s.size_diff,
+                s.count_diff,
+            )
+            for s in self.peak_sites[:top]
+        ]
+
+    def summary(self, top: int = 10) -> str:
+        """Format the stage table, the largest pages, the flagged pages and
+        the top allocation sites."""
+        lines = [f"build peak traced memory: {self.peak / 1024:.1f} KiB", ""]
+        lines.append(f"{'stage':<22}{'calls':>8}{'max KiB':>12}{'mean KiB':>12}")
+        for name, (count, total, largest) in sorted(
+            self.stages.items(), key=lambda item: item[1][2], reverse=True
+        ):
+            lines.append(
+                f"{name:<22}{count:>8}{largest / 1024:>12.1f}"
+                f"{total / count / 1024:>12.1f}"
+            )
+
+        lines.append("")
+        lines.append(f"largest {top} page peaks (peak / retained / source KiB):")
+        for page, entry in sorted(
+            self.pages.items(), key=lambda item: item[1]["peak"], reverse=True
+        )[:top]:
+            lines.append(_page_line(page, entry))
+
+        outliers = self.outliers()
+        if outliers:
+            lines.append("")
+            lines.append(
+                f"pages using over {OUTLIER_FACTOR}x the median memory per source byte:"
+            )
+            for page in outliers:
+                lines.append(_page_line(page, self.pages[page]))
+
+        lines.append("")
+        lines.append(f"top {top} allocation sites grown over {self.peak_page}:")
+        for site, size, count in self.top_sites(top):
+            lines.append(f"{size / 1024:>10.1f} KiB {count:>8} blocks  {site}")
+        return "\n".join(lines)
+
+    def write_report(self, path: Path | str, top: int = 10) -> None:
+        """Write the measurements as json, for checking memory budgets."""
+        data = {
+            "peak": self.peak,
+            "stages": {
+                name: {"calls": count, "total_peak": total, "max_peak": largest}
+                for name, (count, total, largest) in self.stages.items()
+            },
+            "pages": self.pages,
+            "outliers": self.outliers(),
+            "peak_page": self.peak_page,
+            "top_sites": [
+                {"site": site, "size": size, "count": count}
+                for site, size, count in self.top_sites(top)
+            ],
+        }
+        with open(path, "w") as f:
+            json.dump(data, f, indent=1, sort_keys=True)
+
+
+def _page_line(page: str, entry: dict[str, int]) -> str:
+    return (
+        f"{entry['peak'] / 1024:>10.1f}{entry['retained'] / 1024:>10.1f}"
+        f"{entry['source_bytes'] / 1024:>10.1f}  {page}"
+    )
+
+
+def enable() -> BuildProfiler:
+    global _PROFILER
+    _PROFILER = BuildProfiler()
+    return _PROFILER
+
+
+def disable() -> None:
+    global _PROFILER
+    _PROFILER = None
+
+
+def enable_memory(frames: int = 1) -> MemoryProfiler:
+    """Start tracing allocations, keeping frames frames per allocation site."""
+    global _MEMORY_PROFILER
+    _MEMORY_PROFILER = MemoryProfiler(frames)
+    return _MEMORY_PROFILER
+
+
+def disable_memory() -> None:
+    global _MEMORY_PROFILER
+    if _MEMORY_PROFILER is not None:
+        _MEMORY_PROFILER.stop()
+    _MEMORY_PROFILER = None
+
+
+def stage(name: str):
+    """Time a stage of the current page when profiling is enabled, and
+    measure its memory when memory profiling is."""
+    if _MEMORY_PROFILER is None:
+        if _PROFILER is None:
+            return _NULL_CONTEXT
+        return _PROFILER.stage(name)
+    if _PROFILER is None:
+        return _MEMORY_PROFILER.stage(name)
+    return _both(_PROFILER.stage(name), _MEMORY_PROFILER.stage(name))
+
+
+def page(from_path: Path | str):
+    """Mark the stages inside as belonging to one page."""
+    if _MEMORY_PROFILER is None:
+        if _PROFILER is None:
+            return _NULL_CONTEXT
+        return _PROFILER.page(from_path)
+    if _PROFILER is None:
+        return _MEMORY_PROFILER.page(from_path)
+    return _both(_PROFILER.page(from_path), _MEMORY_PROFILER.page(from_path))
+
+
+@contextmanager
+def _both(outer, inner):
+    with outer, inner:
+        yield
+
+
+def block_start() -> float | None:
+    if _PROFILER is None:
+        return None
+    return time.perf_counter()
+
+
+def record_block(block: str, block_type, start: float | None) -> None:
+    """Record how long one markdown block took to parse and build."""
+    if _PROFILER is None or start is None:
+        return
+    _PROFILER.record_block(block, getattr(block_type, "value", str(block_type)), start)
@@ -2,6 +2,11 @@ import re
 
 from textnode import TextNode, TextType
 
+# the split_nodes_* helpers below are the original tokenizer, one pass per kind
+# of markup over a list of nodes. text_to_textnodes scans with inline_spans
+# instead, they stay as public helpers for callers holding text nodes and as
+# the baseline bench_micro compares inline_spans against.
+
 
 def split_nodes_delimiter(
     old_nodes: list[TextNode],
@@ -111,22 +116,169 @@ def split_nodes_link(old_nodes: list[TextNode]) -> list[TextNode]:
     return result
 
 
+# next spot where inline markup may start, single * and ! are plain text.
+INLINE_MARKUP_PATTERN = re.compile(r"\*\*|!\[|[`_\[]")
+INLINE_DELIMITERS = {
+    "**": TextType.BOLD_TEXT,
+    "_": TextType.ITALIC_TEXT,
+    "`": TextType.CODE_TEXT,
+}
+
+
+def _match_link(text: str, bracket: int, cache: list[int]) -> tuple[int, int] | None:
+    """Match [label](url) with the "[" at bracket, like extract_markdown_links.
+
+    Returns the positions of the "]" and the ")". cache holds the last found
+    "]" and ")" so the searches only move forward when bracket increases.
+    """
+    length = len(text)
+    if cache[0] <= bracket:
+        cache[0] = text.find("]", bracket + 1)
+        if cache[0] == -1:
+            cache[0] = length
+    close_bracket = cache[0]
+    if close_bracket == bracket + 1 or close_bracket + 1 >= length:
+        return None
+    if text[close_bracket + 1] != "(":
+        return None
+
+    url_start = close_bracket + 2
+    if cache[1] < url_start:
+        cache[1] = text.find(")", url_start)
+        if cache[1] == -1:
+            cache[1] = length
+    close_paren = cache[1]
+    if close_paren == url_start or close_paren == length:
+        return None
+    return close_bracket, close_paren
+
+
+def _next_image(
+    text: str, pos: int, found: list, cache: list[int]
+) -> tuple[int, int, int] | None:
+    """Return the first ![alt](url) starting at or after pos, as (start,
+    close_bracket, close_paren).
+
+    found holds the last answer and the position it was searched from, so
+    callers asking with increasing pos never rescan the text.
+    """
+    image, searched_from = found
+    if searched_from <= pos and (image is None or image[0] >= pos):
+        return image
+
+    image = None
+    start = text.find("![", pos)
+    while start != -1:
+        match = _match_link(text, start + 1, cache)
+        if match is not None:
+            image = (start, match[0], match[1])
+            break
+        start = text.find("![", start + 1)
+    found[0], found[1] = image, pos
+    return image
+
+
+# an inline token as (text type, start, end, url start, url end) offsets into
+# the source text, the url offsets are -1 for tokens without a url.
+InlineSpan = tuple[TextType, int, int, int, int]
+
+
+def inline_spans(text: str) -> list[InlineSpan]:
+    """Split raw text into text, bold, italic, code, image and link spans.
+
+    This is a single left to right scan where the leftmost markup wins and
+    runs to its end, any markup inside it is plain text:
+
+    - **bold**, _italic_ and `code` run to the next same delimiter, so
+      `[a](/b)` is code and **a ![x](/i) b** is bold text.
+    - ![alt](url) and [label](url) are matched the same way as
+      extract_markdown_images / extract_markdown_links and run to their ")",
+      so ![**x**](/i) is an image with the alt **x**. A link label is parsed
+      again for nested markup when it is rendered.
+    - a link never swallows an image, in [see ![x](/i)](/p) the "[" is text.
+    - a delimiter whose partner is inside earlier markup is unclosed and
+      raises ValueError, as in [a_](/b) c_.
+
+    The split_nodes_* passes this replaces paired delimiters over the whole
+    text before looking for images and links, so they read some of these
+    differently. Every search only moves forward, so the scan is linear even
+    on adversarial text. Nothing is copied out of text.
+    """
+    result: list[InlineSpan] = []
+    length = len(text)
+    found_image = [None, length + 1 if "![" in text else 0]
+    image_cache = [-1, -1]
+    link_cache = [-1, -1]
+    text_start = 0
+    pos = 0
+
+    while True:
+        match = INLINE_MARKUP_PATTERN.search(text, pos)
+        if match is None:
+            break
+        start = match.start()
+        token = match.group()
+
+        if token in INLINE_DELIMITERS:
+            content_start = start + len(token)
+            end = text.find(token, content_start)
+            if end == -1:
+                raise ValueError(
+                    "invalid markdown, formatted section not closed properly."
+                )
+            if start > text_start:
+                result.append((TextType.TEXT, text_start, start, -1, -1))
+            if end > content_start:
+                result.append((INLINE_DELIMITERS[token], content_start, end, -1, -1))
+            pos = text_start = end + len(token)
+            continue
+
+        image = _next_image(text, start, found_image, image_cache)
+
+        pos = start + 1
+        if token == "![":
+            if image is None or image[0] != start:
+                continue
+            bracket = start + 1
+            _, close_bracket, close_paren = image
+            text_type = TextType.IMAGE
+        else:
+            if start > 0 and text[start - 1] == "!":
+                continue
+            link = _match_link(text, start, link_cache)
+            if link is None:
+                continue
+            close_bracket, close_paren = link
+            if image is not None and image[0] <= close_paren:
+                continue
+            bracket = start
+            text_type = TextType.LINKS
+
+        if start > text_start:
+            result.append((TextType.TEXT, text_start, start, -1, -1))
+        result.append(
+            (text_type, bracket + 1, close_bracket, close_bracket + 2, close_paren)
+        )
+        pos = text_start = close_paren + 1
+
+    if text_start < length:
+        result.append((TextType.TEXT, text_start, length, -1, -1))
+    return result
+
+
 def text_to_textnodes(text: str) -> list[TextNode]:
-    """Each functions returns a list of nodes, while splitting its required function."""
-    text_node: list[TextNode] = [TextNode(text, TextType.TEXT)]
-    bold_arr: list[TextNode] = split_nodes_delimiter(
-        text_node, "**", TextType.BOLD_TEXT
-    )
-    italic_arr: list[TextNode] = split_nodes_delimiter(
-        bold_arr, "_", TextType.ITALIC_TEXT
-    )
-    code_arr: list[TextNode] = split_nodes_delimiter(
-        italic_arr, "`", TextType.CODE_TEXT
-    )
-    image_arr: list[TextNode] = split_nodes_image(code_arr)
-    link_arr: list[TextNode] = split_nodes_link(image_arr)
+    """Split raw text into text, bold, italic, code, image and link nodes."""
+    return spans_to_textnodes(text, inline_spans(text))
+
 
-    return link_arr
+def spans_to_textnodes(text: str, spans: list[InlineSpan]) -> list[TextNode]:
+    """Materialize the inline spans of text as text nodes."""
+    return [
+        TextNode(text[start:end], text_type, text[url_start:url_end])
+        if url_start != -1
+        else TextNode(text[start:end], text_type)
+        for text_type, start, end, url_start, url_end in spans
+    ]
 
 
 if __name__ == "__main__":
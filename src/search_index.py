@@ -0,0 +1,248 @@
+"""Module for building a client side search index while pages are rendered.
+
+The text of every block is tokenized as its html is written, so search costs
+no second pass over the content. The inverted index is written under
+docs/search as json a browser fetches piece by piece:
+
+- search/index.json holds the page list, where a page's position is its id,
+  and the names of the shards.
+- search/<prefix>.json holds the terms starting with prefix, each mapped to
+  a flat [id, weight, id, weight, ...] posting list sorted by id. Terms not
+  starting with prefix_length ascii letters or digits go into _.json.
+
+A term's weight is how often it appears on the page, with every appearance
+in the title counting TITLE_BOOST times more. SearchIndex keeps the terms of
+every page between builds, so only shards holding terms of changed pages are
+written again.
+"""
+
+from __future__ import annotations
+
+import heapq
+import json
+import re
+from collections import Counter
+from html import unescape
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from output_sink import DiskSink, OutputSink
+
+SEARCH_INDEX_VERSION = 1
+SEARCH_DIR = "search"
+SEARCH_INDEX_NAME = "index.json"
+SHARD_PREFIX_LENGTH = 2
+OTHER_SHARD = "_"
+TITLE_BOOST = 10
+MIN_TERM_LENGTH = 2
+STOP_WORDS = frozenset(
+    "a an and are as at be but by for from has have he her his i if in into is "
+    "it its of on or our she so that the their them they this to was we were "
+    "what when which who will with you your".split()
+)
+
+_TAG = re.compile(r"<[^>]*>")
+_WORD = re.compile(r"[^\W_]+")
+_SHARD_PREFIX = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> list[str]:
+    """Split text into lowercase search terms, without stop words."""
+    return [
+        word
+        for word in _WORD.findall(text.lower())
+        if len(word) >= MIN_TERM_LENGTH and word not in STOP_WORDS
+    ]
+
+
+def html_text(html: str) -> str:
+    """Return the text of an html fragment, tags removed."""
+    return unescape(_TAG.sub(" ", html))
+
+
+def count_terms(blocks_html: Iterable[str], counts: Counter) -> Iterator[str]:
+    """Pass the html of every block through, counting its terms into counts."""
+    for html in blocks_html:
+        counts.update(tokenize(html_text(html)))
+        yield html
+
+
+def shard_name(term: str, prefix_length: int = SHARD_PREFIX_LENGTH) -> str:
+    prefix = term[:prefix_length]
+    return prefix if _SHARD_PREFIX.fullmatch(prefix) else OTHER_SHARD
+
+
+def page_url(dest_path: Path | str, root: Path | str, basepath: str) -> str:
+    """Return the url of the page written to dest_path under root."""
+    rel = Path(dest_path).parent.relative_to(root).as_posix()
+    return basepath if rel == "." else f"{basepath}{rel}/"
+
+
+class SearchIndex:
+    """Search terms of every page, keyed by output path.
+
+    Every entry holds the page's id, title and term weights. Changing,
+    adding or removing a page marks the shards of the terms involved, and
+    write only writes those.
+    """
+
+    def __init__(self, path: Path | str = None):
+        self.path = Path(path) if path is not None else None
+        self.pages: dict[str, dict] = {}
+        self.basepath: str = None
+        self._free_ids: list[int] = []
+        self._next_id = 0
+        self._dirty: set[str] = set()
+        self._changed = False
+
+    @classmethod
+    def load(cls, path: Path | str) -> SearchIndex:
+        """Load an index from disk, starting empty if missing or outdated."""
+        index = cls(path)
+        if not index.path.is_file():
+            return index
+
+        try:
+            with open(index.path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            print(f"{index.path} is unreadable, starting an empty search index.")
+            return index
+
+        if data.get("version") == SEARCH_INDEX_VERSION:
+            index.pages = data.get("pages", {})
+            index.basepath = data.get("basepath")
+            ids = {entry["id"] for entry in index.pages.values()}
+            index._next_id = max(ids, default=-1) + 1
+            index._free_ids = [i for i in range(index._next_id) if i not in ids]
+        return index
+
+    def save(self) -> None:
+        data = {
+            "version": SEARCH_INDEX_VERSION,
+            "basepath": self.basepath,
+            "pages": self.pages,
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        tmp_path.replace(self.path)
+
+    def __contains__(self, dest_path: Path | str) -> bool:
+        return str(dest_path) in self.pages
+
+    def add_page(self, dest_path: Path | str, title: str, counts: Counter) -> None:
+        """Store the terms counted in a page's blocks, boosting its title."""
+        terms = dict(counts)
+        for term in tokenize(title):
+            terms[term] = terms.get(term, 0) + TITLE_BOOST
+        self._set(str(dest_path), title, terms)
+
+    def update(self, pages: dict[str, dict]) -> None:
+        """Store pages indexed by another index, such as a pool worker's."""
+        for key, entry in pages.items():
+            self._set(key, entry["title"], entry["terms"])
+
+    def _set(self, key: str, title: str, terms: dict[str, int]) -> None:
+        old = self.pages.get(key)
+        if old is None:
+            page_id = heapq.heappop(self._free_ids) if self._free_ids else None
+            if page_id is None:
+                page_id = self._next_id
+                self._next_id += 1
+            changed = terms.keys()
+            self._changed = True
+        else:
+            page_id = old["id"]
+            old_terms = old["terms"]
+            changed = [
+                t
+                for t in old_terms.keys() | terms.keys()
+                if old_terms.get(t) != terms.get(t)
+            ]
+            self._changed = self._changed or old["title"] != title
+        self._dirty.update(shard_name(t) for t in changed)
+        self.pages[key] = {"id": page_id, "title": title, "terms": terms}
+
+    def remove_page(self, dest_path: Path | str) -> None:
+        entry = self.pages.pop(str(dest_path), None)
+        if entry is None:
+            return
+        heapq.heappush(self._free_ids, entry["id"])
+        self._dirty.update(shard_name(t) for t in entry["terms"])
+        self._changed = True
+
+    def prune(self, live: Iterable[Path | str]) -> None:
+        """Remove the pages whose output path is not in live."""
+        live = {str(p) for p in live}
+        for key in sorted(set(self.pages) - live):
+            self.remove_page(key)
+
+    def clear(self) -> None:
+        self.pages.clear()
+        self.basepath = None
+        self._free_ids.clear()
+        self._next_id = 0
+        self._dirty.clear()
+        self._changed = False
+
+    def shard_names(self) -> set[str]:
+        return {shard_name(t) for e in self.pages.values() for t in e["terms"]}
+
+    def write(self, sink: OutputSink, basepath: str) -> None:
+        """Write the shards that changed since the last write, and the page
+        list, into sink under its search folder."""
+        folder = Path(sink.root, SEARCH_DIR)
+        names = self.shard_names()
+        if isinstance(sink, DiskSink):
+            # outputs deleted behind the index's back are written again.
+            self._dirty.update(
+                n for n in names if not Path(folder, f"{n}.json").is_file()
+            )
+            if not Path(folder, SEARCH_INDEX_NAME).is_file():
+                self._changed = True
+        if basepath != self.basepath:
+            self.basepath = basepath
+            self._changed = True
+        if not self._dirty and not self._changed:
+            print("search index is up to date")
+            return
+
+        postings: dict[str, dict[str, list]] = {n: {} for n in self._dirty}
+        for entry in self.pages.values():
+            for term, weight in entry["terms"].items():
+                shard = postings.get(shard_name(term))
+                if shard is not None:
+                    shard.setdefault(term, []).append((entry["id"], weight))
+
+        written = removed = 0
+        for name, terms in sorted(postings.items()):
+            path = Path(folder, f"{name}.json")
+            if not terms:
+                if isinstance(sink, DiskSink):
+                    path.unlink(missing_ok=True)
+                removed += 1
+                continue
+            shard = {t: [n for p in sorted(terms[t]) for n in p] for t in terms}
+            sink.write_bytes(path, _json_bytes(shard))
+            written += 1
+
+        pages = [None] * self._next_id
+        for key, entry in self.pages.items():
+            url = page_url(key, sink.root, basepath)
+            pages[entry["id"]] = [url, entry["title"]]
+        data = {
+            "version": SEARCH_INDEX_VERSION,
+            "prefix_length": SHARD_PREFIX_LENGTH,
+            "shards": sorted(names),
+            "pages": pages,
+        }
+        sink.write_bytes(Path(folder, SEARCH_INDEX_NAME), _json_bytes(data))
+        print(f"search index: wrote {written} shards, removed {removed}")
+        self._dirty.clear()
+        self._changed = False
+
+
+def _json_bytes(data) -> bytes:
+    return json.dumps(data, separators=(",", ":"), sort_keys=True).encode()
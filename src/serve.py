@@ -0,0 +1,436 @@
+"""Module for previewing the build output from memory over http.
+
+The whole output folder is loaded into a snapshot of response bodies with
+their ETag and compressed variants, so a request never touches the disk.
+Rebuilds load a new snapshot, reusing every file whose stat is unchanged,
+and swap it in with a single assignment; requests in flight keep the one
+they started with.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import email.utils
+import gzip
+import hashlib
+import json
+import mimetypes
+import threading
+import time
+from contextlib import suppress
+from http import HTTPStatus
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+
+from assets import ASSET_MANIFEST_NAME
+from precompress import MIN_SIZE, is_compressible
+from static_sync import scan_files
+
+# content codings in order of preference, with their sidecar suffix.
+ENCODINGS = {"br": ".br", "gzip": ".gz"}
+HEADER_LIMIT = 64 << 10
+KEEP_ALIVE_TIMEOUT = 15
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+
+class RangeNotSatisfiable(ValueError):
+    pass
+
+
+class Resource:
+    """One file of the output with everything needed to answer for it."""
+
+    __slots__ = (
+        "body",
+        "etag",
+        "content_type",
+        "last_modified",
+        "mtime",
+        "signature",
+        "variants",
+    )
+
+    def __init__(
+        self,
+        body: bytes,
+        content_type: str,
+        mtime: float,
+        signature: tuple,
+        variants: dict[str, bytes],
+    ):
+        self.body = body
+        self.etag = f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+        self.content_type = content_type
+        self.mtime = int(mtime)
+        self.last_modified = email.utils.formatdate(self.mtime, usegmt=True)
+        self.signature = signature
+        self.variants = variants
+
+    def variant_etag(self, encoding: str) -> str:
+        return f'{self.etag[:-1]}-{encoding}"'
+
+
+class Snapshot:
+    """The resources of an output folder keyed by relative posix path, and
+    the fingerprinted ones that can be cached forever."""
+
+    def __init__(self, files: dict[str, Resource], immutable: frozenset[str]):
+        self.files = files
+        self.immutable = immutable
+
+
+class Response:
+    __slots__ = ("status", "headers", "body")
+
+    def __init__(self, status: int, headers: dict[str, str], body: bytes = b""):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+
+def _content_type(rel: str) -> str:
+    content_type, _ = mimetypes.guess_type(rel)
+    content_type = content_type or "application/octet-stream"
+    if content_type.startswith("text/") or content_type in (
+        "application/javascript",
+        "application/json",
+        "image/svg+xml",
+    ):
+        content_type += "; charset=utf-8"
+    return content_type
+
+
+def _stat_key(stat) -> tuple[int, int] | None:
+    return (stat.st_size, stat.st_mtime_ns) if stat is not None else None
+
+
+def load_snapshot(root: Path | str, previous: Snapshot = None) -> Snapshot:
+    """Read every file under root into memory.
+
+    .gz and .br sidecars become variants of the file they compress, other
+    compressible files get a gzip variant made here. Resources of previous
+    whose file and sidecars kept their stat are reused as they are.
+    """
+    root = Path(root)
+    stats = scan_files(root)
+    old_files = previous.files if previous is not None else {}
+    files = {}
+    for rel, stat in stats.items():
+        if any(rel.endswith(s) and rel[: -len(s)] in stats for s in (".gz", ".br")):
+            continue
+        sidecars = {e: stats.get(rel + s) for e, s in ENCODINGS.items()}
+        signature = (_stat_key(stat), *map(_stat_key, sidecars.values()))
+        old = old_files.get(rel)
+        if old is not None and old.signature == signature:
+            files[rel] = old
+            continue
+
+        body = Path(root, rel).read_bytes()
+        variants = {}
+        for encoding, sidecar_stat in sidecars.items():
+            if sidecar_stat is not None:
+                suffix = ENCODINGS[encoding]
+                variants[encoding] = Path(root, rel + suffix).read_bytes()
+        files[rel] = _resource(rel, body, variants, stat.st_mtime, signature)
+    return Snapshot(files, _immutable(files))
+
+
+def memory_snapshot(files: dict[str, bytes], mtime: float = None) -> Snapshot:
+    """Like load_snapshot, for the files of a build kept in memory."""
+    mtime = time.time() if mtime is None else mtime
+    resources = {}
+    for rel, body in files.items():
+        if any(rel.endswith(s) and rel[: -len(s)] in files for s in (".gz", ".br")):
+            continue
+        variants = {
+            encoding: files[rel + suffix]
+            for encoding, suffix in ENCODINGS.items()
+            if rel + suffix in files
+        }
+        resources[rel] = _resource(rel, body, variants, mtime, ())
+    return Snapshot(resources, _immutable(resources))
+
+
+def _resource(
+    rel: str, body: bytes, variants: dict[str, bytes], mtime: float, signature: tuple
+) -> Resource:
+    if "gzip" not in variants and is_compressible(rel) and len(body) >= MIN_SIZE:
+        compressed = gzip.compress(body, compresslevel=6, mtime=0)
+        if len(compressed) < len(body):
+            variants["gzip"] = compressed
+    return Resource(body, _content_type(rel), mtime, signature, variants)
+
+
+def _immutable(files: dict[str, Resource]) -> frozenset[str]:
+    manifest = files.get(ASSET_MANIFEST_NAME)
+    if manifest is None:
+        return frozenset()
+    try:
+        return frozenset(json.loads(manifest.body).values())
+    except ValueError:
+        return frozenset()
+
+
+def parse_range(value: str, size: int) -> tuple[int, int] | None:
+    """Return the [start, stop) bytes a Range header asks for, or None when
+    the whole body should be sent. Only single byte ranges are honored."""
+    unit, _, spec = value.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if not first:
+            length = int(last)
+            if length <= 0:
+                raise RangeNotSatisfiable(value)
+            return max(0, size - length), size
+        start = int(first)
+        stop = int(last) + 1 if last else size
+    except ValueError:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable(value)
+    if stop <= start:
+        return None
+    return start, min(stop, size)
+
+
+def _accepted_encodings(value: str) -> set[str]:
+    accepted = set()
+    for item in value.split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, number = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(number)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def _etag_matches(value: str, etag: str) -> bool:
+    tags = [tag.strip() for tag in value.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+
+def _not_modified(headers: dict[str, str], etag: str, mtime: int) -> bool:
+    if "if-none-match" in headers:
+        return _etag_matches(headers["if-none-match"], etag)
+    since = headers.get("if-modified-since")
+    if since is None:
+        return False
+    try:
+        return mtime <= email.utils.parsedate_to_datetime(since).timestamp()
+    except (TypeError, ValueError):
+        return False
+
+
+class PreviewServer:
+    """Serves the snapshot of an output folder under basepath, or of the
+    files of a build kept in memory when given."""
+
+    def __init__(
+        self, root: Path | str, basepath: str = "/", files: dict[str, bytes] = None
+    ):
+        self.root = Path(root)
+        self.basepath = basepath if basepath.endswith("/") else basepath + "/"
+        self.files = files
+        self.snapshot = self._load()
+
+    def _load(self, previous: Snapshot = None) -> Snapshot:
+        if self.files is not None:
+            return memory_snapshot(self.files)
+        return load_snapshot(self.root, previous)
+
+    def reload(self) -> None:
+        """Load the output folder again and swap the new snapshot in."""
+        self.snapshot = self._load(self.snapshot)
+        print(f"serving {len(self.snapshot.files)} files from {self.root}")
+
+    def respond(
+        self, method: str, target: str, headers: dict[str, str]
+    ) -> Response:
+        """Answer a request given its method, target and lower cased headers."""
+        snapshot = self.snapshot
+        if method not in ("GET", "HEAD"):
+            return self._error(HTTPStatus.METHOD_NOT_ALLOWED, {"Allow": "GET, HEAD"})
+
+        path = unquote(urlsplit(target).path)
+        if path + "/" == self.basepath:
+            return Response(HTTPStatus.MOVED_PERMANENTLY, {"Location": self.basepath})
+        if not path.startswith(self.basepath):
+            return self._not_found(snapshot)
+        rel = path[len(self.basepath) :]
+        if rel == "" or rel.endswith("/"):
+            rel += "index.html"
+        resource = snapshot.files.get(rel)
+        if resource is None:
+            if f"{rel}/index.html" in snapshot.files:
+                location = path + "/"
+                return Response(HTTPStatus.MOVED_PERMANENTLY, {"Location": location})
+            return self._not_found(snapshot)
+
+        response_headers = {
+            "Content-Type": resource.content_type,
+            "Last-Modified": resource.last_modified,
+            "Cache-Control": IMMUTABLE if rel in snapshot.immutable else REVALIDATE,
+            "Accept-Ranges": "bytes",
+        }
+        if resource.variants:
+            response_headers["Vary"] = "Accept-Encoding"
+
+        body, etag = resource.body, resource.etag
+        byte_range = None
+        if "range" in headers and (
+            "if-range" not in headers or headers["if-range"] == resource.etag
+        ):
+            try:
+                byte_range = parse_range(headers["range"], len(body))
+            except RangeNotSatisfiable:
+                response_headers["Content-Range"] = f"bytes */{len(body)}"
+                return self._error(
+                    HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE, response_headers
+                )
+        if byte_range is None and resource.variants:
+            accepted = _accepted_encodings(headers.get("accept-encoding", ""))
+            for encoding in ENCODINGS:
+                if encoding in accepted and encoding in resource.variants:
+                    body = resource.variants[encoding]
+                    etag = resource.variant_etag(encoding)
+                    response_headers["Content-Encoding"] = encoding
+                    break
+        response_headers["ETag"] = etag
+
+        if _not_modified(headers, etag, resource.mtime):
+            for name in ("Content-Type", "Accept-Ranges", "Content-Encoding"):
+                response_headers.pop(name, None)
+            return Response(HTTPStatus.NOT_MODIFIED, response_headers)
+
+        status = HTTPStatus.OK
+        if byte_range is not None:
+            start, stop = byte_range
+            response_headers["Content-Range"] = f"bytes {start}-{stop - 1}/{len(body)}"
+            body = memoryview(body)[start:stop]
+            status = HTTPStatus.PARTIAL_CONTENT
+        response_headers["Content-Length"] = str(len(body))
+        return Response(status, response_headers, body if method == "GET" else b"")
+
+    def _not_found(self, snapshot: Snapshot) -> Response:
+        page = snapshot.files.get("404.html")
+        if page is None:
+            return self._error(HTTPStatus.NOT_FOUND)
+        headers = {"Content-Type": page.content_type, "Cache-Control": REVALIDATE}
+        headers["Content-Length"] = str(len(page.body))
+        return Response(HTTPStatus.NOT_FOUND, headers, page.body)
+
+    @staticmethod
+    def _error(status: HTTPStatus, headers: dict[str, str] = None) -> Response:
+        body = f"{status.value} {status.phrase}\n".encode()
+        headers = dict(headers or {})
+        headers["Content-Type"] = "text/plain; charset=utf-8"
+        headers["Content-Length"] = str(len(body))
+        return Response(status, headers, body)
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(
+                        reader.readuntil(b"\r\n\r\n"), KEEP_ALIVE_TIMEOUT
+                    )
+                except asyncio.LimitOverrunError:
+                    status = HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE
+                    self._write(writer, self._error(status), False)
+                    await writer.drain()
+                    break
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError):
+                    break
+
+                lines = head.decode("latin-1").split("\r\n")
+                parts = lines[0].split()
+                if len(parts) != 3 or not parts[2].startswith("HTTP/"):
+                    self._write(writer, self._error(HTTPStatus.BAD_REQUEST), False)
+                    await writer.drain()
+                    break
+                method, target, version = parts
+                headers = {}
+                for line in lines[1:]:
+                    name, sep, value = line.partition(":")
+                    if sep:
+                        headers[name.strip().lower()] = value.strip()
+
+                connection = headers.get("connection", "").lower()
+                if version == "HTTP/1.0":
+                    keep_alive = connection == "keep-alive"
+                else:
+                    keep_alive = connection != "close"
+                body_length = headers.get("content-length", "0")
+                if body_length != "0" or "transfer-encoding" in headers:
+                    # request bodies are not read, the connection can't be reused.
+                    keep_alive = False
+
+                self._write(writer, self.respond(method, target, headers), keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            with suppress(ConnectionError):
+                await writer.wait_closed()
+
+    @staticmethod
+    def _write(
+        writer: asyncio.StreamWriter, response: Response, keep_alive: bool
+    ) -> None:
+        status = HTTPStatus(response.status)
+        lines = [f"HTTP/1.1 {status.value} {status.phrase}"]
+        headers = dict(response.headers)
+        if status != HTTPStatus.NOT_MODIFIED:
+            headers.setdefault("Content-Length", "0")
+        headers["Connection"] = "keep-alive" if keep_alive else "close"
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        if response.body:
+            writer.write(response.body)
+
+    async def start(self, host: str = "", port: int = 8888) -> asyncio.Server:
+        server = await asyncio.start_server(
+            self._handle, host or None, port, limit=HEADER_LIMIT
+        )
+        bound_port = server.sockets[0].getsockname()[1]
+        print(
+            f"serving {self.root} at http://{host or 'localhost'}:{bound_port}"
+            f"{self.basepath}"
+        )
+        return server
+
+    async def serve_forever(self, host: str = "", port: int = 8888) -> None:
+        server = await self.start(host, port)
+        async with server:
+            await server.serve_forever()
+
+    def serve(self, host: str = "", port: int = 8888) -> None:
+        """Serve until interrupted."""
+        try:
+            asyncio.run(self.serve_forever(host, port))
+        except KeyboardInterrupt:
+            print("stopped serving")
+
+    def serve_in_thread(self, host: str = "", port: int = 8888) -> threading.Thread:
+        """Serve from a daemon thread, for running next to the watcher."""
+        thread = threading.Thread(
+            target=asyncio.run, args=(self.serve_forever(host, port),), daemon=True
+        )
+        thread.start()
+        return thread
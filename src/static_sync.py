@@ -0,0 +1,223 @@
+"""Module for syncing static assets into the output folder."""
+
+from __future__ import annotations
+
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from manifest import BuildManifest, file_hash
+
+try:
+    import fcntl
+except ImportError:  # not available on windows
+    fcntl = None
+
+SYNC_MODES = ("copy", "hardlink", "reflink")
+
+# linux ioctl to share extents between two files on btrfs / xfs.
+FICLONE = 0x40049409
+
+
+def scan_files(path: Path | str) -> dict[str, os.stat_result]:
+    """Return the stat of every file under path keyed by relative posix path."""
+    result = {}
+    stack = [(Path(path), "")]
+    while stack:
+        current, prefix = stack.pop()
+        with os.scandir(current) as it:
+            for entry in it:
+                rel = prefix + entry.name
+                if entry.is_dir(follow_symlinks=True):
+                    stack.append((Path(entry.path), rel + "/"))
+                elif entry.is_file(follow_symlinks=True):
+                    result[rel] = entry.stat()
+    return result
+
+
+def is_unchanged(
+    src: Path,
+    src_stat: os.stat_result,
+    dest: Path,
+    checksum: bool = False,
+    src_hash: str = None,
+) -> bool:
+    """Compare a source file against its copy using size, mtime and
+    optionally the content hash."""
+    try:
+        dest_stat = dest.stat()
+    except FileNotFoundError:
+        return False
+
+    if (dest_stat.st_dev, dest_stat.st_ino) == (src_stat.st_dev, src_stat.st_ino):
+        return True
+    if dest_stat.st_size != src_stat.st_size:
+        return False
+    if dest_stat.st_mtime_ns == src_stat.st_mtime_ns:
+        return True
+    if not checksum:
+        return False
+    if (src_hash or file_hash(src)) != file_hash(dest):
+        return False
+    # align the mtime so the next build can skip hashing this file.
+    shutil.copystat(src, dest)
+    return True
+
+
+def place_file(src: Path, dest: Path, mode: str = "copy") -> None:
+    """Copy, hardlink or reflink src to dest, falling back to a plain copy."""
+    tmp_dest = dest.with_name(f".{dest.name}.tmp")
+    tmp_dest.unlink(missing_ok=True)
+
+    placed = False
+    if mode == "hardlink":
+        try:
+            os.link(src, tmp_dest)
+            placed = True
+        except OSError:
+            print(f"cannot hardlink {src}, copying it instead.")
+    elif mode == "reflink" and fcntl is not None:
+        try:
+            with open(src, "rb") as fsrc, open(tmp_dest, "wb") as fdest:
+                fcntl.ioctl(fdest.fileno(), FICLONE, fsrc.fileno())
+            shutil.copystat(src, tmp_dest)
+            placed = True
+        except OSError:
+            print(f"cannot reflink {src}, copying it instead.")
+            tmp_dest.unlink(missing_ok=True)
+
+    if not placed:
+        shutil.copy2(src, tmp_dest)
+    os.replace(tmp_dest, dest)
+
+
+def sync_folder_contents(
+    from_path: Path | str,
+    to_path: Path | str,
+    manifest: BuildManifest = None,
+    mode: str = "copy",
+    checksum: bool = False,
+    max_workers: int = None,
+    hashes: dict[str, str] = None,
+    rename: dict[str, str] = None,
+) -> dict[str, list[str]]:
+    """Make to_path mirror the files in from_path.
+
+    Only new or changed files are copied and files synced by a previous build
+    whose source or output name is gone are deleted. Files that were never
+    synced, such as generated pages, are left alone. Without a manifest
+    nothing is deleted.
+
+    Files listed in rename are written under the given relative path instead
+    of their own. Known content hashes can be passed in hashes, they are
+    stored in the manifest without rehashing.
+    """
+    if mode not in SYNC_MODES:
+        raise ValueError(f"expecting sync mode in {SYNC_MODES} but received {mode}")
+
+    print(f"syncing files from {from_path} to {to_path}")
+    from_path: Path = Path(from_path)
+    to_path: Path = Path(to_path)
+    previous = manifest.assets if manifest is not None else {}
+    hashes = hashes or {}
+    rename = rename or {}
+
+    sources = scan_files(from_path)
+    copied, unchanged, deleted = [], [], []
+    to_copy = []
+    assets = {}
+    for rel, src_stat in sorted(sources.items()):
+        output = rename.get(rel, rel)
+        src, dest = Path(from_path, rel), Path(to_path, output)
+        entry = previous.get(rel, {})
+        src_hash = hashes.get(rel)
+        if checksum and src_hash is None:
+            same_stat = entry.get("size") == src_stat.st_size and entry.get(
+                "mtime_ns"
+            ) == src_stat.st_mtime_ns
+            src_hash = entry.get("hash") if same_stat else None
+            src_hash = src_hash or file_hash(src)
+
+        assets[rel] = {"size": src_stat.st_size, "mtime_ns": src_stat.st_mtime_ns}
+        if src_hash is not None:
+            assets[rel]["hash"] = src_hash
+        if output != rel:
+            assets[rel]["output"] = output
+
+        if is_unchanged(src, src_stat, dest, checksum, src_hash):
+            unchanged.append(rel)
+        else:
+            to_copy.append((src, dest))
+            copied.append(rel)
+
+    for parent in sorted({dest.parent for _, dest in to_copy}):
+        parent.mkdir(parents=True, exist_ok=True)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = []
+        for src, dest in to_copy:
+            print(f"copying {src} to {dest}")
+            futures.append(pool.submit(place_file, src, dest, mode))
+        for future in futures:
+            future.result()
+
+    outputs = {entry.get("output", rel) for rel, entry in assets.items()}
+    for rel, entry in sorted(previous.items()):
+        output = entry.get("output", rel)
+        if output in outputs:
+            continue
+        dest = Path(to_path, output)
+        if dest.is_file():
+            if rel in sources:
+                print(f"{Path(from_path, rel)} was renamed, deleting {dest}")
+            else:
+                print(f"{Path(from_path, rel)} was removed, deleting {dest}")
+            dest.unlink()
+            deleted.append(output)
+        if dest.parent != to_path:
+            try:
+                dest.parent.rmdir()
+            except OSError:
+                pass
+
+    if manifest is not None:
+        manifest.assets = assets
+
+    print(
+        f"{to_path} is synced: {len(copied)} copied, "
+        f"{len(unchanged)} unchanged, {len(deleted)} deleted"
+    )
+    return {"copied": copied, "unchanged": unchanged, "deleted": deleted}
+
+
+def sync_file(
+    from_path: Path | str,
+    to_path: Path | str,
+    rel: str,
+    manifest: BuildManifest = None,
+    mode: str = "copy",
+) -> bool:
+    """Sync a single file given by its path relative to from_path.
+
+    Returns True when the file was copied or deleted.
+    """
+    src, dest = Path(from_path, rel), Path(to_path, rel)
+    assets = manifest.assets if manifest is not None else {}
+
+    if not src.is_file():
+        assets.pop(rel, None)
+        if not dest.is_file():
+            return False
+        print(f"{src} was removed, deleting {dest}")
+        dest.unlink()
+        return True
+
+    src_stat = src.stat()
+    assets[rel] = {"size": src_stat.st_size, "mtime_ns": src_stat.st_mtime_ns}
+    if is_unchanged(src, src_stat, dest):
+        return False
+    print(f"copying {src} to {dest}")
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    place_file(src, dest, mode)
+    return True
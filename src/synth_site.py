@@ -0,0 +1,180 @@
+"""Module for generating synthetic sites shaped like ./content for benchmarks."""
+
+from __future__ import annotations
+
+import argparse
+import random
+import struct
+import zlib
+from pathlib import Path
+
+WORDS = (
+    "the of and a to in is was that for it as with his on be at by had are "
+    "but from or have an they which one you were her all she there would "
+    "their we him been has when who will more no if out so said what up its "
+    "about into than them can only other new some could time these two may "
+    "then do first any my now such like our over man me even most made after "
+    "also did many before must through back years where much your way well "
+    "down should because each just those people how too little state good "
+    "very make world still own see men work long get here between both life "
+    "being under never day same another know while last might us great old "
+    "year off come since against go came right used take three ring shire "
+    "elves wizard mountain river forest tower kingdom journey fellowship"
+).split()
+
+DEFAULT_TEMPLATE = """<!doctype html>
+<html>
+
+<head>
+    <meta charset="utf-8" />
+    <meta name="viewport" content="width=device-width, initial-scale=1" />
+    <title>{{ Title }}</title>
+    <link href="/index.css" rel="stylesheet" />
+</head>
+
+<body>
+    <article>{{ Content }}</article>
+</body>
+
+</html>"""
+
+DEFAULT_CSS = "body { font-family: sans-serif; max-width: 40em; margin: auto; }\n"
+
+IMAGE_COUNT = 8
+
+
+def _png(width: int, height: int) -> bytes:
+    """Build a tiny valid grayscale png."""
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        body = kind + data
+        crc = struct.pack(">I", zlib.crc32(body))
+        return struct.pack(">I", len(data)) + body + crc
+
+    raw = b"".join(b"\x00" + b"\x80" * width for _ in range(height))
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(raw))
+        + chunk(b"IEND", b"")
+    )
+
+
+class SiteGenerator:
+    """Produce deterministic markdown pages with every supported block type."""
+
+    def __init__(self, seed: int = 0, page_count: int = 100):
+        self.rng = random.Random(seed)
+        self.page_count = page_count
+
+    def words(self, low: int, high: int) -> str:
+        return " ".join(self.rng.choices(WORDS, k=self.rng.randint(low, high)))
+
+    def inline_text(self, sentences: int) -> str:
+        parts = []
+        for _ in range(sentences):
+            sentence = self.words(6, 18)
+            roll = self.rng.random()
+            if roll < 0.15:
+                sentence += f" **{self.words(1, 3)}**"
+            elif roll < 0.3:
+                sentence += f" _{self.words(1, 3)}_"
+            elif roll < 0.4:
+                sentence += f" `{self.words(1, 2)}`"
+            elif roll < 0.55:
+                target = self.rng.randrange(self.page_count)
+                sentence += f" [{self.words(1, 4)}](/blog/post-{target})"
+            elif roll < 0.6:
+                external = f"https://example.com/{self.rng.randrange(10**6)}"
+                sentence += f" [{self.words(1, 3)}]({external})"
+            parts.append(sentence.capitalize() + ".")
+        return " ".join(parts)
+
+    def block(self) -> str:
+        roll = self.rng.random()
+        if roll < 0.45:
+            lines = [self.inline_text(2) for _ in range(self.rng.randint(1, 3))]
+            return "\n".join(lines)
+        if roll < 0.55:
+            level = self.rng.randint(2, 4)
+            return f"{'#' * level} {self.words(2, 6).title()}"
+        if roll < 0.65:
+            items = self.rng.randint(2, 6)
+            return "\n".join(f"- {self.inline_text(1)}" for _ in range(items))
+        if roll < 0.72:
+            items = self.rng.randint(2, 6)
+            return "\n".join(
+                f"{i}. {self.inline_text(1)}" for i in range(1, items + 1)
+            )
+        if roll < 0.8:
+            lines = self.rng.randint(1, 3)
+            return "\n".join(f"> {self.words(5, 12)}" for _ in range(lines))
+        if roll < 0.9:
+            body = "\n".join(
+                f"print({self.words(1, 4)!r})" for _ in range(self.rng.randint(2, 8))
+            )
+            return f"```\n{body}\n```"
+        image = self.rng.randrange(IMAGE_COUNT)
+        return f"![{self.words(1, 4)}](/images/img-{image}.png)"
+
+    def page(self, index: int, blocks: int) -> str:
+        title = f"Post {index}: {self.words(2, 6).title()}"
+        body = [f"# {title}", "[< Back Home](/)"]
+        body.extend(self.block() for _ in range(blocks))
+        return "\n\n".join(body) + "\n"
+
+
+def generate_site(
+    root: Path | str,
+    pages: int,
+    blocks_per_page: int = 30,
+    seed: int = 0,
+) -> int:
+    """Write content/, static/ and template.html under root.
+
+    Blog posts go to content/blog/post-N/index.md next to a home page listing
+    them. The number of blocks per page varies around blocks_per_page.
+    Returns the total bytes of markdown written.
+    """
+    root = Path(root)
+    generator = SiteGenerator(seed, pages)
+    blog_dir = Path(root, "content", "blog")
+    blog_dir.mkdir(parents=True, exist_ok=True)
+
+    written = 0
+    for i in range(pages):
+        spread = generator.rng.gauss(blocks_per_page, blocks_per_page / 4)
+        blocks = max(1, int(spread))
+        page_dir = Path(blog_dir, f"post-{i}")
+        page_dir.mkdir(exist_ok=True)
+        markdown = generator.page(i, blocks)
+        Path(page_dir, "index.md").write_text(markdown)
+        written += len(markdown)
+
+    listed = min(pages, 50)
+    home = "# Synthetic Site\n\n" + "\n".join(
+        f"- [Post {i}](/blog/post-{i})" for i in range(listed)
+    )
+    Path(root, "content", "index.md").write_text(home)
+
+    images_dir = Path(root, "static", "images")
+    images_dir.mkdir(parents=True, exist_ok=True)
+    for i in range(IMAGE_COUNT):
+        image = _png(16 * (i + 1), 9 * (i + 1))
+        Path(images_dir, f"img-{i}.png").write_bytes(image)
+    Path(root, "static", "index.css").write_text(DEFAULT_CSS)
+    Path(root, "template.html").write_text(DEFAULT_TEMPLATE)
+    Path(root, "docs").mkdir(exist_ok=True)
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="generate a synthetic site")
+    parser.add_argument("root", help="folder to write content/, static/ into")
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--blocks", type=int, default=30, help="blocks per page")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    size = generate_site(args.root, args.pages, args.blocks, args.seed)
+    print(f"wrote {args.pages} pages ({size} bytes of markdown) to {args.root}")
@@ -0,0 +1,245 @@
+"""Module for compiling html templates into literal segments and slots.
+
+A template is compiled once per url resolver into alternating literal
+strings and slot names such as {{ Title }} and {{ Content }}, so rendering a
+page is a single join. A template whose first line is {{ extends "layout.html" }} is
+placed into the {{ Content }} slot of that layout, relative to its folder.
+Compiling with minify drops the template's insignificant whitespace and
+comments once, so minified pages cost nothing extra to render.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import re
+from pathlib import Path
+from typing import Iterable, TextIO
+
+from htmlnode import HTMLNode, write_chunks, write_html
+from urls import URLResolver
+
+SLOT_PATTERN = re.compile(r"\{\{ (\w+) \}\}")
+URL_ATTRIBUTE_PATTERN = re.compile(r'\b(href|src)="([^"]*)"')
+EXTENDS_PATTERN = re.compile(r'\A\s*\{\{ extends "([^"]+)" \}\}[ \t]*\n?')
+DIRECTORY_TEMPLATE_NAME = "_template.html"
+
+MARKUP_PATTERN = re.compile(r"(<!--.*?-->|<[^>]*>)", re.S)
+TAG_NAME_PATTERN = re.compile(r"</?\s*([!\w-]+)")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+# elements whose text is kept exactly as written.
+RAW_TEXT_TAGS = frozenset(("pre", "textarea", "script", "style"))
+VOID_TAGS = frozenset(
+    "area base br col embed hr img input link meta source track wbr".split()
+)
+# whitespace next to these tags never renders.
+BLOCK_TAGS = frozenset(
+    (
+        "!doctype html head body title meta link base script style noscript "
+        "div p article section header footer nav main aside ul ol li dl dt dd "
+        "h1 h2 h3 h4 h5 h6 pre blockquote figure figcaption table thead tbody "
+        "tfoot tr td th form fieldset hr br"
+    ).split()
+)
+
+_CACHE: dict[tuple[str, str, bool], tuple[tuple, CompiledTemplate]] = {}
+
+
+class CompiledTemplate:
+    """A template split into literals around named slots.
+
+    literals always has one more item than slots, rendering interleaves them.
+    """
+
+    def __init__(self, literals: list[str], slots: list[str], files: list[Path]):
+        self.literals = literals
+        self.slots = slots
+        self.files = files
+
+    def render(self, **values: str) -> str:
+        parts = [self.literals[0]]
+        for slot, literal in zip(self.slots, self.literals[1:]):
+            parts.append(values.get(slot, f"{{{{ {slot} }}}}"))
+            parts.append(literal)
+        return "".join(parts)
+
+    def render_to(
+        self, out: TextIO, **values: str | HTMLNode | Iterable[str]
+    ) -> None:
+        """Write the template into out, streaming html node values and
+        iterables of html chunks."""
+        out.write(self.literals[0])
+        for slot, literal in zip(self.slots, self.literals[1:]):
+            value = values.get(slot, f"{{{{ {slot} }}}}")
+            if isinstance(value, HTMLNode):
+                write_html(value, out)
+            elif isinstance(value, str):
+                out.write(value)
+            else:
+                write_chunks(value, out)
+            out.write(literal)
+
+
+def resolve_template_source(template_path: Path | str) -> tuple[str, list[Path]]:
+    """Return the template text with its layouts applied and every file used."""
+    template_path = Path(template_path)
+    files = []
+    body = None
+    current = template_path
+    while True:
+        if current in files:
+            raise ValueError(f"template layouts form a cycle at {current}")
+        files.append(current)
+        with open(current, "r") as f:
+            text = f.read()
+
+        if body is not None:
+            if "{{ Content }}" not in text:
+                raise ValueError(f"layout {current} has no {{{{ Content }}}} slot")
+            text = text.replace("{{ Content }}", body, 1)
+
+        match = EXTENDS_PATTERN.match(text)
+        if match is None:
+            return text, files
+        body = text[match.end() :]
+        current = Path(current.parent, match.group(1))
+
+
+def _tag_name(tag: str) -> str:
+    match = TAG_NAME_PATTERN.match(tag)
+    return match.group(1).lower() if match else ""
+
+
+def _markup_tokens(text: str) -> list[tuple[str, str]]:
+    """Split html into ("tag", ...), ("text", ...) and ("raw", ...) tokens,
+    where raw is the untouched content of a pre, textarea, script or style.
+    Comments are dropped, apart from conditional ones."""
+    tokens: list[tuple[str, str]] = []
+    pos = 0
+    for match in MARKUP_PATTERN.finditer(text):
+        if match.start() < pos:
+            continue
+        _append_text(tokens, text[pos : match.start()])
+        tag = match.group()
+        pos = match.end()
+        if tag.startswith("<!--"):
+            if tag.startswith("<!--[if"):
+                tokens.append(("tag", tag))
+            continue
+
+        tokens.append(("tag", tag))
+        name = _tag_name(tag)
+        if tag.startswith("</") or name not in RAW_TEXT_TAGS:
+            continue
+        close = re.compile(rf"</{name}\s*>", re.I).search(text, pos)
+        end = close.start() if close else len(text)
+        tokens.append(("raw", text[pos:end]))
+        pos = end
+    _append_text(tokens, text[pos:])
+    return tokens
+
+
+def _append_text(tokens: list[tuple[str, str]], text: str) -> None:
+    # text on both sides of a dropped comment becomes one token.
+    if tokens and tokens[-1][0] == "text":
+        tokens[-1] = ("text", tokens[-1][1] + text)
+    else:
+        tokens.append(("text", text))
+
+
+def minify_template_source(text: str) -> str:
+    """Remove comments and whitespace that cannot change how the html
+    renders, leaving pre, textarea, script and style contents untouched."""
+    tokens = _markup_tokens(text)
+    result = []
+    for i, (kind, token) in enumerate(tokens):
+        if kind == "raw":
+            result.append(token)
+        elif kind == "tag":
+            if not token.startswith("<!--"):
+                token = WHITESPACE_PATTERN.sub(" ", token)
+                if _tag_name(token) in VOID_TAGS and token.endswith("/>"):
+                    token = token[:-2].rstrip() + ">"
+            result.append(token)
+        else:
+            token = WHITESPACE_PATTERN.sub(" ", token)
+            if i == 0 or _tag_name(tokens[i - 1][1]) in BLOCK_TAGS:
+                token = token.lstrip()
+            if i + 1 == len(tokens) or _tag_name(tokens[i + 1][1]) in BLOCK_TAGS:
+                token = token.rstrip()
+            result.append(token)
+    return "".join(result)
+
+
+def compile_template(
+    template_path: Path | str, resolver: URLResolver, minify: bool = False
+) -> CompiledTemplate:
+    """Compile a template, resolving its href and src urls."""
+    text, files = resolve_template_source(template_path)
+    text = URL_ATTRIBUTE_PATTERN.sub(
+        lambda m: f'{m.group(1)}="{resolver.resolve(m.group(2))}"', text
+    )
+    if minify:
+        text = minify_template_source(text)
+
+    pieces = SLOT_PATTERN.split(text)
+    return CompiledTemplate(pieces[0::2], pieces[1::2], files)
+
+
+def _signature(files: list[Path]) -> tuple:
+    try:
+        return tuple((str(f), f.stat().st_mtime_ns) for f in files)
+    except FileNotFoundError:
+        return ()
+
+
+def load_template(
+    template_path: Path | str, resolver: URLResolver, minify: bool = False
+) -> CompiledTemplate:
+    """Return the compiled template, recompiling when any of its files changed."""
+    key = (str(template_path), resolver.cache_key, minify)
+    cached = _CACHE.get(key)
+    if cached is not None:
+        signature, compiled = cached
+        if signature and signature == _signature(compiled.files):
+            return compiled
+
+    compiled = compile_template(template_path, resolver, minify)
+    _CACHE[key] = (_signature(compiled.files), compiled)
+    return compiled
+
+
+def template_digest(template_path: Path | str) -> str:
+    """Hash the template source with its layouts, for build invalidation."""
+    text, _ = resolve_template_source(template_path)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def find_template(
+    from_path: Path | str,
+    content_root: Path | str,
+    default_template: Path | str,
+    cache: dict[Path, Path] = None,
+) -> Path:
+    """Return the closest _template.html above from_path inside content_root,
+    or the default template when there is none."""
+    content_root = Path(content_root)
+    folder = Path(from_path).parent
+    visited = []
+    found = Path(default_template)
+    while True:
+        if cache is not None and folder in cache:
+            found = cache[folder]
+            break
+        visited.append(folder)
+        candidate = Path(folder, DIRECTORY_TEMPLATE_NAME)
+        if candidate.is_file():
+            found = candidate
+            break
+        if folder == content_root or folder == folder.parent:
+            break
+        folder = folder.parent
+
+    if cache is not None:
+        for v in visited:
+            cache[v] = found
+    return found
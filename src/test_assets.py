@@ -0,0 +1,92 @@
+import contextlib
+import io
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import assets
+from assets import ASSET_MANIFEST_NAME, fingerprinted_name, sync_assets
+from manifest import BuildManifest, file_hash
+from template import compile_template
+from urls import URLResolver
+
+
+class TestAssets(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.static = Path(self.tmp.name, "static")
+        self.docs = Path(self.tmp.name, "docs")
+        self.manifest = BuildManifest(Path(self.tmp.name, "manifest.json"))
+
+        Path(self.static, "images").mkdir(parents=True)
+        self.css = Path(self.static, "index.css")
+        self.css.write_text("body {}")
+        Path(self.static, "images", "a.png").write_bytes(b"png")
+        Path(self.static, "robots.txt").write_text("User-agent: *")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def sync(self, fingerprint=True):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return sync_assets(
+                self.static, self.docs, self.manifest, fingerprint=fingerprint
+            )
+
+    def test_fingerprinted_name(self):
+        self.assertEqual(
+            fingerprinted_name("a/b.min.css", "0123456789"), "a/b.min.01234567.css"
+        )
+        self.assertEqual(fingerprinted_name("LICENSE", "0123456789"), "LICENSE.01234567")
+
+    def test_assets_are_written_under_hashed_names(self):
+        names = self.sync()
+        css_name = fingerprinted_name("index.css", file_hash(self.css))
+        self.assertEqual(names["index.css"], css_name)
+        self.assertNotIn("robots.txt", names)
+        self.assertEqual(Path(self.docs, css_name).read_text(), "body {}")
+        self.assertFalse(Path(self.docs, "index.css").exists())
+        self.assertTrue(Path(self.docs, "robots.txt").exists())
+        written = json.loads(Path(self.docs, ASSET_MANIFEST_NAME).read_text())
+        self.assertEqual(written, names)
+
+    def test_changed_asset_replaces_old_name(self):
+        old_name = self.sync()["index.css"]
+        self.css.write_text("body { margin: 0 }")
+        new_name = self.sync()["index.css"]
+        self.assertNotEqual(old_name, new_name)
+        self.assertFalse(Path(self.docs, old_name).exists())
+        self.assertTrue(Path(self.docs, new_name).exists())
+
+    def test_unchanged_assets_are_not_rehashed(self):
+        self.sync()
+        with mock.patch.object(assets, "file_hash") as hasher:
+            self.sync()
+        hasher.assert_not_called()
+
+    def test_disabling_restores_plain_names(self):
+        names = self.sync()
+        self.sync(fingerprint=False)
+        self.assertTrue(Path(self.docs, "index.css").exists())
+        self.assertFalse(Path(self.docs, names["index.css"]).exists())
+        self.assertFalse(Path(self.docs, ASSET_MANIFEST_NAME).exists())
+
+    def test_resolver_rewrites_asset_urls(self):
+        names = self.sync()
+        resolver = URLResolver("/site/", names)
+        css_url = "/site/" + names["index.css"]
+        self.assertEqual(resolver.resolve("/index.css"), css_url)
+        self.assertEqual(resolver.resolve("/index.css?v=1"), css_url + "?v=1")
+        self.assertEqual(resolver.resolve("/robots.txt"), "/site/robots.txt")
+        self.assertNotEqual(resolver.cache_key, URLResolver("/site/").cache_key)
+
+        template = Path(self.tmp.name, "template.html")
+        template.write_text('<link href="/index.css">{{ Content }}')
+        compiled = compile_template(template, resolver)
+        self.assertEqual(compiled.literals[0], f'<link href="{css_url}">')
+
+
+if __name__ == "__main__":
+    unittest.main()
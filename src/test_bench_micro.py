@@ -0,0 +1,28 @@
+import unittest
+
+from bench_micro import benchmarks, compare
+
+
+class TestBenchMicro(unittest.TestCase):
+    def test_every_benchmark_runs(self):
+        cases = benchmarks()
+        for name in (
+            "split_nodes_delimiter/adversarial",
+            "text_to_textnodes/typical",
+            "markdown_to_html_node/small",
+            "block_to_blocktype/typical",
+            "ParentNode.to_html/deep",
+        ):
+            self.assertIn(name, cases)
+        for name, func in cases.items():
+            if not name.endswith("adversarial"):
+                func()
+
+    def test_compare_flags_regressions(self):
+        baseline = {"fast": 1.0, "slow": 1.0}
+        results = {"fast": 1.1, "slow": 1.5, "new": 9.0}
+        self.assertEqual(compare(results, baseline, 1.25), ["slow"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from content_db import ContentDB
+from manifest import BuildManifest, file_hash
+from markdown_html import (
+    PARALLEL_MIN_PAGES,
+    discover_pages,
+    generate_pages_recursive,
+)
+from template import DIRECTORY_TEMPLATE_NAME
+
+
+class TestContentDB(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.content = Path(self.root, "content")
+        self.docs = Path(self.root, "docs")
+        self.db_path = Path(self.root, "content.db")
+        Path(self.content, "blog", "tom").mkdir(parents=True)
+        Path(self.content, "index.md").write_text("# Home\n\nhello")
+        self.tom = Path(self.content, "blog", "tom", "index.md")
+        self.tom.write_text("\n# Tom Bombadil\n\nsings")
+        Path(self.content, "blog", DIRECTORY_TEMPLATE_NAME).write_text("{{ Content }}")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def refresh(self, db):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return db.refresh(self.content, self.docs)
+
+    def test_refresh_finds_pages_like_discover_pages(self):
+        db = ContentDB(self.db_path)
+        pages = self.refresh(db)
+        self.assertEqual(pages, sorted(discover_pages(self.content, self.docs)))
+        rows = {Path(r["source"]).parent.name: r for r in db.pages()}
+        self.assertEqual(rows["tom"]["hash"], file_hash(self.tom))
+        self.assertEqual(rows["content"]["output"], str(Path(self.docs, "index.html")))
+        self.assertIsNone(rows["tom"]["title"])
+        db.close()
+
+    def test_only_changed_sources_are_read(self):
+        db = ContentDB(self.db_path)
+        self.refresh(db)
+        self.assertEqual(db.read, 2)
+        db.close()
+
+        db = ContentDB.load(self.db_path)
+        self.refresh(db)
+        self.assertEqual(db.read, 0)
+
+        self.tom.write_text("# Tom\n\nedited")
+        os.utime(self.tom, ns=(10**9, 10**9))
+        Path(self.content, "index.md").unlink()
+        self.assertEqual(len(self.refresh(db)), 1)
+        self.assertEqual(db.read, 1)
+        self.assertEqual(db.hashes(), {str(self.tom): file_hash(self.tom)})
+
+    def test_unreadable_database_starts_empty(self):
+        self.db_path.write_bytes(b"not a database" * 100)
+        with contextlib.redirect_stdout(io.StringIO()):
+            db = ContentDB.load(self.db_path)
+        self.assertEqual(db.pages(), [])
+
+    def test_build_uses_stored_hashes(self):
+        template = Path(self.root, "template.html")
+        template.write_text("{{ Title }}{{ Content }}")
+        manifest = BuildManifest(Path(self.root, "manifest.json"))
+        db = ContentDB()
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            for _ in range(2):
+                manifest.reset()
+                generate_pages_recursive(
+                    self.content, template, self.docs, "/", manifest, content_db=db
+                )
+        self.assertEqual(out.getvalue().count("is up to date"), 2)
+        self.assertEqual(
+            manifest.pages[str(self.tom)]["source_hash"], file_hash(self.tom)
+        )
+
+    def build(self, db, jobs=1):
+        template = Path(self.root, "template.html")
+        template.write_text("{{ Title }}{{ Content }}")
+        manifest = BuildManifest.load(Path(self.root, "manifest.json"))
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            generate_pages_recursive(
+                self.content, template, self.docs, "/", manifest, jobs, content_db=db
+            )
+            manifest.save()
+        return out.getvalue()
+
+    def test_build_stores_titles(self):
+        for i in range(PARALLEL_MIN_PAGES):
+            page = Path(self.content, "posts", str(i), "index.md")
+            page.parent.mkdir(parents=True)
+            page.write_text(f"# Post {i}\n\ntext")
+        db = ContentDB()
+        self.build(db, jobs=2)
+        titles = {r["output"]: r["title"] for r in db.pages()}
+        self.assertEqual(titles[str(Path(self.docs, "index.html"))], "Home")
+        self.assertEqual(
+            titles[str(Path(self.docs, "posts", "3", "index.html"))], "Post 3"
+        )
+        self.assertEqual(db.titles()[str(self.tom)], "Tom Bombadil")
+
+    def test_edited_page_gets_its_new_title(self):
+        db = ContentDB()
+        self.build(db)
+        self.tom.write_text("# Tom\n\nedited")
+        os.utime(self.tom, ns=(10**9, 10**9))
+        self.refresh(db)
+        self.assertIsNone(db.titles()[str(self.tom)])
+        self.build(db)
+        self.assertEqual(db.titles()[str(self.tom)], "Tom")
+
+    def test_untitled_pages_are_generated(self):
+        self.build(ContentDB())
+        # a new database knows no titles, so up to date pages are generated.
+        db = ContentDB()
+        output = self.build(db)
+        self.assertNotIn("is up to date", output)
+        self.assertEqual(db.titles()[str(self.tom)], "Tom Bombadil")
+        self.assertEqual(self.build(db).count("is up to date"), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+import contextlib
+import io
+import tempfile
+import unittest
+from pathlib import Path
+
+from fragment_cache import FragmentCache
+from markdown_html import PARALLEL_MIN_PAGES, generate_pages_recursive
+
+
+class TestFragmentCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.path = Path(self.root, "fragments.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_key_depends_on_context_type_and_block(self):
+        key = FragmentCache.key("/", "paragraph", "text")
+        self.assertEqual(key, FragmentCache.key("/", "paragraph", "text"))
+        self.assertNotEqual(key, FragmentCache.key("/site/", "paragraph", "text"))
+        self.assertNotEqual(key, FragmentCache.key("/", "heading", "text"))
+        self.assertNotEqual(key, FragmentCache.key("/", "paragraph", "text2"))
+
+    def test_lru_eviction(self):
+        cache = FragmentCache(max_bytes=10)
+        cache.put("a", "aaaa")
+        cache.put("b", "bbbb")
+        self.assertEqual(cache.get("a"), "aaaa")
+        cache.put("c", "cccc")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(list(cache.entries), ["a", "c"])
+        self.assertEqual(cache.size, 8)
+        cache.put("huge", "x" * 11)
+        self.assertIsNone(cache.get("huge"))
+
+    def test_only_workers_track_new_entries(self):
+        cache = FragmentCache(max_bytes=1000)
+        for i in range(10000):
+            cache.put(str(i), "x" * 100)
+        self.assertEqual(len(cache.entries), 10)
+        self.assertEqual(cache.take_new(), {})
+
+        cache.track_new = True
+        cache.put("a", "<p>a</p>")
+        self.assertEqual(cache.take_new(), {"a": "<p>a</p>"})
+        self.assertEqual(cache.take_new(), {})
+
+    def test_size_counts_utf8_bytes(self):
+        cache = FragmentCache(max_bytes=10)
+        cache.put("a", "éé")
+        self.assertEqual(cache.size, 4)
+        cache.put("b", "éééé")
+        self.assertEqual(list(cache.entries), ["b"])
+        self.assertEqual(cache.size, 8)
+
+    def test_save_and_load(self):
+        cache = FragmentCache(self.path)
+        cache.put("a", "<p>a</p>")
+        cache.put("b", "<p>b</p>")
+        cache.get("a")
+        cache.save()
+
+        loaded = FragmentCache.load(self.path)
+        self.assertEqual(list(loaded.entries), ["b", "a"])
+        self.assertEqual(loaded.size, cache.size)
+
+        self.path.write_text('{"version": 0, "fragments": [["a", "old"]]}')
+        self.assertEqual(len(FragmentCache.load(self.path).entries), 0)
+
+    def build(self, fragments, jobs=1):
+        content = Path(self.root, "content")
+        template = Path(self.root, "template.html")
+        template.write_text("<title>{{ Title }}</title>{{ Content }}")
+        for i in range(PARALLEL_MIN_PAGES + 2):
+            page_dir = Path(content, f"post{i}")
+            page_dir.mkdir(parents=True, exist_ok=True)
+            Path(page_dir, "index.md").write_text(
+                f"# Post {i}\n\nshared **disclaimer**\n\n- [home](/)\n- post {i}"
+            )
+        dest = Path(self.root, f"docs{jobs}")
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_pages_recursive(
+                content, template, dest, "/site/", jobs=jobs, fragments=fragments
+            )
+        return {
+            str(p.relative_to(dest)): p.read_text()
+            for p in sorted(dest.rglob("*"))
+            if p.is_file()
+        }
+
+    def test_build_reuses_fragments(self):
+        uncached = self.build(None)
+        cache = FragmentCache(self.path)
+        self.assertEqual(self.build(cache), uncached)
+        self.assertEqual(cache.take_new(), {})
+        # the shared paragraph is rendered once and reused by every page.
+        self.assertEqual(cache.hits, PARALLEL_MIN_PAGES + 1)
+        hits = cache.hits
+        self.assertEqual(self.build(cache), uncached)
+        self.assertEqual(cache.misses, 2 * (PARALLEL_MIN_PAGES + 2) + 1)
+        self.assertEqual(cache.hits, hits + 3 * (PARALLEL_MIN_PAGES + 2))
+
+    def test_parallel_build_merges_fragments(self):
+        cache = FragmentCache(self.path)
+        self.assertEqual(self.build(cache, jobs=2), self.build(None))
+        # every page's title, list and the shared paragraph come back.
+        self.assertEqual(len(cache.entries), 2 * (PARALLEL_MIN_PAGES + 2) + 1)
+        # and so does every lookup the workers made.
+        self.assertEqual(cache.hits + cache.misses, 3 * (PARALLEL_MIN_PAGES + 2))
+        self.assertGreater(cache.hits, 0)
+        self.assertEqual(cache.take_new(), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from markdown_html import PARALLEL_MIN_PAGES, discover_pages, generate_pages_recursive
+from output_sink import MemorySink
+from search_index import SearchIndex
+
+
+class TestGeneratePages(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.content = Path(self.root, "content")
+        self.template = Path(self.root, "template.html")
+        self.template.write_text("<title>{{ Title }}</title>{{ Content }}")
+
+        for i in range(PARALLEL_MIN_PAGES + 4):
+            page_dir = Path(self.content, "blog", f"post{i}")
+            page_dir.mkdir(parents=True)
+            Path(page_dir, "index.md").write_text(
+                f"# Post {i}\n\nSome **bold** text and [a link](/blog/post{i})\n\n"
+                "- item one\n- item _two_"
+            )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read_tree(self, path):
+        return {
+            str(p.relative_to(path)): p.read_bytes()
+            for p in sorted(path.rglob("*"))
+            if p.is_file()
+        }
+
+    def test_discover_pages(self):
+        pages = discover_pages(self.content, "docs")
+        self.assertEqual(len(pages), PARALLEL_MIN_PAGES + 4)
+        self.assertIn(
+            (Path(self.content, "blog", "post3", "index.md"),
+             Path("docs", "blog", "post3", "index.html")),
+            pages,
+        )
+
+    def test_parallel_output_matches_serial(self):
+        serial = Path(self.root, "serial")
+        parallel = Path(self.root, "parallel")
+        generate_pages_recursive(self.content, self.template, serial, "/site/")
+        generate_pages_recursive(
+            self.content, self.template, parallel, "/site/", jobs=4
+        )
+        self.assertEqual(self.read_tree(serial), self.read_tree(parallel))
+
+    def test_memory_sink_matches_disk(self):
+        docs = Path(self.root, "docs")
+        generate_pages_recursive(self.content, self.template, docs, "/site/")
+        sink = MemorySink(docs)
+        generate_pages_recursive(
+            self.content, self.template, docs, "/site/", jobs=4, sink=sink
+        )
+        self.assertEqual(self.read_tree(docs), sink.files)
+
+    def test_parallel_search_index_matches_serial(self):
+        serial, parallel = SearchIndex(), SearchIndex()
+        docs = Path(self.root, "docs")
+        generate_pages_recursive(self.content, self.template, docs, "/", search=serial)
+        generate_pages_recursive(
+            self.content, self.template, docs, "/", jobs=4, search=parallel
+        )
+        terms = {k: e["terms"] for k, e in serial.pages.items()}
+        self.assertEqual(terms, {k: e["terms"] for k, e in parallel.pages.items()})
+        self.assertEqual(len(terms), PARALLEL_MIN_PAGES + 4)
+
+    def test_parallel_error_names_source(self):
+        broken = Path(self.content, "blog", "post2", "index.md")
+        broken.write_text("## no title\n\ntext")
+        with self.assertRaisesRegex(RuntimeError, "post2"):
+            generate_pages_recursive(
+                self.content, self.template, Path(self.root, "docs"), "/", jobs=4
+            )
+
+    def test_failed_page_leaves_no_output(self):
+        broken = Path(self.content, "blog", "post2", "index.md")
+        broken.write_text("# title\n\nfine\n\n#######too deep")
+        docs = Path(self.root, "docs")
+        with self.assertRaisesRegex(RuntimeError, "post2"):
+            generate_pages_recursive(self.content, self.template, docs, "/")
+        self.assertEqual(list(Path(docs, "blog", "post2").iterdir()), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
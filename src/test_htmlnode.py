@@ -1,7 +1,19 @@
+import io
 import unittest
 
-from htmlnode import HTMLNode, LeafNode, ParentNode, text_node_to_html_node
+from htmlnode import (
+    HTMLNode,
+    LeafNode,
+    ParentNode,
+    inline_html,
+    minified_attribute,
+    iter_html,
+    text_node_to_html_node,
+    write_html,
+)
+from raw_to_textnode import text_to_textnodes
 from textnode import TextNode, TextType
+from urls import URLResolver
 
 
 class TestHTMLNode(unittest.TestCase):
@@ -98,6 +110,82 @@ class TestHTMLNode(unittest.TestCase):
             html_node.props, {"src": "www.example.com", "alt": "This is a image node"}
         )
 
+    def test_text_anchor_nested_label(self):
+        node = TextNode("**bold** link", TextType.LINKS, url="/blog_post")
+        html_node = text_node_to_html_node(node)
+        self.assertEqual(
+            html_node.to_html(), '<a href="/blog_post"><b>bold</b> link</a>'
+        )
+
+    def test_inline_html_matches_nodes(self):
+        resolvers = [
+            None,
+            URLResolver("/base/"),
+            URLResolver("/base/", {"a.css": "a.1234abcd.css"}, {"i.png": (4, 3)}),
+        ]
+        texts = [
+            "plain words",
+            "a **b** _c_ `d  e`",
+            "[**e** f](/g) [_x_ and `y`](/z) [plain](/p)",
+            "[half **bold](/g) [a_b](/c) [`x`](k)",
+            "![h](/i.png) ![w h](https://x.org/i.png) ![j](/missing.png)",
+            "[style](/a.css?v=1#top) ![i](/i.png#f) [rel](k) [](/empty)",
+            "nested [a [b](/c)](/d) and ![[x](/y)](/i.png)",
+            "bad ](/x) [y]( z) ![",
+        ]
+        for resolver in resolvers:
+            for text in texts:
+                with self.subTest(text=text, resolver=resolver):
+                    nodes = text_to_textnodes(text)
+                    expected = "".join(
+                        text_node_to_html_node(node, resolver).to_html()
+                        for node in nodes
+                    )
+                    self.assertEqual(inline_html(text, resolver), expected)
+
+    def test_inline_html_bad_markup_raises_like_nodes(self):
+        for text in ["**unclosed", "a `b", "[**x](/y) _z"]:
+            with self.subTest(text=text):
+                with self.assertRaises(ValueError):
+                    text_to_textnodes(text)
+                with self.assertRaises(ValueError):
+                    inline_html(text)
+
+    def test_inline_html_minify(self):
+        self.assertEqual(
+            inline_html("a  **b  c**\n `d  e` [f](/g h)", minify=True),
+            'a <b>b c</b> <code>d  e</code> <a href="/g h">f</a>',
+        )
+
+    def test_minified_attribute(self):
+        self.assertEqual(minified_attribute("/a/b.png"), "/a/b.png")
+        self.assertEqual(minified_attribute("a b"), '"a b"')
+        self.assertEqual(minified_attribute('say "hi"'), '"say &quot;hi&quot;"')
+        self.assertEqual(minified_attribute(""), '""')
+
+    def test_iter_html_chunks(self):
+        node = ParentNode("div", [LeafNode("b", "bold"), LeafNode(None, " text")])
+        self.assertEqual(
+            list(iter_html(node)), ["<div>", "<b>bold</b>", " text", "</div>"]
+        )
+
+    def test_to_html_deep_tree(self):
+        node = LeafNode(None, "x")
+        for _ in range(5000):
+            node = ParentNode("span", [node])
+        html = node.to_html()
+        self.assertTrue(html.startswith("<span>" * 5000 + "x"))
+        self.assertTrue(html.endswith("</span>" * 5000))
+
+    def test_write_html(self):
+        node = ParentNode(
+            "ul", [ParentNode("li", [LeafNode(None, str(i))]) for i in range(10000)]
+        )
+        out = io.StringIO()
+        written = write_html(node, out)
+        self.assertEqual(out.getvalue(), node.to_html())
+        self.assertEqual(written, len(out.getvalue()))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,116 @@
+import contextlib
+import io
+import os
+import struct
+import tempfile
+import unittest
+from pathlib import Path
+
+from htmlnode import inline_html, text_node_to_html_node
+from image_meta import ImageIndex, read_image_size
+from textnode import TextNode, TextType
+from urls import URLResolver
+
+
+def png(width, height):
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + struct.pack(">I", 13)
+        + b"IHDR"
+        + struct.pack(">II", width, height)
+        + b"\x08\x06\x00\x00\x00"
+    )
+
+
+def jpeg(width, height):
+    app0 = b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\x00" + b"\x00" * 9
+    sof = b"\xff\xc2" + struct.pack(">HBHHB", 11, 8, height, width, 1) + b"\x00" * 3
+    return b"\xff\xd8" + app0 + sof + b"\xff\xda"
+
+
+def webp(chunk, payload):
+    body = b"WEBP" + chunk + struct.pack("<I", len(payload)) + payload
+    return b"RIFF" + struct.pack("<I", len(body)) + body
+
+
+class TestImageMeta(unittest.TestCase):
+    def size(self, data):
+        return read_image_size(io.BytesIO(data))
+
+    def test_png(self):
+        self.assertEqual(self.size(png(1100, 438)), (1100, 438))
+
+    def test_gif(self):
+        self.assertEqual(self.size(b"GIF89a" + struct.pack("<HH", 3, 2)), (3, 2))
+
+    def test_jpeg_skips_segments_before_frame(self):
+        self.assertEqual(self.size(jpeg(640, 480)), (640, 480))
+        self.assertIsNone(self.size(b"\xff\xd8\xff\xda"))
+
+    def test_webp(self):
+        lossy = b"\x00\x00\x00\x9d\x01\x2a" + struct.pack("<HH", 300, 200)
+        self.assertEqual(self.size(webp(b"VP8 ", lossy)), (300, 200))
+        bits = (300 - 1) | ((200 - 1) << 14)
+        lossless = b"\x2f" + bits.to_bytes(4, "little") + b"\x00"
+        self.assertEqual(self.size(webp(b"VP8L", lossless)), (300, 200))
+        extended = b"\x00" * 4 + (299).to_bytes(3, "little")
+        extended += (199).to_bytes(3, "little")
+        self.assertEqual(self.size(webp(b"VP8X", extended)), (300, 200))
+
+    def test_unknown_format(self):
+        self.assertIsNone(self.size(b"<svg></svg>"))
+
+
+class TestImageIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.static = Path(self.tmp.name, "static")
+        Path(self.static, "images").mkdir(parents=True)
+        self.image = Path(self.static, "images", "a.png")
+        self.image.write_bytes(png(4, 3))
+        Path(self.static, "index.css").write_text("body {}")
+        Path(self.static, "broken.jpg").write_bytes(b"not a jpeg")
+        self.index_path = Path(self.tmp.name, "image_index.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def scan(self, index):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return index.scan(self.static)
+
+    def test_scan_reads_images_once(self):
+        index = ImageIndex(self.index_path)
+        self.assertEqual(self.scan(index), {"images/a.png": (4, 3)})
+        self.assertEqual(index.parsed, 2)
+        index.save()
+
+        index = ImageIndex.load(self.index_path)
+        self.assertEqual(self.scan(index), {"images/a.png": (4, 3)})
+        self.assertEqual(index.parsed, 0)
+
+        self.image.write_bytes(png(8, 6))
+        os.utime(self.image, ns=(10**9, 10**9))
+        self.assertEqual(self.scan(index), {"images/a.png": (8, 6)})
+        self.assertEqual(index.parsed, 1)
+
+    def test_img_tags_get_size_attributes(self):
+        images = self.scan(ImageIndex())
+        resolver = URLResolver("/site/", images=images)
+        node = TextNode("a", TextType.IMAGE, "/images/a.png")
+        expected = (
+            '<img src="/site/images/a.png" alt=a width=4 height=3 '
+            "loading=lazy decoding=async></img>"
+        )
+        self.assertEqual(text_node_to_html_node(node, resolver).to_html(), expected)
+        self.assertEqual(inline_html("![a](/images/a.png)", resolver), expected)
+        self.assertEqual(
+            inline_html("![b](https://x.org/b.png)", resolver),
+            '<img src="https://x.org/b.png" alt=b loading=lazy decoding=async></img>',
+        )
+        self.assertNotEqual(resolver.cache_key, URLResolver("/site/").cache_key)
+        self.assertEqual(URLResolver("/site/").image_attributes("/images/a.png"), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from manifest import BuildManifest
+from markdown_html import generate_pages_recursive
+
+
+class TestBuildManifest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.content = Path(self.root, "content")
+        self.dest = Path(self.root, "docs")
+        self.template = Path(self.root, "template.html")
+        self.manifest_path = Path(self.root, "manifest.json")
+
+        Path(self.content, "post").mkdir(parents=True)
+        Path(self.content, "index.md").write_text("# Home\n\nhello")
+        Path(self.content, "post", "index.md").write_text("# Post\n\n[home](/)")
+        self.template.write_text("<title>{{ Title }}</title>{{ Content }}")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def build(self, basepath="/"):
+        manifest = BuildManifest.load(self.manifest_path)
+        generate_pages_recursive(
+            self.content, self.template, self.dest, basepath, manifest
+        )
+        manifest.prune()
+        manifest.save()
+        return manifest
+
+    def test_unchanged_pages_are_fresh(self):
+        self.build()
+        manifest = BuildManifest.load(self.manifest_path)
+        source = Path(self.content, "index.md")
+        dest = Path(self.dest, "index.html")
+        self.assertTrue(manifest.is_fresh(source, self.template, dest, "/"))
+
+    def test_changed_inputs_are_stale(self):
+        self.build()
+        manifest = BuildManifest.load(self.manifest_path)
+        source = Path(self.content, "index.md")
+        dest = Path(self.dest, "index.html")
+
+        self.assertFalse(manifest.is_fresh(source, self.template, dest, "/site/"))
+        source.write_text("# Home\n\nchanged")
+        self.assertFalse(manifest.is_fresh(source, self.template, dest, "/"))
+
+    def test_template_change_rebuilds_pages(self):
+        self.build()
+        self.template.write_text("<h1>{{ Title }}</h1>{{ Content }}")
+        self.build()
+        html = Path(self.dest, "post", "index.html").read_text()
+        self.assertTrue(html.startswith("<h1>Post</h1>"))
+
+    def test_basepath_change_rebuilds_pages(self):
+        self.build()
+        self.build("/site/")
+        html = Path(self.dest, "post", "index.html").read_text()
+        self.assertIn('href="/site/"', html)
+
+    def test_removed_source_deletes_output(self):
+        self.build()
+        Path(self.content, "post", "index.md").unlink()
+        self.build()
+        self.assertFalse(Path(self.dest, "post", "index.html").exists())
+        self.assertTrue(Path(self.dest, "index.html").exists())
+        manifest = BuildManifest.load(self.manifest_path)
+        self.assertEqual(list(manifest.pages), [str(Path(self.content, "index.md"))])
+
+
+if __name__ == "__main__":
+    unittest.main()
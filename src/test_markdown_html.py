@@ -1,7 +1,8 @@
 import unittest
 
 from markdown_blocks import markdown_to_blocks
-from markdown_html import extract_title, markdown_to_html_node
+from markdown_html import extract_title, markdown_to_html, markdown_to_html_node
+from urls import URLResolver
 
 
 class TestMarkdownToHtml(unittest.TestCase):
@@ -89,6 +90,65 @@ this is paragraph text
             "<div><blockquote>This is a blockquote block</blockquote><p>this is paragraph text</p></div>",
         )
 
+    def test_inline_text_builds_nodes(self):
+        node = markdown_to_html_node("hello **bold** and [x](/a)")
+        children = node.children[0].children
+        self.assertEqual([c.tag for c in children], [None, "b", None, "a"])
+        self.assertEqual(children[1].value, "bold")
+        self.assertEqual(children[3].props, {"href": '"/a"'})
+
+    def test_markdown_to_html_matches_tree(self):
+        md = """# Title
+
+a paragraph with **bold**, _italic_, `code`
+and [a **link**](/page) on two lines
+
+- item one
+- ![image](/img.png)
+
+1. first
+2. second
+
+> quoted [text](/q)
+
+```
+code block
+```
+"""
+        resolver = URLResolver("/base/")
+        tree = markdown_to_html_node(md, resolver)
+        tags, stack = set(), [tree]
+        while stack:
+            node = stack.pop()
+            tags.add(node.tag)
+            stack.extend(node.children or [])
+        # the inline tokens are nodes, not html rendered by inline_html.
+        self.assertLessEqual({"b", "i", "code", "a", "img"}, tags)
+        self.assertEqual(markdown_to_html(md, resolver), tree.to_html())
+
+    def test_markdown_to_html_minify(self):
+        md = """#  Spaced   title
+
+a   paragraph with `code  kept`
+and ![an image](/img.png)
+
+- one
+- [two](/two)
+
+```
+code   block
+  indented
+```
+"""
+        self.assertEqual(
+            markdown_to_html(md, URLResolver("/base/"), minify=True),
+            "<div><h1>Spaced title</h1>"
+            "<p>a paragraph with <code>code  kept</code> and "
+            '<img src=/base/img.png alt="an image">'
+            "<ul><li>one<li><a href=/base/two>two</a></ul>"
+            "<pre><code>code   block\n  indented\n</code></pre></div>",
+        )
+
     def test_extract_title(self):
         md = """
 # This is a Header
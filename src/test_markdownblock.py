@@ -1,6 +1,13 @@
+import io
 import unittest
 
-from markdown_blocks import BlockType, block_to_blocktype, markdown_to_blocks
+from markdown_blocks import (
+    BlockScanner,
+    BlockType,
+    block_to_blocktype,
+    iter_blocks,
+    markdown_to_blocks,
+)
 
 
 class TestMarkdownToBlock(unittest.TestCase):
@@ -48,6 +55,33 @@ This is the same paragraph on a new line
             ],
         )
 
+    def test_iter_blocks_matches_markdown_to_blocks(self):
+        for md in (
+            "",
+            "# title\n\npara\nline\n\n- a\n- b\n",
+            "a\n\n\nb",
+            "a\n\n\n\nb\n\n\n",
+            "\n\n  \n\nend",
+        ):
+            blocks = list(iter_blocks(io.StringIO(md)))
+            self.assertEqual(blocks, markdown_to_blocks(md), repr(md))
+
+    def test_block_scanner_title_and_blocks(self):
+        scanner = BlockScanner(io.StringIO("\n# My Title\n\n> quote\n\n1. one"))
+        self.assertEqual(scanner.title(), "My Title")
+        self.assertEqual(
+            list(scanner),
+            [
+                ("# My Title", BlockType.HEADING),
+                ("> quote", BlockType.QUOTE),
+                ("1. one", BlockType.ORDERED_LIST),
+            ],
+        )
+
+    def test_block_scanner_title_error(self):
+        with self.assertRaises(Exception):
+            BlockScanner(io.StringIO("## not a title\n")).title()
+
     def test_markdown_header_to_blocktype(self):
         block = "### This is header."
         result = block_to_blocktype(block)
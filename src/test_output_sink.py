@@ -0,0 +1,100 @@
+import contextlib
+import gzip
+import io
+import tarfile
+import tempfile
+import unittest
+import zipfile
+from pathlib import Path
+
+from assets import copy_assets
+from output_sink import (
+    CompressingSink,
+    DiskSink,
+    MemorySink,
+    TarSink,
+    ZipSink,
+    open_sink,
+)
+
+
+class TestOutputSink(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.static = Path(self.root, "static")
+        Path(self.static, "images").mkdir(parents=True)
+        Path(self.static, "index.css").write_text("body {}")
+        Path(self.static, "images", "a.png").write_bytes(b"png")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def fill(self, sink):
+        with sink.open_text(Path("docs", "blog", "index.html")) as out:
+            out.write("<p>blog</p>")
+        sink.copy_file(Path(self.static, "index.css"), Path("docs", "index.css"))
+
+    def test_memory_sink(self):
+        sink = MemorySink("docs")
+        self.fill(sink)
+        self.assertEqual(
+            sink.files, {"blog/index.html": b"<p>blog</p>", "index.css": b"body {}"}
+        )
+
+    def write_broken_page(self, sink):
+        with self.assertRaises(ValueError):
+            with sink.open_text(Path(sink.root, "page.html")) as out:
+                out.write("half a page")
+                raise ValueError("render failed")
+
+    def test_failed_write_leaves_nothing(self):
+        memory = MemorySink("docs")
+        self.write_broken_page(memory)
+        self.assertEqual(memory.files, {})
+        disk = DiskSink(Path(self.root, "docs"))
+        self.write_broken_page(disk)
+        self.assertEqual(list(disk.root.iterdir()), [])
+
+    def test_tar_sink_streams_archive(self):
+        target = io.BytesIO()
+        with TarSink(target, "docs", "gz", mtime=0) as sink:
+            self.fill(sink)
+        target.seek(0)
+        with tarfile.open(fileobj=target, mode="r:gz") as tar:
+            self.assertEqual(tar.getnames(), ["blog/index.html", "index.css"])
+            self.assertEqual(tar.extractfile("index.css").read(), b"body {}")
+
+    def test_zip_sink(self):
+        target = io.BytesIO()
+        with ZipSink(target, "docs") as sink:
+            self.fill(sink)
+            sink.copy_file(Path(self.static, "images", "a.png"), "docs/images/a.png")
+        with zipfile.ZipFile(target) as archive:
+            self.assertEqual(archive.read("blog/index.html"), b"<p>blog</p>")
+            info = archive.getinfo("images/a.png")
+            self.assertEqual(info.compress_type, zipfile.ZIP_STORED)
+
+    def test_compressing_sink_adds_sidecars(self):
+        sink = MemorySink("docs")
+        page = ("<p>words</p>" * 200).encode()
+        CompressingSink(sink).write_bytes("docs/index.html", page)
+        self.assertEqual(gzip.decompress(sink.files["index.html.gz"]), page)
+
+    def test_copy_assets_into_sink(self):
+        sink = MemorySink("docs")
+        with contextlib.redirect_stdout(io.StringIO()):
+            assets = copy_assets(self.static, sink, fingerprint=True)
+        self.assertEqual(sink.files[assets["index.css"]], b"body {}")
+        self.assertIn("asset-manifest.json", sink.files)
+
+    def test_open_sink(self):
+        self.assertIsInstance(open_sink(":memory:", "docs"), MemorySink)
+        with open_sink(str(Path(self.root, "site.tar.xz")), "docs") as sink:
+            self.assertIsInstance(sink, TarSink)
+        with self.assertRaises(ValueError):
+            open_sink("site.rar", "docs")
+
+
+if __name__ == "__main__":
+    unittest.main()
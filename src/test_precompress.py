@@ -0,0 +1,68 @@
+import contextlib
+import gzip
+import io
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from manifest import BuildManifest
+from precompress import precompress_tree, remove_precompressed
+
+
+class TestPrecompress(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.docs = Path(self.tmp.name, "docs")
+        self.manifest = BuildManifest(Path(self.tmp.name, "manifest.json"))
+
+        Path(self.docs, "blog").mkdir(parents=True)
+        self.page = Path(self.docs, "blog", "index.html")
+        self.page.write_text("<p>some repeated words</p>" * 200)
+        Path(self.docs, "small.css").write_text("body {}")
+        Path(self.docs, "image.png").write_bytes(os.urandom(4096))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def precompress(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return precompress_tree(self.docs, self.manifest)
+
+    def test_writes_sidecars_for_large_compressible_files(self):
+        result = self.precompress()
+        self.assertEqual(result["compressed"], ["blog/index.html"])
+        sidecar = Path(self.docs, "blog", "index.html.gz")
+        self.assertEqual(gzip.decompress(sidecar.read_bytes()), self.page.read_bytes())
+        self.assertFalse(Path(self.docs, "small.css.gz").exists())
+        self.assertFalse(Path(self.docs, "image.png.gz").exists())
+
+    def test_only_changed_files_are_recompressed(self):
+        self.precompress()
+        self.assertEqual(self.precompress()["unchanged"], ["blog/index.html"])
+
+        # rewritten with the same content only costs a hash.
+        self.page.write_text(self.page.read_text())
+        self.assertEqual(self.precompress()["compressed"], [])
+
+        self.page.write_text("<p>other words</p>" * 200)
+        self.assertEqual(self.precompress()["compressed"], ["blog/index.html"])
+        sidecar = Path(self.docs, "blog", "index.html.gz")
+        self.assertEqual(gzip.decompress(sidecar.read_bytes()), self.page.read_bytes())
+
+    def test_removed_files_lose_their_sidecars(self):
+        self.precompress()
+        self.page.unlink()
+        self.assertEqual(self.precompress()["removed"], ["blog/index.html"])
+        self.assertFalse(Path(self.docs, "blog", "index.html.gz").exists())
+
+    def test_remove_precompressed(self):
+        self.precompress()
+        with contextlib.redirect_stdout(io.StringIO()):
+            remove_precompressed(self.docs, self.manifest)
+        self.assertFalse(Path(self.docs, "blog", "index.html.gz").exists())
+        self.assertEqual(self.manifest.compressed, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
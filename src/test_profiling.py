@@ -0,0 +1,131 @@
+import json
+import tempfile
+import tracemalloc
+import unittest
+from pathlib import Path
+
+import profiling
+from markdown_html import generate_page
+
+
+class TestProfiling(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = Path(self.tmp.name)
+        self.source = Path(root, "index.md")
+        self.template = Path(root, "template.html")
+        self.dest = Path(root, "docs", "index.html")
+        self.source.write_text("# Title\n\nsome **bold** text\n\n- a\n- b")
+        self.template.write_text("{{ Title }}{{ Content }}")
+
+    def tearDown(self):
+        profiling.disable()
+        profiling.disable_memory()
+        self.tmp.cleanup()
+
+    def test_disabled_stage_is_noop(self):
+        with profiling.stage("read"):
+            pass
+        self.assertIsNone(profiling.block_start())
+
+    def test_records_every_stage(self):
+        profiler = profiling.enable()
+        generate_page(self.source, self.template, self.dest, "/")
+
+        stages = set(profiler.stage_totals())
+        for name in (
+            "page",
+            "read",
+            "extract_title",
+            "markdown_to_blocks",
+            "block_to_blocktype",
+            "text_to_textnodes",
+            "to_html",
+            "template",
+            "write",
+        ):
+            self.assertIn(name, stages)
+        self.assertEqual(list(profiler.pages), [str(self.source)])
+        self.assertEqual(len(profiler.blocks), 3)
+        self.assertIn("slowest 10 blocks", profiler.summary())
+
+    def test_self_times_add_up_to_page_time(self):
+        profiler = profiling.enable()
+        generate_page(self.source, self.template, self.dest, "/")
+        totals = profiler.stage_totals()
+        self.assertAlmostEqual(
+            sum(own for _, _, own in totals.values()), totals["page"][1]
+        )
+        # nested stages are not counted again in the stage around them.
+        _, write_total, write_self = totals["write"]
+        self.assertAlmostEqual(write_self, write_total - totals["template"][1])
+
+    def test_write_trace(self):
+        profiler = profiling.enable()
+        generate_page(self.source, self.template, self.dest, "/")
+        trace_path = Path(self.tmp.name, "trace.json")
+        profiler.write_trace(trace_path)
+
+        events = json.loads(trace_path.read_text())["traceEvents"]
+        self.assertTrue(all(e["ph"] == "X" for e in events))
+        self.assertIn("to_html", {e["name"] for e in events})
+
+    def test_memory_profile(self):
+        timings = profiling.enable()
+        memory = profiling.enable_memory()
+        generate_page(self.source, self.template, self.dest, "/")
+        with profiling.page("big.md"), profiling.stage("write"):
+            held = [bytes(1 << 20)]
+            del held
+        profiling.disable_memory()
+        self.assertFalse(tracemalloc.is_tracing())
+
+        self.assertIn("write", timings.stage_totals())
+        page = memory.pages[str(self.source)]
+        self.assertEqual(page["source_bytes"], self.source.stat().st_size)
+        self.assertGreater(page["peak"], 0)
+        self.assertGreater(memory.pages["big.md"]["peak"], 1 << 19)
+        self.assertLess(memory.pages["big.md"]["retained"], 1 << 19)
+        self.assertGreater(memory.stages["write"][2], 1 << 19)
+        self.assertGreater(memory.peak, 1 << 19)
+        self.assertIn("top 10 allocation sites grown over big.md", memory.summary())
+
+        report_path = Path(self.tmp.name, "memprofile.json")
+        memory.write_report(report_path)
+        report = json.loads(report_path.read_text())
+        self.assertEqual(report["stages"]["read"]["calls"], 1)
+        self.assertIn("big.md", report["pages"])
+
+    def test_peak_page_allocation_sites(self):
+        memory = profiling.enable_memory()
+        with profiling.page("small.md"):
+            small = bytes(1 << 10)
+        with profiling.page("kept.md"):
+            kept = [bytes(1 << 20)]
+        with profiling.page("other.md"):
+            pass
+        profiling.disable_memory()
+
+        self.assertEqual(memory.peak_page, "kept.md")
+        site, size, count = memory.top_sites()[0]
+        self.assertTrue(site.startswith(__file__))
+        self.assertGreaterEqual(size, 1 << 20)
+        del small, kept
+
+    def test_memory_outliers(self):
+        memory = profiling.enable_memory()
+        profiling.disable_memory()
+        for i, (source_bytes, peak) in enumerate(
+            [(1000, 100_000), (2000, 210_000), (4000, 390_000), (5000, 5_000_000)]
+        ):
+            memory.pages[f"page{i}.md"] = {
+                "source_bytes": source_bytes,
+                "peak": peak,
+                "retained": 0,
+            }
+        self.assertEqual(memory.outliers(), ["page3.md"])
+        self.assertIn("median memory per source byte", memory.summary())
+
+
+if __name__ == "__main__":
+    unittest.main()
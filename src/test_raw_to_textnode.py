@@ -1,8 +1,10 @@
+import time
 import unittest
 
 from raw_to_textnode import (
     extract_markdown_images,
     extract_markdown_links,
+    inline_spans,
     split_nodes_delimiter,
     split_nodes_image,
     split_nodes_link,
@@ -267,6 +269,84 @@ class TestInlineMarkdown(unittest.TestCase):
         test_result = text_to_textnodes(raw_text)
         self.assertListEqual(expected_result, test_result)
 
+    def test_text_to_textnodes_underscore_in_url(self):
+        raw_text = "read [the notes](/blog/my_notes) and _this_"
+        expected_result = [
+            TextNode("read ", TextType.TEXT),
+            TextNode("the notes", TextType.LINKS, "/blog/my_notes"),
+            TextNode(" and ", TextType.TEXT),
+            TextNode("this", TextType.ITALIC_TEXT),
+        ]
+        self.assertListEqual(expected_result, text_to_textnodes(raw_text))
+
+    def test_text_to_textnodes_bold_in_link_label(self):
+        raw_text = "[**bold** link](/u)"
+        expected_result = [TextNode("**bold** link", TextType.LINKS, "/u")]
+        self.assertListEqual(expected_result, text_to_textnodes(raw_text))
+
+    def test_text_to_textnodes_image_before_link(self):
+        raw_text = "[![alt](/i.png)"
+        expected_result = [
+            TextNode("[", TextType.TEXT),
+            TextNode("alt", TextType.IMAGE, "/i.png"),
+        ]
+        self.assertListEqual(expected_result, text_to_textnodes(raw_text))
+
+    def test_text_to_textnodes_precedence(self):
+        # the leftmost markup wins and runs to its end, markup inside it is text.
+        cases = {
+            "![**x**](/i)": [TextNode("**x**", TextType.IMAGE, "/i")],
+            "[**b**](/p)": [TextNode("**b**", TextType.LINKS, "/p")],
+            "`[a](/b)`": [TextNode("[a](/b)", TextType.CODE_TEXT)],
+            "**a ![x](/i) b**": [TextNode("a ![x](/i) b", TextType.BOLD_TEXT)],
+            "_a [b](/c) d_": [TextNode("a [b](/c) d", TextType.ITALIC_TEXT)],
+            "[see ![x](/i)](/p)": [
+                TextNode("[see ", TextType.TEXT),
+                TextNode("x", TextType.IMAGE, "/i"),
+                TextNode("](/p)", TextType.TEXT),
+            ],
+        }
+        for raw_text, expected_result in cases.items():
+            with self.subTest(raw_text):
+                self.assertListEqual(expected_result, text_to_textnodes(raw_text))
+
+    def test_text_to_textnodes_delimiter_paired_across_markup(self):
+        # the closing _ is inside the link, so the one after it is unclosed.
+        for raw_text in ("[a_](/b) c_", "![a](/i_) b_", "`_` _"):
+            with self.subTest(raw_text), self.assertRaises(ValueError):
+                text_to_textnodes(raw_text)
+
+    def test_inline_spans_offsets(self):
+        text = "a **b** [c](/d)"
+        self.assertListEqual(
+            inline_spans(text),
+            [
+                (TextType.TEXT, 0, 2, -1, -1),
+                (TextType.BOLD_TEXT, 4, 5, -1, -1),
+                (TextType.TEXT, 7, 8, -1, -1),
+                (TextType.LINKS, 9, 10, 12, 14),
+            ],
+        )
+        self.assertEqual(text[12:14], "/d")
+
+    def test_text_to_textnodes_empty(self):
+        self.assertListEqual([], text_to_textnodes(""))
+
+    def test_text_to_textnodes_unclosed(self):
+        with self.assertRaises(ValueError):
+            text_to_textnodes("an **unclosed bold")
+
+    def test_text_to_textnodes_adversarial_is_linear(self):
+        small = "[" * 2000 + "](" * 2000
+        large = "[" * 20000 + "](" * 20000
+        start = time.perf_counter()
+        text_to_textnodes(small)
+        small_time = time.perf_counter() - start
+        start = time.perf_counter()
+        self.assertEqual(1, len(text_to_textnodes(large)))
+        large_time = time.perf_counter() - start
+        self.assertLess(large_time, small_time * 50 + 0.05)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,142 @@
+import contextlib
+import io
+import json
+import tempfile
+import unittest
+from collections import Counter
+from pathlib import Path
+
+from markdown_html import generate_pages_recursive
+from output_sink import DiskSink, MemorySink
+from search_index import (
+    TITLE_BOOST,
+    SearchIndex,
+    count_terms,
+    page_url,
+    shard_name,
+    tokenize,
+)
+
+
+class TestTokenize(unittest.TestCase):
+    def test_tokenize(self):
+        self.assertEqual(
+            tokenize("The Hobbit, or There_and Back"), ["hobbit", "there", "back"]
+        )
+        self.assertEqual(tokenize("Númenor a I 42"), ["númenor", "42"])
+
+    def test_count_terms_strips_tags(self):
+        counts = Counter()
+        blocks = ['<p>Read <a href="/blog/tom">Tom</a> &amp; tom</p>']
+        self.assertEqual(list(count_terms(blocks, counts)), blocks)
+        self.assertEqual(counts, {"read": 1, "tom": 2})
+
+    def test_shard_name(self):
+        self.assertEqual(shard_name("hobbit"), "ho")
+        self.assertEqual(shard_name("42nd"), "42")
+        self.assertEqual(shard_name("éowyn"), "_")
+
+    def test_page_url(self):
+        self.assertEqual(page_url("docs/index.html", "docs", "/site/"), "/site/")
+        self.assertEqual(
+            page_url("docs/blog/tom/index.html", "docs", "/"), "/blog/tom/"
+        )
+
+
+class TestSearchIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.docs = Path(self.root, "docs")
+        self.index_path = Path(self.root, "search_index.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def add(self, index, name, title, text):
+        dest = Path(self.docs, name, "index.html")
+        index.add_page(dest, title, Counter(tokenize(text)))
+
+    def write(self, index):
+        sink = MemorySink(self.docs)
+        with contextlib.redirect_stdout(io.StringIO()):
+            index.write(sink, "/site/")
+        return {k: json.loads(v) for k, v in sink.files.items()}
+
+    def test_write_shards_and_pages(self):
+        index = SearchIndex()
+        self.add(index, "tom", "Tom Bombadil", "tom sings")
+        self.add(index, "elves", "Elves", "tom meets elves")
+        files = self.write(index)
+
+        self.assertEqual(
+            files["search/index.json"]["pages"],
+            [["/site/tom/", "Tom Bombadil"], ["/site/elves/", "Elves"]],
+        )
+        self.assertEqual(files["search/to.json"], {"tom": [0, 1 + TITLE_BOOST, 1, 1]})
+        self.assertIn("el", files["search/index.json"]["shards"])
+
+    def test_only_changed_shards_are_written(self):
+        index = SearchIndex()
+        self.add(index, "tom", "Tom", "tom sings")
+        self.add(index, "elves", "Elves", "elves sing")
+        self.write(index)
+
+        self.add(index, "elves", "Elves", "elves dance")
+        files = self.write(index)
+        self.assertEqual(
+            sorted(files), ["search/da.json", "search/index.json", "search/si.json"]
+        )
+        self.assertEqual(files["search/si.json"], {"sings": [0, 1]})
+        self.assertEqual(self.write(index), {})
+
+    def test_removed_page_frees_its_id(self):
+        docs = DiskSink(self.docs)
+        index = SearchIndex()
+        self.add(index, "tom", "Tom", "bombadil")
+        self.add(index, "elves", "Elves", "legolas")
+        with contextlib.redirect_stdout(io.StringIO()):
+            index.write(docs, "/")
+        self.assertTrue(Path(self.docs, "search", "bo.json").is_file())
+
+        index.prune([Path(self.docs, "elves", "index.html")])
+        with contextlib.redirect_stdout(io.StringIO()):
+            index.write(docs, "/")
+        self.assertFalse(Path(self.docs, "search", "bo.json").exists())
+        self.add(index, "dwarves", "Dwarves", "gimli")
+        dwarves = Path(self.docs, "dwarves", "index.html")
+        self.assertEqual(index.pages[str(dwarves)]["id"], 0)
+
+    def test_saved_index_keeps_ids(self):
+        index = SearchIndex(self.index_path)
+        self.add(index, "tom", "Tom", "bombadil")
+        self.add(index, "elves", "Elves", "legolas")
+        index.remove_page(Path(self.docs, "tom", "index.html"))
+        index.save()
+
+        index = SearchIndex.load(self.index_path)
+        self.add(index, "dwarves", "Dwarves", "gimli")
+        self.add(index, "ents", "Ents", "treebeard")
+        ids = {Path(k).parent.name: e["id"] for k, e in index.pages.items()}
+        self.assertEqual(ids, {"elves": 1, "dwarves": 0, "ents": 2})
+
+    def test_generated_pages_are_indexed(self):
+        content = Path(self.root, "content")
+        Path(content, "blog").mkdir(parents=True)
+        Path(content, "index.md").write_text("# Home\n\nWelcome to **Middle** earth")
+        Path(content, "blog", "index.md").write_text("# Blog\n\n- middle\n- earth")
+        template = Path(self.root, "template.html")
+        template.write_text("{{ Title }}{{ Content }}")
+
+        index = SearchIndex()
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_pages_recursive(content, template, self.docs, "/", search=index)
+        self.assertEqual(
+            index.pages[str(Path(self.docs, "index.html"))]["terms"],
+            {"home": 1 + TITLE_BOOST, "welcome": 1, "middle": 1, "earth": 1},
+        )
+        self.assertEqual(len(index.pages), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
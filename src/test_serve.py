@@ -0,0 +1,123 @@
+import asyncio
+import contextlib
+import gzip
+import io
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from serve import PreviewServer, RangeNotSatisfiable, parse_range
+
+
+class TestParseRange(unittest.TestCase):
+    def test_ranges(self):
+        self.assertEqual(parse_range("bytes=0-9", 100), (0, 10))
+        self.assertEqual(parse_range("bytes=90-", 100), (90, 100))
+        self.assertEqual(parse_range("bytes=-10", 100), (90, 100))
+        self.assertEqual(parse_range("bytes=95-200", 100), (95, 100))
+
+    def test_ignored_ranges(self):
+        self.assertIsNone(parse_range("bytes=0-1,5-6", 100))
+        self.assertIsNone(parse_range("items=0-1", 100))
+        self.assertIsNone(parse_range("bytes=9-1", 100))
+
+    def test_unsatisfiable(self):
+        with self.assertRaises(RangeNotSatisfiable):
+            parse_range("bytes=100-", 100)
+
+
+class TestPreviewServer(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.docs = Path(self.tmp.name)
+        Path(self.docs, "blog").mkdir()
+        self.page = "<p>" + "words " * 400 + "</p>"
+        Path(self.docs, "index.html").write_text(self.page)
+        Path(self.docs, "blog", "index.html").write_text("<p>blog</p>")
+        Path(self.docs, "app.1234abcd.css").write_text("body {}")
+        Path(self.docs, "asset-manifest.json").write_text(
+            json.dumps({"app.css": "app.1234abcd.css"})
+        )
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.server = PreviewServer(self.docs)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def get(self, target, **headers):
+        headers = {k.replace("_", "-"): v for k, v in headers.items()}
+        return self.server.respond("GET", target, headers)
+
+    def test_serves_index_and_redirects_folders(self):
+        response = self.get("/")
+        self.assertEqual(response.status, 200)
+        self.assertEqual(bytes(response.body), self.page.encode())
+        self.assertEqual(response.headers["Cache-Control"], "no-cache")
+        self.assertEqual(self.get("/blog").headers["Location"], "/blog/")
+        self.assertEqual(self.get("/missing").status, 404)
+        self.assertEqual(self.server.respond("POST", "/", {}).status, 405)
+
+    def test_gzip_variant_and_conditional_requests(self):
+        response = self.get("/", accept_encoding="br;q=0, gzip")
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(response.body), self.page.encode())
+
+        etag = response.headers["ETag"]
+        cached = self.get("/", accept_encoding="gzip", if_none_match=etag)
+        self.assertEqual(cached.status, 304)
+        self.assertEqual(cached.body, b"")
+        self.assertEqual(self.get("/", if_none_match=etag).status, 200)
+
+    def test_range_request(self):
+        response = self.get("/", range="bytes=3-7", accept_encoding="gzip")
+        self.assertEqual(response.status, 206)
+        self.assertEqual(bytes(response.body), b"words")
+        self.assertNotIn("Content-Encoding", response.headers)
+        self.assertEqual(
+            response.headers["Content-Range"], f"bytes 3-7/{len(self.page)}"
+        )
+        self.assertEqual(self.get("/", range="bytes=99999-").status, 416)
+        self.assertEqual(self.get("/", range="bytes=0-1", if_range='"x"').status, 200)
+
+    def test_fingerprinted_assets_are_immutable(self):
+        response = self.get("/app.1234abcd.css")
+        self.assertIn("immutable", response.headers["Cache-Control"])
+
+    def test_reload_swaps_snapshot(self):
+        before = self.server.snapshot
+        Path(self.docs, "blog", "index.html").write_text("<p>new blog</p>")
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.server.reload()
+        self.assertIsNot(self.server.snapshot, before)
+        files = self.server.snapshot.files
+        self.assertIs(files["index.html"], before.files["index.html"])
+        self.assertEqual(bytes(self.get("/blog/").body), b"<p>new blog</p>")
+
+    def test_keep_alive_connection(self):
+        async def fetch_twice():
+            with contextlib.redirect_stdout(io.StringIO()):
+                server = await self.server.start("127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            async with server:
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+                request = b"GET /blog/ HTTP/1.1\r\nHost: x\r\n\r\n"
+                writer.write(request + b"HEAD /blog/ HTTP/1.1\r\nHost: x\r\n\r\n")
+                await writer.drain()
+                first = await reader.readuntil(b"\r\n\r\n")
+                body = await reader.readexactly(len("<p>blog</p>"))
+                second = await reader.readuntil(b"\r\n\r\n")
+                writer.close()
+                await writer.wait_closed()
+            return first, body, second
+
+        first, body, second = asyncio.run(fetch_twice())
+        self.assertTrue(first.startswith(b"HTTP/1.1 200 OK"))
+        self.assertIn(b"Connection: keep-alive", first)
+        self.assertEqual(body, b"<p>blog</p>")
+        self.assertTrue(second.startswith(b"HTTP/1.1 200 OK"))
+        self.assertIn(b"Content-Length: 11", second)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from manifest import BuildManifest
+from static_sync import sync_folder_contents
+
+
+class TestStaticSync(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.static = Path(self.tmp.name, "static")
+        self.dest = Path(self.tmp.name, "docs")
+        self.manifest = BuildManifest(Path(self.tmp.name, "manifest.json"))
+
+        Path(self.static, "images").mkdir(parents=True)
+        Path(self.static, "index.css").write_text("body {}")
+        Path(self.static, "images", "a.png").write_bytes(b"png")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def sync(self, **kwargs):
+        return sync_folder_contents(
+            self.static, self.dest, manifest=self.manifest, **kwargs
+        )
+
+    def test_copies_new_files_once(self):
+        result = self.sync()
+        self.assertEqual(result["copied"], ["images/a.png", "index.css"])
+        self.assertEqual(Path(self.dest, "images", "a.png").read_bytes(), b"png")
+
+        result = self.sync()
+        self.assertEqual(result["copied"], [])
+        self.assertEqual(result["unchanged"], ["images/a.png", "index.css"])
+
+    def test_changed_file_is_copied(self):
+        self.sync()
+        Path(self.static, "index.css").write_text("body { margin: 0 }")
+        result = self.sync()
+        self.assertEqual(result["copied"], ["index.css"])
+        self.assertEqual(
+            Path(self.dest, "index.css").read_text(), "body { margin: 0 }"
+        )
+
+    def test_checksum_skips_touched_file(self):
+        self.sync()
+        src = Path(self.static, "index.css")
+        os.utime(src, ns=(0, 0))
+        self.assertEqual(self.sync()["copied"], ["index.css"])
+        os.utime(src, ns=(10**9, 10**9))
+        self.assertEqual(self.sync(checksum=True)["copied"], [])
+
+    def test_stale_files_are_deleted(self):
+        self.sync()
+        Path(self.dest, "index.html").write_text("generated page")
+        Path(self.static, "images", "a.png").unlink()
+        result = self.sync()
+        self.assertEqual(result["deleted"], ["images/a.png"])
+        self.assertFalse(Path(self.dest, "images").exists())
+        self.assertTrue(Path(self.dest, "index.html").exists())
+
+    def test_hardlink_mode(self):
+        self.sync(mode="hardlink")
+        src_stat = Path(self.static, "index.css").stat()
+        dest_stat = Path(self.dest, "index.css").stat()
+        self.assertEqual(src_stat.st_ino, dest_stat.st_ino)
+
+    def test_invalid_mode(self):
+        with self.assertRaises(ValueError):
+            self.sync(mode="symlink")
+
+
+if __name__ == "__main__":
+    unittest.main()
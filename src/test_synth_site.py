@@ -0,0 +1,46 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from bench_build import scaling_slopes
+from markdown_html import generate_pages_recursive
+from synth_site import generate_site
+
+
+class TestSynthSite(unittest.TestCase):
+    def test_generated_site_builds(self):
+        with tempfile.TemporaryDirectory() as root:
+            generate_site(root, pages=20, blocks_per_page=15, seed=1)
+            pages = sorted(Path(root, "content", "blog").glob("*/index.md"))
+            self.assertEqual(len(pages), 20)
+            self.assertTrue(Path(root, "static", "images", "img-0.png").is_file())
+
+            generate_pages_recursive(
+                Path(root, "content"),
+                Path(root, "template.html"),
+                Path(root, "docs"),
+                "/",
+            )
+            html = Path(root, "docs", "blog", "post-0", "index.html").read_text()
+            self.assertIn("<h1>Post 0", html)
+
+    def test_generation_is_deterministic(self):
+        with tempfile.TemporaryDirectory() as a, tempfile.TemporaryDirectory() as b:
+            generate_site(a, pages=3, seed=7)
+            generate_site(b, pages=3, seed=7)
+            page = Path("content", "blog", "post-2", "index.md")
+            self.assertEqual(Path(a, page).read_text(), Path(b, page).read_text())
+
+    def test_scaling_slopes(self):
+        results = [
+            {"pages": 100, "wall_seconds": 1.0},
+            {"pages": 1000, "wall_seconds": 10.0},
+            {"pages": 10000, "wall_seconds": 1000.0},
+        ]
+        slopes = scaling_slopes(results)
+        self.assertAlmostEqual(slopes[0], 1.0)
+        self.assertAlmostEqual(slopes[1], 2.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
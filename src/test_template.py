@@ -0,0 +1,123 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from markdown_html import generate_pages_recursive
+from template import (
+    compile_template,
+    find_template,
+    load_template,
+    minify_template_source,
+    resolve_template_source,
+)
+from urls import URLResolver
+
+
+class TestTemplate(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.template = Path(self.root, "template.html")
+        self.template.write_text(
+            '<link href="/index.css"><title>{{ Title }}</title>{{ Content }}'
+        )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_compile_splits_slots(self):
+        compiled = compile_template(self.template, URLResolver())
+        self.assertEqual(compiled.slots, ["Title", "Content"])
+        self.assertEqual(
+            compiled.render(Title="Hi", Content="<p>x</p>"),
+            '<link href="/index.css"><title>Hi</title><p>x</p>',
+        )
+
+    def test_basepath_rewritten_at_compile_time(self):
+        compiled = compile_template(self.template, URLResolver("/site/"))
+        self.assertEqual(compiled.literals[0], '<link href="/site/index.css"><title>')
+        html = compiled.render(Title="t", Content='<a href="/x">')
+        self.assertIn('<a href="/x">', html)
+
+    def test_unknown_slot_is_kept(self):
+        self.template.write_text("{{ Title }}{{ Footer }}")
+        compiled = compile_template(self.template, URLResolver())
+        self.assertEqual(compiled.render(Title="t"), "t{{ Footer }}")
+
+    def test_minify_template(self):
+        self.template.write_text(
+            "<html>\n  <head>\n    <!-- note -->\n    <title>{{ Title }}</title>\n"
+            '    <link href="/index.css" />\n  </head>\n'
+            "  <body>\n    <pre>  kept\n  </pre>\n"
+            "    {{ Content }}\n  </body>\n</html>\n"
+        )
+        compiled = compile_template(self.template, URLResolver("/site/"), minify=True)
+        self.assertEqual(
+            compiled.render(Title="t", Content="c"),
+            '<html><head><title>t</title><link href="/site/index.css"></head>'
+            "<body><pre>  kept\n  </pre>c</body></html>",
+        )
+
+    def test_minify_keeps_inline_spacing_and_scripts(self):
+        self.assertEqual(
+            minify_template_source(
+                "<p>a  <b>b</b>\n c</p>\n<script> if (a < b) {} </script>"
+            ),
+            "<p>a <b>b</b> c</p><script> if (a < b) {} </script>",
+        )
+
+    def test_layout_inheritance(self):
+        Path(self.root, "blog").mkdir()
+        child = Path(self.root, "blog", "post.html")
+        child.write_text('{{ extends "../template.html" }}\n<main>{{ Content }}</main>')
+        text, files = resolve_template_source(child)
+        self.assertEqual(
+            text,
+            '<link href="/index.css"><title>{{ Title }}</title>'
+            "<main>{{ Content }}</main>",
+        )
+        self.assertEqual(files, [child, Path(self.root, "blog", "..", "template.html")])
+
+    def test_layout_cycle_raises(self):
+        a = Path(self.root, "a.html")
+        b = Path(self.root, "b.html")
+        a.write_text('{{ extends "b.html" }}\n{{ Content }}')
+        b.write_text('{{ extends "a.html" }}\n{{ Content }}')
+        with self.assertRaises(ValueError):
+            compile_template(a, URLResolver())
+
+    def test_cache_recompiles_on_change(self):
+        resolver = URLResolver()
+        first = load_template(self.template, resolver)
+        self.assertIs(load_template(self.template, resolver), first)
+
+        self.template.write_text("<h1>{{ Title }}</h1>{{ Content }}")
+        os.utime(self.template, ns=(1, 1))
+        second = load_template(self.template, resolver)
+        self.assertIsNot(second, first)
+        self.assertEqual(second.render(Title="t", Content="c"), "<h1>t</h1>c")
+
+    def test_directory_templates(self):
+        content = Path(self.root, "content")
+        Path(content, "blog", "post").mkdir(parents=True)
+        Path(content, "index.md").write_text("# Home")
+        Path(content, "blog", "post", "index.md").write_text("# Post")
+        blog_template = Path(content, "blog", "_template.html")
+        blog_template.write_text('{{ extends "../../template.html" }}\n[{{ Content }}]')
+
+        self.assertEqual(
+            find_template(Path(content, "blog", "post", "index.md"), content, "t"),
+            blog_template,
+        )
+        self.assertEqual(find_template(Path(content, "index.md"), content, "t"), Path("t"))
+
+        dest = Path(self.root, "docs")
+        generate_pages_recursive(content, self.template, dest, "/")
+        post = Path(dest, "blog", "post", "index.html").read_text()
+        self.assertTrue(post.endswith("[<div><h1>Post</h1></div>]"))
+        self.assertFalse(Path(dest, "blog", "index.html").exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+
+from htmlnode import text_node_to_html_node
+from markdown_html import markdown_to_html_node
+from textnode import TextNode, TextType
+from urls import URLResolver
+
+
+class TestURLResolver(unittest.TestCase):
+    def test_resolve_root_relative(self):
+        resolver = URLResolver("/learning-site/")
+        self.assertEqual(resolver.resolve("/"), "/learning-site/")
+        self.assertEqual(resolver.resolve("/blog/tom"), "/learning-site/blog/tom")
+
+    def test_resolve_leaves_other_urls(self):
+        resolver = URLResolver("/learning-site/")
+        for url in ("https://boot.dev", "//cdn.example.com/x.js", "images/a.png", "#top"):
+            self.assertEqual(resolver.resolve(url), url)
+
+    def test_text_node_links_are_resolved(self):
+        resolver = URLResolver("/site/")
+        link = TextNode("home", TextType.LINKS, "/")
+        image = TextNode("tom", TextType.IMAGE, "/images/tom.png")
+        self.assertEqual(
+            text_node_to_html_node(link, resolver).to_html(),
+            '<a href="/site/">home</a>',
+        )
+        self.assertEqual(
+            text_node_to_html_node(image, resolver).to_html(),
+            '<img src="/site/images/tom.png" alt=tom></img>',
+        )
+
+    def test_code_blocks_are_not_rewritten(self):
+        md = '[home](/)\n\n```\n<a href="/x">\n```'
+        html = markdown_to_html_node(md, URLResolver("/site/")).to_html()
+        self.assertEqual(
+            html,
+            '<div><p><a href="/site/">home</a></p>'
+            '<pre><code><a href="/x">\n</code></pre></div>',
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
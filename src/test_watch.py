@@ -0,0 +1,147 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import watch
+from fragment_cache import FragmentCache
+from manifest import BuildManifest
+from markdown_html import generate_pages_recursive
+from static_sync import sync_folder_contents
+from watch import PollingWatcher, rebuild_changes, template_files
+
+
+class TestWatch(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = Path(self.tmp.name)
+        self.content = Path(root, "content")
+        self.static = Path(root, "static")
+        self.dest = Path(root, "docs")
+        self.template = Path(root, "template.html")
+        self.manifest = BuildManifest(Path(root, "manifest.json"))
+
+        Path(self.content, "a").mkdir(parents=True)
+        Path(self.content, "b").mkdir()
+        Path(self.static).mkdir()
+        Path(self.content, "a", "index.md").write_text("# A\n\nfirst")
+        Path(self.content, "b", "index.md").write_text("# B\n\nsecond")
+        Path(self.static, "index.css").write_text("body {}")
+        self.template.write_text("{{ Title }}|{{ Content }}")
+
+        sync_folder_contents(self.static, self.dest, self.manifest)
+        generate_pages_recursive(
+            self.content, self.template, self.dest, "/", self.manifest
+        )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def rebuild(self, *paths):
+        rebuild_changes(
+            set(paths),
+            self.content,
+            self.static,
+            self.template,
+            self.dest,
+            "/",
+            self.manifest,
+        )
+
+    def test_markdown_edit_rebuilds_one_page(self):
+        source = Path(self.content, "a", "index.md")
+        source.write_text("# A\n\nedited")
+        other = Path(self.dest, "b", "index.html")
+        os.utime(other, ns=(0, 0))
+
+        self.rebuild(source)
+        self.assertIn("edited", Path(self.dest, "a", "index.html").read_text())
+        self.assertEqual(other.stat().st_mtime_ns, 0)
+
+    def test_template_edit_rebuilds_every_page(self):
+        self.template.write_text("<h1>{{ Title }}</h1>{{ Content }}")
+        self.rebuild(self.template)
+        for name in ("a", "b"):
+            html = Path(self.dest, name, "index.html").read_text()
+            self.assertTrue(html.startswith("<h1>"))
+
+    def test_layout_edit_rebuilds_pages_using_it(self):
+        layout = Path(self.template.parent, "layouts", "base.html")
+        layout.parent.mkdir()
+        layout.write_text("<main>{{ Content }}</main>")
+        Path(self.content, "a", "_template.html").write_text(
+            '{{ extends "../../layouts/base.html" }}\n{{ Title }}'
+        )
+        self.assertEqual(
+            template_files(self.content, self.template),
+            {self.template, Path(self.content, "a", "_template.html"), layout},
+        )
+
+        layout.write_text("<article>{{ Content }}</article>")
+        self.rebuild(layout)
+        html = Path(self.dest, "a", "index.html").read_text()
+        self.assertEqual(html, "<article>A</article>")
+
+    def test_removed_markdown_deletes_page(self):
+        source = Path(self.content, "b", "index.md")
+        source.unlink()
+        self.rebuild(source)
+        self.assertFalse(Path(self.dest, "b", "index.html").exists())
+
+    def test_static_edit_copies_file(self):
+        css = Path(self.static, "index.css")
+        css.write_text("body { margin: 0 }")
+        self.rebuild(css)
+        self.assertEqual(
+            Path(self.dest, "index.css").read_text(), "body { margin: 0 }"
+        )
+
+    def test_polling_watcher_reports_changes(self):
+        watcher = PollingWatcher([self.content], [self.template], interval=0.01)
+        source = Path(self.content, "a", "index.md")
+        source.write_text("# A\n\nchanged size")
+        self.assertEqual(watcher.wait(timeout=1), {source})
+
+    def test_failed_full_rebuild_keeps_watching(self):
+        source = Path(self.content, "b", "index.md")
+        fragments = FragmentCache(Path(self.tmp.name, "fragments.json"))
+
+        class MissingEvents:
+            # events are lost with a broken page, then again once it is fixed.
+            def __init__(self):
+                self.waits = 0
+
+            def wait(self):
+                self.waits += 1
+                if self.waits == 2:
+                    source.write_text("# B\n\nfixed")
+                elif self.waits == 3:
+                    raise KeyboardInterrupt
+                return None
+
+            def close(self):
+                pass
+
+        source.write_text("no title")
+        out = io.StringIO()
+        with mock.patch.object(watch, "make_watcher", return_value=MissingEvents()):
+            with contextlib.redirect_stdout(out):
+                watch.watch_and_rebuild(
+                    self.content,
+                    self.static,
+                    self.template,
+                    self.dest,
+                    "/",
+                    self.manifest,
+                    fragments=fragments,
+                )
+        self.assertIn("rebuild failed", out.getvalue())
+        self.assertIn("fixed", Path(self.dest, "b", "index.html").read_text())
+        self.assertTrue(fragments.path.is_file())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+"""Module for resolving site urls against the basepath."""
+
+from __future__ import annotations
+
+import hashlib
+
+
+class URLResolver:
+    """Rewrites root relative urls such as /blog/tom to live under basepath.
+
+    Urls of static files found in assets, a map of their path relative to the
+    site root to the fingerprinted path they were written to, point at the
+    fingerprinted file. Absolute, protocol relative and page relative urls
+    are left untouched.
+
+    When images, a map of site paths to pixel sizes, is given, image tags get
+    their size and lazy loading attributes from image_attributes.
+    """
+
+    def __init__(
+        self,
+        basepath: str = "/",
+        assets: dict[str, str] = None,
+        images: dict[str, tuple[int, int]] = None,
+    ):
+        self.basepath = basepath
+        self.assets = assets or {}
+        self.images = images
+        self._cache_key = basepath
+        if self.assets or images is not None:
+            digest = hashlib.sha256()
+            for rel, name in sorted(self.assets.items()):
+                digest.update(f"{rel}\0{name}\0".encode())
+            if images is not None:
+                digest.update(b"images\0")
+                for rel, (width, height) in sorted(images.items()):
+                    digest.update(f"{rel}\0{width}x{height}\0".encode())
+            self._cache_key = f"{basepath}#{digest.hexdigest()[:16]}"
+
+    @property
+    def cache_key(self) -> str:
+        """Identify the rewriting for caches of rendered output."""
+        return self._cache_key
+
+    def resolve(self, url: str) -> str:
+        if not url.startswith("/") or url.startswith("//"):
+            return url
+        path, rest = _split_site_path(url)
+        name = self.assets.get(path)
+        if name is not None:
+            path = name
+        return self.basepath + path + rest
+
+    def image_attributes(self, url: str) -> dict[str, str]:
+        """Return the extra attributes of an img tag showing url, in order.
+
+        Images found in images get their width and height, every image is
+        loaded lazily and decoded off the main thread. Without images there
+        are none.
+        """
+        if self.images is None:
+            return {}
+        attributes = {}
+        if url.startswith("/") and not url.startswith("//"):
+            size = self.images.get(_split_site_path(url)[0])
+            if size is not None:
+                attributes["width"] = str(size[0])
+                attributes["height"] = str(size[1])
+        attributes["loading"] = "lazy"
+        attributes["decoding"] = "async"
+        return attributes
+
+
+def _split_site_path(url: str) -> tuple[str, str]:
+    """Split a root relative url into its path without the leading slash and
+    the query or fragment following it."""
+    path = url[1:]
+    end = len(path)
+    for marker in "?#":
+        index = path.find(marker)
+        if index != -1:
+            end = min(end, index)
+    return path[:end], path[end:]
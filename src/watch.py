@@ -0,0 +1,542 @@
+"""Module for watching the site sources and rebuilding what changed."""
+
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Callable
+
+from assets import fingerprint_assets, hash_assets, sync_assets
+from content_db import ContentDB
+from fragment_cache import FragmentCache
+from image_meta import ImageIndex
+from manifest import BuildManifest
+from markdown_html import (
+    discover_pages,
+    generate_page,
+    generate_pages_recursive,
+    render_key,
+)
+from output_sink import DiskSink
+from precompress import precompress_tree, remove_precompressed
+from search_index import SearchIndex
+from static_sync import sync_file, sync_folder_contents
+from template import (
+    DIRECTORY_TEMPLATE_NAME,
+    find_template,
+    resolve_template_source,
+)
+from urls import URLResolver
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = (
+    IN_MODIFY
+    | IN_ATTRIB
+    | IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+)
+EVENT_HEADER = struct.Struct("iIII")
+
+# how long the tree has to stay quiet before a batch of changes is rebuilt.
+DEBOUNCE_SECONDS = 0.1
+
+
+class InotifyWatcher:
+    """Watch directory trees with linux inotify, one watch per directory.
+
+    Blocks in select() while idle so watching costs nothing between edits.
+    """
+
+    def __init__(self, dirs: list[Path], files: list[Path] = None):
+        libc_name = ctypes.util.find_library("c") or "libc.so.6"
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        self._wd_dirs: dict[int, Path] = {}
+        self._files: dict[Path, set[str]] = {}
+        try:
+            for d in dirs:
+                self._add_tree(Path(d))
+            for file in files or []:
+                file = Path(file)
+                self._add_watch(file.parent)
+                self._files.setdefault(file.parent, set()).add(file.name)
+        except OSError:
+            self.close()
+            raise
+
+    def _add_watch(self, path: Path) -> None:
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"cannot watch {path}")
+        self._wd_dirs[wd] = path
+
+    def _add_tree(self, path: Path) -> list[Path]:
+        """Watch path and its subfolders, returning the files found inside."""
+        found = []
+        stack = [path]
+        while stack:
+            current = stack.pop()
+            self._add_watch(current)
+            with os.scandir(current) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(Path(entry.path))
+                    else:
+                        found.append(Path(entry.path))
+        return found
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+    def wait(self, timeout: float = None) -> set[Path] | None:
+        """Block until something changes and return the changed paths.
+
+        Returns None when the kernel queue overflowed and events were lost.
+        """
+        changed: set[Path] = set()
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        while ready:
+            if not self._read_events(changed):
+                return None
+            ready, _, _ = select.select([self.fd], [], [], DEBOUNCE_SECONDS)
+        return changed
+
+    def _read_events(self, changed: set[Path]) -> bool:
+        try:
+            data = os.read(self.fd, 1 << 16)
+        except BlockingIOError:
+            return True
+
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                return False
+            if mask & IN_IGNORED:
+                self._wd_dirs.pop(wd, None)
+                continue
+
+            parent = self._wd_dirs.get(wd)
+            if parent is None or not name:
+                continue
+            path = Path(parent, os.fsdecode(name))
+            if parent in self._files and path.name not in self._files[parent]:
+                continue
+
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                changed.update(self._add_tree(path))
+            changed.add(path)
+        return True
+
+
+class PollingWatcher:
+    """Watch trees by comparing mtime and size snapshots on an interval."""
+
+    def __init__(
+        self, dirs: list[Path], files: list[Path] = None, interval: float = 1.0
+    ):
+        self.dirs = [Path(d) for d in dirs]
+        self.files = [Path(f) for f in files or []]
+        self.interval = interval
+        self._snapshot = self._scan()
+
+    def _scan(self) -> dict[Path, tuple[int, int]]:
+        result = {}
+        stack = list(self.dirs)
+        while stack:
+            current = stack.pop()
+            try:
+                it = os.scandir(current)
+            except FileNotFoundError:
+                continue
+            with it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(Path(entry.path))
+                        continue
+                    try:
+                        st = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    result[Path(entry.path)] = (st.st_mtime_ns, st.st_size)
+        for file in self.files:
+            try:
+                st = file.stat()
+            except FileNotFoundError:
+                continue
+            result[file] = (st.st_mtime_ns, st.st_size)
+        return result
+
+    def close(self) -> None:
+        pass
+
+    def wait(self, timeout: float = None) -> set[Path]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            time.sleep(self.interval)
+            snapshot = self._scan()
+            old = self._snapshot
+            changed = {
+                p for p in snapshot.keys() | old.keys() if snapshot.get(p) != old.get(p)
+            }
+            self._snapshot = snapshot
+            if changed:
+                return changed
+            if deadline is not None and time.monotonic() >= deadline:
+                return changed
+
+
+def make_watcher(dirs: list[Path], files: list[Path], polling: bool = False):
+    """Use inotify when the platform supports it, polling otherwise."""
+    if not polling and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(dirs, files)
+        except OSError as e:
+            print(f"inotify unavailable ({e}), falling back to polling.")
+    return PollingWatcher(dirs, files)
+
+
+def _relative_to(path: Path, root: Path) -> Path | None:
+    try:
+        return path.relative_to(root)
+    except ValueError:
+        return None
+
+
+def template_files(content_dir: Path, template_path: Path) -> set[Path]:
+    """Return every file of the templates in use: the default template, each
+    directory template and the layouts they extend."""
+    files = set()
+    for template in [template_path, *content_dir.rglob(DIRECTORY_TEMPLATE_NAME)]:
+        try:
+            _, used = resolve_template_source(template)
+        except (OSError, ValueError):
+            used = [template]
+        # layouts are found relative to their template, as in blog/../base.html.
+        files.update(Path(os.path.normpath(f)) for f in used)
+    return files
+
+
+def _outside(files: set[Path], dirs: list[Path]) -> list[Path]:
+    return sorted(
+        f for f in files if all(_relative_to(f, d) is None for d in dirs)
+    )
+
+
+def rebuild_changes(
+    changed: set[Path],
+    content_dir: Path,
+    static_dir: Path,
+    template_path: Path,
+    dest_dir: Path,
+    basepath: str,
+    manifest: BuildManifest,
+    sync_mode: str = "copy",
+    resolver: URLResolver = None,
+    fragments: FragmentCache = None,
+    precompress: bool = False,
+    minify: bool = False,
+    fingerprint: bool = False,
+    image_index: ImageIndex = None,
+    search: SearchIndex = None,
+    content_db: ContentDB = None,
+    templates_used: set[Path] = None,
+) -> None:
+    """Rebuild only the outputs affected by the changed paths.
+
+    A change to any file of templates_used regenerates every page. It
+    defaults to template_files, the watcher also passes the files used before
+    the change so removing a layout counts.
+
+    With fingerprint a changed static file is synced under its new name, with
+    an image_index the image sizes are refreshed. Either way every page is
+    then checked against the new urls and sizes. A search index is updated
+    with the regenerated and removed pages. Regenerating every page finds
+    them through content_db when given.
+    """
+    manifest.reset()
+    resolver = resolver or URLResolver(basepath)
+    static_changed = any(_relative_to(p, static_dir) is not None for p in changed)
+
+    assets, images = resolver.assets, resolver.images
+    if fingerprint:
+        if static_changed:
+            assets = sync_assets(
+                static_dir, dest_dir, manifest, sync_mode, fingerprint=True
+            )
+        else:
+            assets = fingerprint_assets(hash_assets(static_dir, manifest))
+    if image_index is not None:
+        images = image_index.scan(static_dir)
+        if image_index.path is not None:
+            image_index.save()
+    resolver = URLResolver(resolver.basepath, assets, images)
+    output_key = render_key(resolver, minify)
+    assets_changed = static_changed and (fingerprint or image_index is not None)
+
+    if templates_used is None:
+        templates_used = template_files(content_dir, template_path)
+    templates_changed = sorted(
+        p for p in changed if p in templates_used or p.name == DIRECTORY_TEMPLATE_NAME
+    )
+    if templates_changed or assets_changed:
+        if templates_changed:
+            print(f"{templates_changed[0]} changed, regenerating pages using it")
+        generate_pages_recursive(
+            content_dir,
+            template_path,
+            dest_dir,
+            basepath,
+            manifest,
+            resolver=resolver,
+            fragments=fragments,
+            minify=minify,
+            search=search,
+            content_db=content_db,
+        )
+
+    templates: dict[Path, Path] = {}
+    for path in sorted(changed):
+        if path.name == DIRECTORY_TEMPLATE_NAME or path in templates_used:
+            continue
+        rel = _relative_to(path, content_dir)
+        if rel is not None:
+            if path.is_dir():
+                pages = discover_pages(path, Path(dest_dir, rel))
+            elif path.is_file():
+                pages = [(path, Path(dest_dir, rel.parent, "index.html"))]
+            else:
+                pages = []
+                prefix = str(path) + os.sep
+                for key in list(manifest.pages):
+                    if key == str(path) or key.startswith(prefix):
+                        output = manifest.remove_page(key)
+                        if output is not None and search is not None:
+                            search.remove_page(output)
+
+            for from_path, dest_path in pages:
+                page_template = find_template(
+                    from_path, content_dir, template_path, templates
+                )
+                fresh = manifest.is_fresh(
+                    from_path, page_template, dest_path, output_key
+                )
+                if fresh and (search is None or dest_path in search):
+                    continue
+                title = generate_page(
+                    from_path,
+                    page_template,
+                    dest_path,
+                    basepath,
+                    resolver,
+                    fragments,
+                    minify,
+                    search=search,
+                )
+                manifest.record(from_path, page_template, dest_path, output_key)
+                if content_db is not None:
+                    content_db.set_titles({str(from_path): title})
+            continue
+
+        rel = _relative_to(path, static_dir)
+        if rel is not None and not fingerprint:
+            rel = rel.as_posix()
+            if path.is_dir():
+                sync_folder_contents(static_dir, dest_dir, manifest, sync_mode)
+                continue
+            sync_file(static_dir, dest_dir, rel, manifest, sync_mode)
+            prefix = rel + "/"
+            for asset in [a for a in manifest.assets if a.startswith(prefix)]:
+                sync_file(static_dir, dest_dir, asset, manifest, sync_mode)
+
+    if search is not None:
+        search.write(DiskSink(dest_dir), basepath)
+        if search.path is not None:
+            search.save()
+    if precompress:
+        precompress_tree(dest_dir, manifest)
+    manifest.save()
+    if fragments is not None and fragments.path is not None:
+        fragments.save()
+
+
+def rebuild_all(
+    content_dir: Path,
+    static_dir: Path,
+    template_path: Path,
+    dest_dir: Path,
+    basepath: str,
+    manifest: BuildManifest,
+    sync_mode: str = "copy",
+    fragments: FragmentCache = None,
+    precompress: bool = False,
+    minify: bool = False,
+    fingerprint: bool = False,
+    image_index: ImageIndex = None,
+    search: SearchIndex = None,
+    content_db: ContentDB = None,
+) -> None:
+    """Check every source like a build from main, rebuilding what is out of
+    date and saving all of the build state."""
+    manifest.reset()
+    assets = sync_assets(
+        static_dir, dest_dir, manifest, sync_mode, fingerprint=fingerprint
+    )
+    images = None
+    if image_index is not None:
+        images = image_index.scan(static_dir)
+        if image_index.path is not None:
+            image_index.save()
+    generate_pages_recursive(
+        content_dir,
+        template_path,
+        dest_dir,
+        basepath,
+        manifest,
+        resolver=URLResolver(basepath, assets, images),
+        fragments=fragments,
+        minify=minify,
+        search=search,
+        content_db=content_db,
+    )
+    if search is not None:
+        search.write(DiskSink(dest_dir), basepath)
+        if search.path is not None:
+            search.save()
+    manifest.prune()
+    if precompress:
+        precompress_tree(dest_dir, manifest)
+    else:
+        remove_precompressed(dest_dir, manifest)
+    manifest.save()
+    if fragments is not None and fragments.path is not None:
+        fragments.save()
+
+
+def watch_and_rebuild(
+    content_dir: Path | str,
+    static_dir: Path | str,
+    template_path: Path | str,
+    dest_dir: Path | str,
+    basepath: str,
+    manifest: BuildManifest,
+    sync_mode: str = "copy",
+    polling: bool = False,
+    fragments: FragmentCache = None,
+    precompress: bool = False,
+    minify: bool = False,
+    fingerprint: bool = False,
+    image_index: ImageIndex = None,
+    search: SearchIndex = None,
+    content_db: ContentDB = None,
+    on_rebuild: Callable[[], None] = None,
+) -> None:
+    """Watch content, static and the template with its layouts until
+    interrupted.
+
+    on_rebuild is called after every finished rebuild, for example to reload
+    a preview server. A failed rebuild is reported and watching goes on.
+    After missed file events everything is checked with rebuild_all, until
+    that succeeds.
+    """
+    content_dir = Path(content_dir)
+    static_dir = Path(static_dir)
+    template_path = Path(template_path)
+    dest_dir = Path(dest_dir)
+
+    dirs = [content_dir, static_dir]
+    templates_used = template_files(content_dir, template_path)
+    watched = _outside(templates_used, dirs)
+    watcher = make_watcher(dirs, watched, polling)
+    print(f"watching {content_dir}, {static_dir} and {template_path} for changes")
+    missed = False
+    try:
+        while True:
+            changed = watcher.wait()
+            if changed is None:
+                print("missed some file events, doing a full rebuild")
+                missed = True
+            elif not changed:
+                continue
+            start = time.perf_counter()
+            try:
+                previous = templates_used
+                templates_used = template_files(content_dir, template_path)
+                if _outside(templates_used, dirs) != watched:
+                    # a layout was added or dropped, watch the new set.
+                    watcher.close()
+                    watched = _outside(templates_used, dirs)
+                    watcher = make_watcher(dirs, watched, polling)
+                if missed:
+                    rebuild_all(
+                        content_dir,
+                        static_dir,
+                        template_path,
+                        dest_dir,
+                        basepath,
+                        manifest,
+                        sync_mode,
+                        fragments=fragments,
+                        precompress=precompress,
+                        minify=minify,
+                        fingerprint=fingerprint,
+                        image_index=image_index,
+                        search=search,
+                        content_db=content_db,
+                    )
+                    missed = False
+                else:
+                    rebuild_changes(
+                        changed,
+                        content_dir,
+                        static_dir,
+                        template_path,
+                        dest_dir,
+                        basepath,
+                        manifest,
+                        sync_mode,
+                        fragments=fragments,
+                        precompress=precompress,
+                        minify=minify,
+                        fingerprint=fingerprint,
+                        image_index=image_index,
+                        search=search,
+                        content_db=content_db,
+                        templates_used=previous | templates_used,
+                    )
+            except Exception as e:
+                print(f"rebuild failed: {e}")
+                continue
+            print(f"rebuilt in {time.perf_counter() - start:.3f}s")
+            if on_rebuild is not None:
+                on_rebuild()
+    except KeyboardInterrupt:
+        print("stopped watching")
+    finally:
+        watcher.close()